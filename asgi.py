@@ -0,0 +1,216 @@
+"""
+ASGI Entry Point for AI Interview Simulator
+ASGI 進入點：async 路由直接在伺服器的事件迴圈上執行，不必每個請求佔用一條執行緒；同步與串流路由交給有上限的執行緒池
+
+Run with an ASGI server, e.g.:
+    uvicorn --factory asgi:create_app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import inspect
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Flask, Response, request, request_started
+from werkzeug.exceptions import HTTPException
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+Scope = Dict[str, Any]
+Message = Dict[str, Any]
+Receive = Callable[[], Any]
+Send = Callable[[Message], Any]
+
+class AsyncViewServer:
+    """
+    ASGI application serving a Flask app without one thread per async request
+    
+    Under WSGI, Flask runs an async view on a fresh event loop inside the
+    worker thread that took the request, so a request waiting on the model
+    still holds an OS thread. Here a request that maps to an async view is
+    dispatched as a task on the ASGI server's own loop: Flask's request
+    context lives in context variables, so every task sees its own request,
+    and awaiting the LLM costs no thread. Blocking work inside those views
+    already goes through asyncio.to_thread or the LLM client's private loop.
+    
+    Every other request (sync views, SSE streams, CORS preflights) runs the
+    WSGI app on a bounded thread pool, streaming each chunk as it is
+    produced. Async views must return a complete response, not a stream.
+    """
+    
+    def __init__(self, flask_app: Flask, max_workers: int = 32):
+        """
+        Initialize ASGI server adapter
+        
+        Args:
+            flask_app: Flask application to serve
+            max_workers: Threads running sync and streaming requests at once
+        """
+        self.app = flask_app
+        self.max_body_bytes = flask_app.config.get('MAX_CONTENT_LENGTH')
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wsgi')
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"unsupported ASGI scope type '{scope['type']}'")
+        
+        body = await self._read_body(receive)
+        if body is None:
+            return
+        if self.max_body_bytes is not None and len(body) > self.max_body_bytes:
+            await self._send(send, 413, [('Content-Type', 'application/json')], b'{"error": "Request too large"}')
+            return
+        
+        environ = self._build_environ(scope, body)
+        view = self._async_view(environ)
+        if view is not None:
+            response = await self._dispatch(environ, view)
+            try:
+                await self._send(send, response.status_code, response.headers.to_wsgi_list(), response.get_data())
+            finally:
+                response.close()
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._run_wsgi, environ, send, loop)
+    
+    def _async_view(self, environ: Dict[str, Any]) -> Optional[Callable]:
+        """The coroutine view function the request maps to, or None to serve it over WSGI"""
+        if environ['REQUEST_METHOD'] == 'OPTIONS':
+            return None
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            # 404, 405 and redirects are answered by the WSGI path
+            return None
+        view = self.app.view_functions.get(endpoint)
+        return view if inspect.iscoroutinefunction(view) else None
+    
+    async def _dispatch(self, environ: Dict[str, Any], view: Callable) -> Response:
+        """Flask's full_dispatch_request, awaiting the view on the current loop"""
+        app = self.app
+        with app.request_context(environ):
+            try:
+                try:
+                    request_started.send(app, _async_wrapper=app.ensure_sync)
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        if request.routing_exception is not None:
+                            app.raise_routing_exception(request)
+                        rv = await view(**request.view_args)
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                return app.finalize_request(rv)
+            except Exception as e:
+                return app.handle_exception(e)
+    
+    def _run_wsgi(self, environ: Dict[str, Any], send: Send, loop: asyncio.AbstractEventLoop):
+        """Run the WSGI app on a pool thread, sending each body chunk as it is produced"""
+        started: List[Tuple[int, List[Tuple[str, str]]]] = []
+        
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            started[:] = [(int(status.split(' ', 1)[0]), headers)]
+        
+        def send_message(message: Message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+        
+        def send_start():
+            status, headers = started[0]
+            send_message({'type': 'http.response.start', 'status': status, 'headers': self._encode_headers(headers)})
+        
+        result = self.app(environ, start_response)
+        try:
+            headers_sent = False
+            for chunk in result:
+                if not chunk:
+                    continue
+                if not headers_sent:
+                    send_start()
+                    headers_sent = True
+                send_message({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not headers_sent:
+                send_start()
+            send_message({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        except OSError as e:
+            # The client went away mid-stream; closing the result cleans up the generator
+            logger.info(f"Client disconnected during {environ['PATH_INFO']}: {e}")
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+    
+    async def _lifespan(self, receive: Receive, send: Send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    @staticmethod
+    async def _read_body(receive: Receive) -> Optional[bytes]:
+        """Whole request body, or None if the client disconnected first"""
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+    
+    @classmethod
+    async def _send(cls, send: Send, status: int, headers: List[Tuple[str, str]], body: bytes):
+        await send({'type': 'http.response.start', 'status': status, 'headers': cls._encode_headers(headers)})
+        await send({'type': 'http.response.body', 'body': body, 'more_body': False})
+    
+    @staticmethod
+    def _encode_headers(headers: List[Tuple[str, str]]) -> List[Tuple[bytes, bytes]]:
+        return [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+    
+    @staticmethod
+    def _build_environ(scope: Scope, body: bytes) -> Dict[str, Any]:
+        """WSGI environ for an ASGI HTTP scope and its request body"""
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+            'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            'CONTENT_LENGTH': str(len(body))
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+        
+        for raw_name, raw_value in scope.get('headers', []):
+            name = raw_name.decode('latin1').upper().replace('-', '_')
+            value = raw_value.decode('latin1')
+            if name == 'CONTENT_LENGTH':
+                continue
+            key = name if name == 'CONTENT_TYPE' else f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+def create_app() -> AsyncViewServer:
+    """Initialize the services and build the ASGI application (for `uvicorn --factory`)"""
+    import main
+    
+    main.init_services()
+    return AsyncViewServer(main.app, max_workers=Config.ASGI_SYNC_WORKERS)
@@ -0,0 +1,371 @@
+"""
+Asynchronous Gemini LLM Client for AI Interview Simulator
+非同步 LLM 客戶端，以單一事件迴圈和併發上限處理大量等待中的模型呼叫
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from config import Config
+from chat_sessions import ChatSessions
+from llm_backends import LLMBackend
+from llm_client import (
+    API_ERROR_MESSAGE,
+    CODE_EVALUATION_PROMPT_TEMPLATE,
+    CODING_PROBLEM_PROMPT_TEMPLATE,
+    EMPTY_RESPONSE_MESSAGE,
+    UNAVAILABLE_MESSAGE,
+    LLMClient,
+)
+from metrics import LLM_ATTEMPT_SECONDS, LLM_CALL_SECONDS
+from response_cache import ResponseCache
+from running_evaluation import RunningEvaluator
+from session_store import SessionStore, batched
+from single_flight import AsyncSingleFlight, prompt_key
+
+logger = logging.getLogger(__name__)
+
+class AsyncLLMClient(LLMClient):
+    """
+    asyncio-based LLM client with the same surface as LLMClient
+    
+    Every public method is a coroutine. Model calls run on one private event
+    loop thread, so the model calls themselves need no thread each, and a
+    view can overlap several of them. A semaphore bounds how many requests
+    are in flight at once.
+    
+    Served through asgi.py, the async views await these coroutines on the
+    ASGI server's loop, so a request waiting on the model holds no thread.
+    Under plain WSGI (python main.py) each async view runs on a short-lived
+    loop inside the worker thread that took the request, and that thread
+    stays busy until the view returns.
+    """
+    
+    def __init__(self,
+                 max_concurrency: Optional[int] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 backend: Optional[LLMBackend] = None,
+                 sessions: Optional[SessionStore] = None,
+                 running_evaluator: Optional[RunningEvaluator] = None,
+                 chats: Optional[ChatSessions] = None):
+        """
+        Initialize async Gemini client
+        
+        Args:
+            max_concurrency: Maximum in-flight Gemini requests
+                             (defaults to Config.LLM_MAX_CONCURRENCY)
+            response_cache: Cache for code analysis/evaluation responses,
+                            typically shared with the sync client
+            backend: Model backend, typically shared with the sync client
+            sessions: Session store, typically shared with the sync client
+            running_evaluator: Running evaluator, typically shared with the sync client
+            chats: Chat sessions, typically shared with the sync client
+        """
+        super().__init__(response_cache=response_cache, backend=backend, sessions=sessions,
+                         running_evaluator=running_evaluator, chats=chats)
+        
+        self.max_concurrency = max_concurrency or Config.LLM_MAX_CONCURRENCY
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.async_single_flight = AsyncSingleFlight()
+        
+        # Private loop that owns the semaphore and the gRPC aio channel
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever,
+            name='async-llm-client',
+            daemon=True
+        )
+        self._loop_thread.start()
+        
+        logger.info(f"Async LLM client initialized (max concurrency: {self.max_concurrency})")
+    
+    def _run_on_loop(self, coro) -> Awaitable:
+        """Schedule a coroutine on the private loop and await it from any loop"""
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+    
+    def get_coalescing_stats(self) -> Dict[str, int]:
+        """Get single-flight statistics for identical concurrent prompts"""
+        return self.async_single_flight.get_stats()
+    
+    def close(self):
+        """Stop the private event loop"""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=5)
+    
+    async def _generate_on_loop(self, full_prompt: str) -> str:
+        """Single bounded Gemini call, executed on the private loop"""
+        async with self._semaphore:
+            return await self.backend.generate_async(full_prompt, self._generation_config())
+    
+    async def _call_gemini(self, prompt: str, conversation_history: List[str] = None,
+                           interview_type: Optional[str] = None) -> str:
+        """
+        Call Gemini API with error handling and non-blocking retry logic
+        
+        Concurrent calls with an identical full prompt share one upstream call.
+        
+        Args:
+            prompt: User prompt
+            conversation_history: Previous conversation context
+            interview_type: Interview type whose context token budget applies
+            
+        Returns:
+            Generated response
+        """
+        full_prompt = self._prepare_prompt(prompt, conversation_history, interview_type)
+        
+        # Coalescing happens on the private loop so callers from every loop share it
+        with LLM_CALL_SECONDS.labels('async').time():
+            return await self._run_on_loop(self.async_single_flight.do(
+                prompt_key(full_prompt),
+                lambda: self._generate_with_retry_on_loop(full_prompt)
+            ))
+    
+    async def _generate_with_retry_on_loop(self, full_prompt: str) -> str:
+        """Generate a response for a fully prepared prompt, retrying on failure"""
+        return await self._with_retry_on_loop(lambda: self._generate_on_loop(full_prompt))
+    
+    async def _chat_with_retry(self, session_id: str, interview_type: str, history: List[str], message: str) -> str:
+        """
+        Send one message on the session's Gemini chat, retrying on failure
+        
+        Args:
+            session_id: Session identifier
+            interview_type: Interview type of the session
+            history: Session history before this message (to rebuild a missing chat)
+            message: The new user turn
+            
+        Returns:
+            Generated response
+        """
+        return await self._run_on_loop(self._with_retry_on_loop(
+            lambda: self._chat_on_loop(session_id, interview_type, history, message)
+        ))
+    
+    async def _chat_on_loop(self, session_id: str, interview_type: str, history: List[str], message: str) -> str:
+        """Single bounded chat turn; a failed turn drops the chat so it is rebuilt from history"""
+        async with self.chats.serialized_async(session_id), self._semaphore:
+            chat = self.chats.get(session_id, interview_type, history)
+            try:
+                text = await chat.send_async(message, self._generation_config())
+            except Exception:
+                self.chats.discard(session_id)
+                raise
+            if text:
+                # The caller stores this turn as a candidate and an interviewer entry
+                self.chats.commit(session_id, chat, interview_type, len(history) + 2)
+            else:
+                self.chats.discard(session_id)
+            return text
+    
+    async def _with_retry_on_loop(self, generate: Callable[[], Awaitable[str]]) -> str:
+        """Run one Gemini call on the private loop, retrying with backoff, and normalize its text"""
+        max_retries = 3
+        retry_delay = 1
+        
+        for attempt in range(max_retries):
+            start = time.perf_counter()
+            try:
+                text = await generate()
+                
+                if text:
+                    LLM_ATTEMPT_SECONDS.labels('async', attempt + 1, 'ok').observe(time.perf_counter() - start)
+                    return text.strip()
+                else:
+                    LLM_ATTEMPT_SECONDS.labels('async', attempt + 1, 'empty').observe(time.perf_counter() - start)
+                    logger.warning("Empty response from Gemini API")
+                    return EMPTY_RESPONSE_MESSAGE
+            
+            except Exception as e:
+                LLM_ATTEMPT_SECONDS.labels('async', attempt + 1, 'error').observe(time.perf_counter() - start)
+                logger.warning(f"Async Gemini API call failed (attempt {attempt + 1}): {e}")
+                if attempt < max_retries - 1:
+                    # The semaphore slot is released while backing off
+                    await asyncio.sleep(retry_delay)
+                    retry_delay *= 2
+                else:
+                    logger.error(f"All async Gemini API attempts failed: {e}")
+                    return API_ERROR_MESSAGE
+        
+        return UNAVAILABLE_MESSAGE
+    
+    @batched('sessions')
+    async def start_interview(self, interview_type: str = 'technical', session_id: Optional[str] = None) -> str:
+        """
+        Start a new interview session with Gemini
+        
+        Args:
+            interview_type: Type of interview (technical, behavioral, system_design)
+            session_id: Session identifier to use (generated if omitted)
+        
+        Returns:
+            Initial interview question from Gemini
+        """
+        try:
+            session_id = session_id or f"session_{int(time.time())}"
+            session = self._create_session(session_id, interview_type)
+            system_prompt = self._get_interview_prompt(interview_type)
+            
+            if self.chats.get(session_id, interview_type, session['history']) is not None:
+                initial_response = await self._chat_with_retry(
+                    session_id, interview_type, session['history'], self.chats.opening_message(interview_type)
+                )
+            else:
+                initial_response = await self._call_gemini(system_prompt)
+            
+            self._append_history(session, f"System: {system_prompt}", f"Interviewer: {initial_response}")
+            session['question_count'] += 1
+            
+            logger.info(f"Started {interview_type} interview session: {session_id}")
+            
+            return initial_response
+        
+        except Exception as e:
+            logger.error(f"Error starting interview: {e}")
+            return "歡迎參加面試！請先簡單自我介紹，然後我們開始今天的技術討論。"
+    
+    @batched('sessions')
+    async def get_response(self, message: str, session_id: str) -> str:
+        """
+        Get response from Gemini based on user message
+        
+        Args:
+            message: User's message
+            session_id: Session identifier
+        
+        Returns:
+            Gemini response
+        """
+        try:
+            session = self._get_or_create_session(session_id)
+            history = list(session['history'])
+            self._append_history(session, f"Candidate: {message}")
+            
+            if self.chats.get(session_id, session['type'], history) is not None:
+                response = await self._chat_with_retry(session_id, session['type'], history, message)
+            else:
+                follow_up_prompt = self._build_follow_up_prompt(session['type'], message)
+                response = await self._call_gemini(follow_up_prompt, session['history'], session['type'])
+            
+            self._append_history(session, f"Interviewer: {response}")
+            session['question_count'] += 1
+            self._submit_for_evaluation(session_id, session)
+            
+            return response
+        
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            return "感謝你的回答。能否請你詳細說明一下你的思考過程？"
+    
+    async def analyze_code(self, code: str, language: str = 'python') -> Dict:
+        """
+        Analyze code submission using Gemini
+        
+        Args:
+            code: Code to analyze
+            language: Programming language
+        
+        Returns:
+            Analysis results
+        """
+        try:
+            too_long = self._code_too_long_result(code, language)
+            if too_long:
+                return too_long
+            
+            cache_key = self._code_analysis_cache_key(code, language)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+            
+            analysis_prompt = self._build_code_analysis_prompt(code, language)
+            analysis_response = await self._call_gemini(analysis_prompt)
+            
+            result = self._build_code_analysis_result(analysis_response, language)
+            if self._is_cacheable_response(analysis_response):
+                self.response_cache.put(cache_key, result)
+            
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error analyzing code: {e}")
+            return self._code_analysis_fallback(language)
+    
+    async def generate_coding_problem(self, difficulty: str = 'medium', topic: str = 'algorithms', language: str = 'python') -> str:
+        """
+        Generate a coding problem using Gemini
+        
+        Args:
+            difficulty: Problem difficulty
+            topic: Problem topic
+            language: Target programming language
+            
+        Returns:
+            Problem description text
+        """
+        problem_prompt = CODING_PROBLEM_PROMPT_TEMPLATE.format(
+            difficulty=difficulty, topic=topic, language=language
+        )
+        return await self._call_gemini(problem_prompt)
+    
+    async def evaluate_code_solution(self, code: str, problem: str, language: str = 'python',
+                                     test_results: str = '') -> str:
+        """
+        Evaluate a code solution against a problem description using Gemini
+        
+        Args:
+            code: Solution code
+            problem: Problem description
+            language: Programming language
+            test_results: Summary of the solution's sandboxed test run, if any
+            
+        Returns:
+            Evaluation report text
+        """
+        cache_key = self._code_evaluation_cache_key(code, problem, language, test_results)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        evaluation_prompt = CODE_EVALUATION_PROMPT_TEMPLATE.format(
+            problem=problem, language=language, code=code,
+            test_results=f"\n實際測試結果：\n{test_results}\n" if test_results else ''
+        )
+        evaluation_response = await self._call_gemini(evaluation_prompt)
+        
+        if self._is_cacheable_response(evaluation_response):
+            self.response_cache.put(cache_key, evaluation_response)
+        
+        return evaluation_response
+    
+    @batched('sessions')
+    async def end_interview(self, session_id: str) -> Dict:
+        """
+        End interview and generate summary using Gemini
+        
+        Args:
+            session_id: Session identifier
+        
+        Returns:
+            Interview summary
+        """
+        try:
+            if session_id not in self.sessions:
+                return self._missing_session_summary(session_id)
+            
+            session = self.sessions[session_id]
+            summary_response = await asyncio.to_thread(
+                self.running_evaluator.finalize, session_id, session['type'], session['history']
+            ) or API_ERROR_MESSAGE
+            
+            result = self._build_summary_result(session_id, session, summary_response)
+            
+            self.discard_session(session_id)
+            self.chats.close(session_id)
+            
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error ending interview: {e}")
+            return self._summary_fallback(session_id)
@@ -0,0 +1,80 @@
+"""
+Security scan micro-benchmark
+比較逐條 re.search 與單次掃描 SecurityScanner 在 10k 字元程式碼上的耗時
+
+Usage:
+    python benchmarks/bench_security_scan.py [--size 10000] [--number 50]
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_handler import CodeHandler  # noqa: E402
+from security_scanner import SecurityScanner  # noqa: E402
+
+CLEAN_BLOCK = '''def two_sum(nums, target):
+    seen = {}
+    for index, value in enumerate(nums):
+        diff = target - value
+        if diff in seen:
+            return [seen[diff], index]
+        seen[value] = index
+    return []
+
+'''
+
+RISKY_BLOCK = '''import os
+def load(path):
+    with open(path) as handle:
+        data = handle.read()
+    os.system("ls " + path)
+    return eval(data)
+
+'''
+
+def make_input(block: str, size: int) -> str:
+    """Repeat a block of code up to `size` characters"""
+    return (block * (size // len(block) + 1))[:size]
+
+def per_pattern_scan(patterns, code):
+    """The previous implementation: one re.search per rule"""
+    issues = []
+    for category, rules in patterns.items():
+        for rule in rules:
+            if re.search(rule, code, re.IGNORECASE):
+                issues.append(category)
+                break
+    return issues
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=10000, help='Input size in characters')
+    parser.add_argument('--number', type=int, default=50, help='Scans per timing run')
+    args = parser.parse_args()
+    
+    patterns = CodeHandler().security_patterns
+    scanner = SecurityScanner(patterns)
+    
+    print(f"{scanner.rule_count} unique rules in {len(patterns)} categories, {args.size}-character inputs\n")
+    print(f"{'input':<8}{'per-pattern (ms)':>18}{'single-pass (ms)':>18}{'speedup':>10}")
+    
+    for name, block in (('clean', CLEAN_BLOCK), ('risky', RISKY_BLOCK)):
+        code = make_input(block, args.size)
+        
+        # Both scanners must agree on which categories are flagged
+        assert per_pattern_scan(patterns, code) == list(scanner.scan(code)), name
+        
+        baseline = min(timeit.repeat(lambda: per_pattern_scan(patterns, code), number=args.number, repeat=5))
+        combined = min(timeit.repeat(lambda: scanner.scan(code), number=args.number, repeat=5))
+        
+        baseline_ms = baseline / args.number * 1000
+        combined_ms = combined / args.number * 1000
+        print(f"{name:<8}{baseline_ms:>18.3f}{combined_ms:>18.3f}{baseline_ms / combined_ms:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,366 @@
+"""
+Per-stage validation micro-benchmark
+逐語言、逐輸入大小（10 到 10,000 字元）分別量測驗證流程每個階段（解析、長度、語法、安全、複雜度、建議）的耗時，
+並在任一階段相對已存基準退步超過容許範圍時以非零狀態結束
+
+Timings are normalized by a fixed pure-Python calibration loop, so a baseline
+recorded on one machine stays roughly usable on another. Differences below
+--min-delta are treated as noise.
+
+Usage:
+    python benchmarks/bench_validation_stages.py [--repeat 15] [--sizes 10,100,1000,10000] [--languages python,cpp]
+    python benchmarks/bench_validation_stages.py --save-baseline
+    python benchmarks/bench_validation_stages.py --baseline benchmarks/baselines/validation_stages.json --tolerance 0.3
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_handler import CodeHandler, CodeLanguage  # noqa: E402
+from parsed_source import ParsedSource  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'validation_stages.json')
+
+STAGES = ('parse', 'length', 'syntax', 'security', 'complexity', 'suggestions', 'total')
+
+# One self-contained unit per language, repeated to fill each input size
+BLOCKS = {
+    'python': '''def merge_{n}(intervals):
+    # Sort, then merge overlapping ranges
+    intervals.sort(key=lambda pair: pair[0])
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+''',
+    'javascript': '''function merge_{n}(intervals) {
+    // Sort, then merge overlapping ranges
+    intervals.sort((a, b) => a[0] - b[0]);
+    const merged = [];
+    for (const [start, end] of intervals) {
+        if (merged.length && start <= merged[merged.length - 1][1]) {
+            merged[merged.length - 1][1] = Math.max(merged[merged.length - 1][1], end);
+        } else {
+            merged.push([start, end]);
+        }
+    }
+    return merged;
+}
+
+''',
+    'typescript': '''function merge_{n}(intervals: number[][]): number[][] {
+    // Sort, then merge overlapping ranges
+    intervals.sort((a, b) => a[0] - b[0]);
+    const merged: number[][] = [];
+    for (const [start, end] of intervals) {
+        if (merged.length && start <= merged[merged.length - 1][1]) {
+            merged[merged.length - 1][1] = Math.max(merged[merged.length - 1][1], end);
+        } else {
+            merged.push([start, end]);
+        }
+    }
+    return merged;
+}
+
+''',
+    'java': '''    public int maxProfit_{n}(int[] prices) {
+        // Single pass, tracking the lowest price so far
+        int low = Integer.MAX_VALUE, best = 0;
+        for (int price : prices) {
+            if (price < low) {
+                low = price;
+            } else if (price - low > best) {
+                best = price - low;
+            }
+        }
+        return best;
+    }
+
+''',
+    'csharp': '''    public int MaxProfit_{n}(int[] prices) {
+        // Single pass, tracking the lowest price so far
+        int low = int.MaxValue, best = 0;
+        foreach (var price in prices) {
+            if (price < low) {
+                low = price;
+            } else if (price - low > best) {
+                best = price - low;
+            }
+        }
+        return best;
+    }
+
+''',
+    'cpp': '''int maxSubArray_{n}(std::vector<int>& nums) {
+    // Kadane's algorithm
+    int best = nums[0], current = 0;
+    for (int i = 0; i < (int)nums.size(); i++) {
+        current = std::max(nums[i], current + nums[i]);
+        if (current > best) {
+            best = current;
+        }
+    }
+    return best;
+}
+
+''',
+    'c': '''int max_sub_array_{n}(const int *nums, int size) {
+    /* Kadane's algorithm */
+    int best = nums[0], current = 0;
+    for (int i = 0; i < size; i++) {
+        current = current + nums[i] > nums[i] ? current + nums[i] : nums[i];
+        if (current > best) {
+            best = current;
+        }
+    }
+    return best;
+}
+
+''',
+    'go': '''func longest_{n}(s string) int {
+	// Sliding window over the last index of each rune
+	last := map[rune]int{}
+	best, start := 0, 0
+	for i, ch := range s {
+		if j, ok := last[ch]; ok && j >= start {
+			start = j + 1
+		}
+		last[ch] = i
+		if i-start+1 > best {
+			best = i - start + 1
+		}
+	}
+	return best
+}
+
+''',
+    'rust': '''fn longest_{n}(s: &str) -> usize {
+    // Sliding window over the last index of each char
+    let mut last = std::collections::HashMap::new();
+    let (mut best, mut start) = (0, 0);
+    for (i, ch) in s.chars().enumerate() {
+        if let Some(&j) = last.get(&ch) {
+            if j >= start {
+                start = j + 1;
+            }
+        }
+        last.insert(ch, i);
+        best = best.max(i + 1 - start);
+    }
+    best
+}
+
+''',
+    'sql': '''-- Top earners per department ({n})
+SELECT d.name AS department, e.name AS employee, e.salary
+FROM employees e
+JOIN departments d ON d.id = e.department_id
+WHERE e.salary >= (
+    SELECT MAX(salary) * 0.9 FROM employees WHERE department_id = e.department_id
+)
+ORDER BY d.name, e.salary DESC;
+
+'''
+}
+
+WRAPPERS = {
+    'cpp': ('#include <vector>\n#include <algorithm>\n\n', ''),
+    'java': ('class Solution {\n', '}\n'),
+    'csharp': ('public class Solution {\n', '}\n'),
+    'go': ('package main\n\n', '')
+}
+
+COMMENT_PREFIXES = {'python': '# ', 'sql': '-- '}
+
+def make_corpus(language: str, size: int) -> str:
+    """
+    Code of exactly `size` characters for a language
+    
+    Whole blocks are repeated while they fit and the remainder is filled with
+    a comment, so every input is well-formed regardless of size.
+    """
+    head, tail = WRAPPERS.get(language, ('', ''))
+    body = []
+    used = len(head) + len(tail)
+    n = 0
+    while True:
+        block = BLOCKS[language].replace('{n}', str(n))
+        if used + len(block) > size:
+            break
+        body.append(block)
+        used += len(block)
+        n += 1
+    
+    code = head + ''.join(body) + tail if body else ''
+    prefix = COMMENT_PREFIXES.get(language, '// ')
+    remaining = size - len(code)
+    if remaining > len(prefix) + 1:
+        code += prefix + 'x' * (remaining - len(prefix) - 1) + '\n'
+    else:
+        code += '\n' * remaining
+    return code[:size]
+
+def calibrate(repeat: int = 5) -> float:
+    """Milliseconds for a fixed pure-Python workload, used to normalize across machines"""
+    def workload():
+        words = [f'token{i % 97}' for i in range(20000)]
+        counts = {}
+        for word in words:
+            counts[word] = counts.get(word, 0) + 1
+        return sorted(counts.items())
+    
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        workload()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+def warm_source(code: str, language: str) -> ParsedSource:
+    """Parse and materialize the artifacts every stage shares"""
+    source = ParsedSource(code, language)
+    source.tokens
+    if language == CodeLanguage.PYTHON.value:
+        source.python_regions
+    return source
+
+def time_stages(handler: CodeHandler, code: str, language: str, repeat: int) -> dict:
+    """Median milliseconds per stage; every repetition gets a freshly parsed source"""
+    timings = {stage: [] for stage in STAGES}
+    language_enum = handler._get_language_enum(language)
+    
+    for _ in range(repeat):
+        start = time.perf_counter()
+        source = warm_source(code, language)
+        timings['parse'].append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        handler._check_length_limits(source)
+        timings['length'].append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        handler._validate_language_syntax(source, language_enum)
+        timings['syntax'].append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        handler._check_security_issues(code)
+        timings['security'].append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        report = handler._analyze_complexity(source)
+        timings['complexity'].append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        handler._generate_suggestions(source, report)
+        timings['suggestions'].append(time.perf_counter() - start)
+        
+        # _run_validation bypasses the validation cache so every run does the full work
+        start = time.perf_counter()
+        handler._run_validation(code, language)
+        timings['total'].append(time.perf_counter() - start)
+    
+    return {stage: round(statistics.median(values) * 1000, 4) for stage, values in timings.items()}
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float, min_delta: float, normalize: bool) -> list:
+    """Stages slower than the baseline by more than `tolerance` (a fraction) and `min_delta` ms"""
+    scale = results['calibration_ms'] / baseline['calibration_ms'] if normalize else 1.0
+    skip_cpp_syntax = results['cpp_syntax_checker'] != baseline.get('cpp_syntax_checker')
+    regressions = []
+    
+    for language, sizes in results['results'].items():
+        for size, stages in sizes.items():
+            old_stages = baseline['results'].get(language, {}).get(size, {})
+            for stage, new_ms in stages.items():
+                old_ms = old_stages.get(stage)
+                if old_ms is None or (skip_cpp_syntax and language == 'cpp' and stage in ('syntax', 'total')):
+                    continue
+                expected = old_ms * scale
+                if new_ms - expected > min_delta and new_ms > expected * (1 + tolerance):
+                    regressions.append(
+                        f"{language} {size} chars {stage}: {expected:.4f} -> {new_ms:.4f} ms "
+                        f"({new_ms / expected - 1:+.0%})" if expected else
+                        f"{language} {size} chars {stage}: 0 -> {new_ms:.4f} ms"
+                    )
+    
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=15, help='Repetitions per language, size and stage')
+    parser.add_argument('--sizes', default='10,100,1000,10000', help='Comma-separated input sizes in characters')
+    parser.add_argument('--languages', help='Comma-separated languages (default: every CodeLanguage)')
+    parser.add_argument('--json', dest='json_path', help='Also write results to this JSON file')
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, metavar='PATH',
+                        help=f'Store the results as the baseline (default path: {os.path.relpath(DEFAULT_BASELINE)})')
+    parser.add_argument('--baseline', nargs='?', const=DEFAULT_BASELINE, metavar='PATH',
+                        help='Compare against a stored baseline and exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='Allowed slowdown per stage (fraction)')
+    parser.add_argument('--min-delta', type=float, default=0.05, help='Slowdowns below this many ms are ignored')
+    parser.add_argument('--no-normalize', action='store_true', help='Compare raw timings, without calibration')
+    args = parser.parse_args()
+    
+    sizes = [int(size) for size in args.sizes.split(',')]
+    languages = args.languages.split(',') if args.languages else [language.value for language in CodeLanguage]
+    unknown = [language for language in languages if language not in BLOCKS]
+    if unknown:
+        parser.error(f"no corpus for: {', '.join(unknown)}")
+    
+    handler = CodeHandler(validation_workers=0)
+    cpp_checker = handler.clang_pool.get_stats()['backend'] or 'basic'
+    calibration_ms = calibrate()
+    
+    print(f"calibration {calibration_ms:.3f} ms, C++ syntax checker: {cpp_checker}, {args.repeat} repetitions\n")
+    print(f"{'language':<12}{'chars':>7}" + ''.join(f"{stage:>13}" for stage in STAGES) + "   (median ms)")
+    
+    results = {}
+    for language in languages:
+        results[language] = {}
+        for size in sizes:
+            code = make_corpus(language, size)
+            row = time_stages(handler, code, language, args.repeat)
+            results[language][str(size)] = row
+            print(f"{language:<12}{size:>7}" + ''.join(f"{row[stage]:>13.4f}" for stage in STAGES))
+    
+    output = {
+        'calibration_ms': round(calibration_ms, 4),
+        'cpp_syntax_checker': cpp_checker,
+        'repeat': args.repeat,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results
+    }
+    
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+    
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+    
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(output, baseline, args.tolerance, args.min_delta, not args.no_normalize)
+        if regressions:
+            print(f"\n{len(regressions)} stage regression(s) beyond {args.tolerance:.0%} vs {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo stage regressions beyond {args.tolerance:.0%} vs {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,457 @@
+"""
+Interview API load test
+以並行的完整面試流程（start_interview → N × send_message → analyze_code → end_interview）壓測 API，
+回報吞吐量、各路由 p50/p95/p99 延遲、每千場面試的記憶體增長與 CPU 剖析快照，並可與基準結果比對
+
+By default the Flask app runs in this process with the stub LLM backend
+(LLM_BACKEND=stub), so no API key or quota is needed and memory and CPU can
+be measured. With --url the flows go over HTTP to a running server instead;
+memory and profiles are then not available.
+
+Usage:
+    python benchmarks/load_test.py [--sessions 200] [--concurrency 20] [--messages 3]
+                                   [--stub-latency lognormal:0.8,0.4] [--profile]
+                                   [--json out.json] [--baseline old.json --tolerance 0.2]
+    python benchmarks/load_test.py --url http://localhost:5000 [--sessions 200]
+"""
+
+import argparse
+import cProfile
+import gc
+import http.client
+import json
+import logging
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROUTES = ('start_interview', 'send_message', 'analyze_code', 'end_interview')
+
+ANSWERS = [
+    "I have four years of backend experience, mostly Python services and PostgreSQL.",
+    "I would use a hash map from value to index so the lookup is O(1) and the whole pass is O(n).",
+    "The trade-off is extra memory; if memory were tight I would sort and use two pointers instead.",
+    "For testing I would cover empty input, duplicates, negative numbers and the no-solution case.",
+    "In production I would add metrics around the hot path and a cache in front of the database."
+]
+
+CODE = {
+    'python': '''def two_sum(nums, target):
+    seen = {}
+    for index, value in enumerate(nums):
+        if target - value in seen:
+            return [seen[target - value], index]
+        seen[value] = index
+    return []
+''',
+    'javascript': '''function twoSum(nums, target) {
+    const seen = new Map();
+    for (let i = 0; i < nums.length; i++) {
+        if (seen.has(target - nums[i])) {
+            return [seen.get(target - nums[i]), i];
+        }
+        seen.set(nums[i], i);
+    }
+    return [];
+}
+''',
+    'cpp': '''#include <vector>
+#include <unordered_map>
+
+std::vector<int> twoSum(std::vector<int>& nums, int target) {
+    std::unordered_map<int, int> seen;
+    for (int i = 0; i < (int)nums.size(); i++) {
+        auto it = seen.find(target - nums[i]);
+        if (it != seen.end()) {
+            return {it->second, i};
+        }
+        seen[nums[i]] = i;
+    }
+    return {};
+}
+'''
+}
+
+class InProcessClient:
+    """Calls the Flask app through its test client, one client per worker thread"""
+    
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+    
+    def post(self, path: str, payload: Dict) -> Tuple[int, Dict]:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.post(path, json=payload)
+        return response.status_code, response.get_json(silent=True) or {}
+
+class HttpClient:
+    """Calls a running server over HTTP, one keep-alive connection per worker thread"""
+    
+    def __init__(self, url: str, timeout: float):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        self.https = parsed.scheme == 'https'
+        self.prefix = parsed.path.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+    
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.host, self.port, timeout=self.timeout)
+        return conn
+    
+    def post(self, path: str, payload: Dict) -> Tuple[int, Dict]:
+        body = json.dumps(payload).encode('utf-8')
+        conn = self._connection()
+        try:
+            conn.request('POST', self.prefix + path, body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            raw = response.read()
+        except (OSError, http.client.HTTPException):
+            # Drop the broken connection; the next request opens a new one
+            conn.close()
+            self._local.conn = None
+            raise
+        try:
+            return response.status, json.loads(raw) if raw else {}
+        except ValueError:
+            return response.status, {}
+
+class Recorder:
+    """Thread-safe per-route latency and error collection"""
+    
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {route: [] for route in ROUTES}
+        self.errors: Dict[str, int] = {route: 0 for route in ROUTES}
+        self._lock = threading.Lock()
+    
+    def record(self, route: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+def call(client, recorder: Optional[Recorder], route: str, payload: Dict) -> Dict:
+    """POST to /api/<route>, recording latency and whether it succeeded"""
+    start = time.perf_counter()
+    try:
+        status, body = client.post(f'/api/{route}', payload)
+        ok = status == 200 and bool(body.get('success'))
+    except Exception:
+        body, ok = {}, False
+    if recorder is not None:
+        recorder.record(route, time.perf_counter() - start, ok)
+    return body if ok else {}
+
+def run_flow(client, recorder: Optional[Recorder], index: int, messages: int, language: str) -> bool:
+    """One interview: start, answer `messages` times, submit code, end; True when every step succeeded"""
+    started = call(client, recorder, 'start_interview', {
+        'type': 'technical',
+        'candidate_name': f'load-test-{index}',
+        'position': 'Backend Engineer',
+        'difficulty_level': 'medium'
+    })
+    session_id = started.get('session_id')
+    if not session_id:
+        return False
+    
+    ok = True
+    for turn in range(messages):
+        answer = ANSWERS[(index + turn) % len(ANSWERS)]
+        ok &= bool(call(client, recorder, 'send_message', {'session_id': session_id, 'message': answer}))
+    ok &= bool(call(client, recorder, 'analyze_code', {
+        'session_id': session_id, 'code': CODE[language], 'language': language
+    }))
+    ok &= bool(call(client, recorder, 'end_interview', {'session_id': session_id}))
+    return ok
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = min(max(1, math.ceil(p / 100 * len(sorted_values))), len(sorted_values))
+    return sorted_values[rank - 1]
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+class FlowProfiler:
+    """
+    Per-flow CPU profiles merged into snapshots
+    
+    Each flow runs under its own cProfile timed with thread CPU time, so
+    sleeping in the stub backend and waiting on other threads is not counted.
+    Work handed to other threads (background evaluation, sandboxed runs) is
+    not included either.
+    """
+    
+    def __init__(self, top: int, dump_dir: Optional[str]):
+        self.top = top
+        self.dump_dir = dump_dir
+        self._pending: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._snapshots = 0
+    
+    def run(self, func, *args):
+        profile = cProfile.Profile(time.thread_time)
+        profile.enable()
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._pending.append(profile)
+    
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """Merge the flows finished since the last snapshot; top functions by own and cumulative CPU time"""
+        with self._lock:
+            profiles, self._pending = self._pending, []
+        if not profiles:
+            return None
+        
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        
+        self._snapshots += 1
+        dump_path = None
+        if self.dump_dir:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            dump_path = os.path.join(self.dump_dir, f'snapshot_{self._snapshots:03d}.prof')
+            stats.dump_stats(dump_path)
+        
+        rows = [
+            {
+                'function': f'{os.path.basename(filename)}:{line}({name})',
+                'calls': calls,
+                'self_s': round(tottime, 6),
+                'cumulative_s': round(cumtime, 6)
+            }
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items()
+        ]
+        return {
+            'flows': len(profiles),
+            'total_cpu_s': round(stats.total_tt, 6),
+            'top_self': sorted(rows, key=lambda row: row['self_s'], reverse=True)[:self.top],
+            'top_cumulative': sorted(rows, key=lambda row: row['cumulative_s'], reverse=True)[:self.top],
+            'dump': dump_path
+        }
+
+def create_in_process_client(args) -> InProcessClient:
+    """Import the app with the stub backend configured and start its services"""
+    # Config reads the environment at import time
+    os.environ.setdefault('LLM_BACKEND', 'stub')
+    if args.stub_latency:
+        os.environ['LLM_STUB_LATENCY'] = args.stub_latency
+    if args.stub_token_rate is not None:
+        os.environ['LLM_STUB_TOKEN_RATE'] = str(args.stub_token_rate)
+    if args.stub_failure_rate is not None:
+        os.environ['LLM_STUB_FAILURE_RATE'] = str(args.stub_failure_rate)
+    if args.seed is not None:
+        os.environ['LLM_STUB_SEED'] = str(args.seed)
+    
+    import main  # noqa: E402
+    
+    main.init_services()
+    logging.getLogger().setLevel(getattr(logging, args.log_level.upper()))
+    if main.interview_manager is None:
+        raise SystemExit("Services failed to initialize; see the log above")
+    return InProcessClient(main.app)
+
+def run_load(client, args, profiler: Optional[FlowProfiler]) -> Dict[str, Any]:
+    """Run the measured flows and collect latency, memory and profile checkpoints"""
+    recorder = Recorder()
+    checkpoints = []
+    completed = failed = 0
+    
+    def flow(index: int) -> bool:
+        if profiler:
+            return profiler.run(run_flow, client, recorder, index, args.messages, args.language)
+        return run_flow(client, recorder, index, args.messages, args.language)
+    
+    gc.collect()
+    rss_start = rss_bytes() if not args.url else None
+    start = time.perf_counter()
+    
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix='load') as executor:
+        futures = [executor.submit(flow, index) for index in range(args.sessions)]
+        for future in as_completed(futures):
+            completed += 1
+            if not future.result():
+                failed += 1
+            
+            if completed % args.checkpoint_every == 0 or completed == args.sessions:
+                checkpoint = {'sessions': completed, 'elapsed_s': round(time.perf_counter() - start, 3)}
+                if rss_start is not None:
+                    gc.collect()
+                    checkpoint['rss_mb'] = round(rss_bytes() / 2 ** 20, 2)
+                if profiler:
+                    checkpoint['profile'] = profiler.snapshot()
+                checkpoints.append(checkpoint)
+    
+    elapsed = time.perf_counter() - start
+    requests = sum(len(values) for values in recorder.latencies.values())
+    
+    routes = {}
+    for route in ROUTES:
+        values = sorted(recorder.latencies[route])
+        routes[route] = {
+            'requests': len(values),
+            'errors': recorder.errors[route],
+            'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+            'p50_ms': round(percentile(values, 50) * 1000, 3),
+            'p95_ms': round(percentile(values, 95) * 1000, 3),
+            'p99_ms': round(percentile(values, 99) * 1000, 3),
+            'max_ms': round(values[-1] * 1000, 3) if values else 0.0
+        }
+    
+    memory = None
+    if rss_start is not None:
+        rss_end = checkpoints[-1]['rss_mb'] * 2 ** 20 if checkpoints else rss_bytes()
+        memory = {
+            'rss_start_mb': round(rss_start / 2 ** 20, 2),
+            'rss_end_mb': round(rss_end / 2 ** 20, 2),
+            'growth_per_1k_sessions_mb': round((rss_end - rss_start) / 2 ** 20 / max(completed, 1) * 1000, 2)
+        }
+    
+    return {
+        'sessions': completed,
+        'failed_sessions': failed,
+        'elapsed_s': round(elapsed, 3),
+        'throughput': {
+            'sessions_per_s': round(completed / elapsed, 3),
+            'requests_per_s': round(requests / elapsed, 3)
+        },
+        'routes': routes,
+        'memory': memory,
+        'checkpoints': checkpoints
+    }
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions beyond `tolerance` (a fraction) against a previous results file"""
+    regressions = []
+    
+    def worse(name: str, old: Optional[float], new: Optional[float], higher_is_worse: bool = True):
+        if not old or new is None:
+            return
+        change = (new - old) / old if higher_is_worse else (old - new) / old
+        if change > tolerance:
+            regressions.append(f"{name}: {old} -> {new} ({change:+.0%})")
+    
+    for route, row in results['routes'].items():
+        old = baseline.get('routes', {}).get(route, {})
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            worse(f"{route} {key}", old.get(key), row[key])
+    
+    worse('sessions_per_s', baseline.get('throughput', {}).get('sessions_per_s'),
+          results['throughput']['sessions_per_s'], higher_is_worse=False)
+    
+    if results['memory'] and baseline.get('memory'):
+        worse('growth_per_1k_sessions_mb', baseline['memory'].get('growth_per_1k_sessions_mb'),
+              results['memory']['growth_per_1k_sessions_mb'])
+    
+    return regressions
+
+def print_report(results: Dict[str, Any]):
+    throughput = results['throughput']
+    print(f"\n{results['sessions']} sessions ({results['failed_sessions']} failed) in {results['elapsed_s']:.2f}s: "
+          f"{throughput['sessions_per_s']:.2f} sessions/s, {throughput['requests_per_s']:.2f} requests/s\n")
+    print(f"{'route':<18}{'requests':>10}{'errors':>8}{'p50 (ms)':>12}{'p95 (ms)':>12}{'p99 (ms)':>12}{'max (ms)':>12}")
+    for route, row in results['routes'].items():
+        print(f"{route:<18}{row['requests']:>10}{row['errors']:>8}{row['p50_ms']:>12.2f}"
+              f"{row['p95_ms']:>12.2f}{row['p99_ms']:>12.2f}{row['max_ms']:>12.2f}")
+    
+    memory = results['memory']
+    if memory:
+        print(f"\nRSS {memory['rss_start_mb']:.1f} MB -> {memory['rss_end_mb']:.1f} MB "
+              f"({memory['growth_per_1k_sessions_mb']:+.2f} MB per 1k sessions)")
+    
+    profiles = [checkpoint['profile'] for checkpoint in results['checkpoints'] if checkpoint.get('profile')]
+    if profiles:
+        print(f"\nTop CPU (self) over the last {profiles[-1]['flows']} flows:")
+        for row in profiles[-1]['top_self'][:10]:
+            print(f"  {row['self_s'] * 1000:>10.1f} ms  {row['calls']:>8}  {row['function']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=200, help='Interview flows to run')
+    parser.add_argument('--concurrency', type=int, default=20, help='Flows in flight at once')
+    parser.add_argument('--messages', type=int, default=3, help='send_message calls per flow')
+    parser.add_argument('--language', choices=sorted(CODE), default='python', help='Language of the submitted code')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured flows run first')
+    parser.add_argument('--checkpoint-every', type=int, default=250, help='Sessions between memory/profile checkpoints')
+    parser.add_argument('--url', help='Base URL of a running server (default: in-process app with the stub backend)')
+    parser.add_argument('--timeout', type=float, default=60, help='HTTP timeout in seconds (--url only)')
+    parser.add_argument('--stub-latency', help='LLM_STUB_LATENCY for the in-process app, e.g. fixed:0.05')
+    parser.add_argument('--stub-token-rate', type=float, help='LLM_STUB_TOKEN_RATE for the in-process app')
+    parser.add_argument('--stub-failure-rate', type=float, help='LLM_STUB_FAILURE_RATE for the in-process app')
+    parser.add_argument('--seed', type=int, help='LLM_STUB_SEED for reproducible stub latencies and replies')
+    parser.add_argument('--profile', action='store_true', help='Record CPU profile snapshots (in-process only)')
+    parser.add_argument('--profile-top', type=int, default=25, help='Functions kept per profile snapshot')
+    parser.add_argument('--profile-dir', help='Also write each snapshot as a .prof file here')
+    parser.add_argument('--log-level', default='warning', help='App log level during the run')
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='Results JSON of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed regression vs the baseline (fraction)')
+    args = parser.parse_args()
+    
+    if args.sessions < 1 or args.concurrency < 1 or args.checkpoint_every < 1:
+        parser.error('--sessions, --concurrency and --checkpoint-every must be positive')
+    if args.url and args.profile:
+        parser.error('--profile needs the in-process app; it cannot profile a remote server')
+    
+    client = HttpClient(args.url, args.timeout) if args.url else create_in_process_client(args)
+    profiler = FlowProfiler(args.profile_top, args.profile_dir) if args.profile else None
+    
+    for index in range(args.warmup):
+        run_flow(client, None, -1 - index, args.messages, args.language)
+    
+    results = run_load(client, args, profiler)
+    results['config'] = {
+        'target': args.url or 'in-process',
+        'llm_backend': os.environ.get('LLM_BACKEND') if not args.url else None,
+        'stub_latency': os.environ.get('LLM_STUB_LATENCY') if not args.url else None,
+        'sessions': args.sessions,
+        'concurrency': args.concurrency,
+        'messages': args.messages,
+        'language': args.language,
+        'profiled': args.profile,
+        'timestamp': time.time()
+    }
+    print_report(results)
+    
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%} vs {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} vs {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+Chat Sessions for AI Interview Simulator
+以 Gemini 多輪對話（chat）進行面試：面試官指示只設定一次，每輪只送出候選人的新回答，聊天物件遺失時由會話紀錄重建
+"""
+
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from context_builder import SYSTEM_PREFIX, estimate_tokens
+from llm_backends import ChatHistory, LLMBackend, LLMChat
+
+logger = logging.getLogger(__name__)
+
+CANDIDATE_PREFIX = "Candidate: "
+INTERVIEWER_PREFIX = "Interviewer: "
+
+# Sent as the first user turn when the model takes the instructions as a system instruction
+KICKOFF_MESSAGE = "請開始面試。"
+
+# Appended to the interview prompt, replacing the per-answer follow-up prompt of the flat path
+TURN_GUIDANCE = """
+面試進行中，候選人的每則訊息都是對上一個問題的回答。請根據候選人的回答：
+1. 給予簡短但建設性的回饋
+2. 提出相關的追問或下一個問題
+3. 保持面試的連續性和深度
+4. 如果回答不夠詳細，請要求更多細節
+
+回應應該專業且友善。
+"""
+
+# How often a coroutine waiting for a session's chat retries the lock
+LOCK_POLL_SECONDS = 0.01
+
+class ChatSessions:
+    """
+    Process-local backend chat objects, one per interview session
+    
+    Chat objects hold live SDK state and cannot go into a SessionStore, so
+    they live in this process only; a session whose chat is missing (another
+    worker, a restart, or a chat dropped after a failed call) gets one
+    rebuilt from its history entries. With backends that accept a system
+    instruction the interview prompt is set once per chat; otherwise it is
+    the chat's opening user turn. Either way a turn
+    adds only the candidate's message. Older exchanges are dropped from a
+    chat once it exceeds the interview type's token budget, keeping the
+    opening exchange.
+    
+    Each chat records how many history entries it reflects. A chat whose
+    count differs from the history a caller passes (a turn handled by the
+    flat path or by another worker, or a reply that never reached the
+    history) is rebuilt instead of reused. Callers hold `serialized(session_id)`
+    (or `serialized_async`) around get, send and commit, so two requests of
+    one session cannot interleave turns on the same chat.
+    
+    If the backend offers no chats at all, `get` returns None and callers use
+    the flat prompt path.
+    """
+    
+    def __init__(self,
+                 backend: LLMBackend,
+                 instructions_for: Callable[[str], str],
+                 budget_for: Callable[[Optional[str]], int],
+                 enabled: bool = True):
+        """
+        Initialize chat sessions
+        
+        Args:
+            backend: Backend that opens the chats
+            instructions_for: Interview prompt of an interview type
+            budget_for: Token budget of a chat's history per interview type
+            enabled: False to always use the flat prompt path
+        """
+        self.backend = backend
+        self.instructions_for = instructions_for
+        self.budget_for = budget_for
+        self.supported = enabled and backend.supports_chat
+        self.system_instruction = backend.supports_system_instruction
+        
+        self._chats: Dict[str, LLMChat] = {}
+        self._entries: Dict[str, int] = {}          # History entries each chat reflects
+        self._session_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        
+        # Statistics
+        self.opened = 0
+        self.rebuilt = 0
+        self.stale = 0
+        self.discarded = 0
+        self.trimmed_turns = 0
+    
+    def instructions(self, interview_type: str) -> str:
+        """Full interviewer instructions of an interview type"""
+        return f"{self.instructions_for(interview_type).strip()}\n{TURN_GUIDANCE}"
+    
+    def opening_message(self, interview_type: str) -> str:
+        """First user turn of a chat"""
+        if self.system_instruction:
+            return KICKOFF_MESSAGE
+        return self.instructions(interview_type)
+    
+    @contextmanager
+    def serialized(self, session_id: str) -> Iterator[None]:
+        """Hold the session's chat lock for one turn"""
+        with self._lock_for(session_id):
+            yield
+    
+    @asynccontextmanager
+    async def serialized_async(self, session_id: str) -> AsyncIterator[None]:
+        """
+        serialized() for coroutines
+        
+        The lock is shared with synchronous callers, so it is polled rather
+        than waited on; blocking would stall the whole event loop.
+        """
+        lock = self._lock_for(session_id)
+        while not lock.acquire(blocking=False):
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            lock.release()
+    
+    def get(self, session_id: str, interview_type: str, history: List[str]) -> Optional[LLMChat]:
+        """
+        Get the session's chat, rebuilding it from history if this process has
+        none or its chat does not reflect exactly these history entries
+        
+        Args:
+            session_id: Session identifier
+            interview_type: Interview type of the session
+            history: Session history entries the chat should already contain
+        
+        Returns:
+            Chat object, or None when chats are not supported
+        """
+        if not self.supported:
+            return None
+        
+        with self._lock:
+            chat = self._chats.get(session_id)
+            if chat is not None:
+                if self._entries.get(session_id) == len(history):
+                    return chat
+                self.stale += 1
+        
+        try:
+            chat = self.backend.start_chat(
+                self._history_to_contents(interview_type, history),
+                system_instruction=self.instructions(interview_type) if self.system_instruction else None
+            )
+            self.trim(chat, interview_type)
+        except NotImplementedError as e:
+            logger.warning(f"Gemini chat sessions unavailable, using flat prompts: {e}")
+            self.supported = False
+            return None
+        
+        with self._lock:
+            self._chats[session_id] = chat
+            self._entries[session_id] = len(history)
+            if history:
+                self.rebuilt += 1
+            else:
+                self.opened += 1
+        return chat
+    
+    def commit(self, session_id: str, chat: LLMChat, interview_type: str, entries: int):
+        """
+        Record a completed turn
+        
+        Args:
+            session_id: Session identifier
+            chat: Chat the turn was sent on
+            interview_type: Interview type of the session
+            entries: History entries the chat reflects once the caller has
+                     stored the turn (typically the history passed to get plus 2)
+        """
+        self.trim(chat, interview_type)
+        with self._lock:
+            if self._chats.get(session_id) is chat:
+                self._entries[session_id] = entries
+    
+    def trim(self, chat: LLMChat, interview_type: str):
+        """Drop the oldest exchanges after the opening one while the chat is over budget"""
+        contents = chat.history
+        budget = self.budget_for(interview_type)
+        tokens = [sum(estimate_tokens(part) for part in content['parts']) for content in contents]
+        total = sum(tokens)
+        start = 2
+        while total > budget and len(contents) - start > 2:
+            # Exchanges are user/model pairs, so dropping two keeps the roles alternating
+            total -= tokens[start] + tokens[start + 1]
+            start += 2
+        if start > 2:
+            chat.history = contents[:2] + contents[start:]
+            self.trimmed_turns += start - 2
+    
+    def discard(self, session_id: str):
+        """Forget a session's chat; it is rebuilt from history on next use"""
+        with self._lock:
+            self._entries.pop(session_id, None)
+            if self._chats.pop(session_id, None) is not None:
+                self.discarded += 1
+    
+    def close(self, session_id: str):
+        """Forget a session's chat and lock once the session has ended"""
+        self.discard(session_id)
+        with self._lock:
+            self._session_locks.pop(session_id, None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get chat session statistics"""
+        with self._lock:
+            active = len(self._chats)
+        return {
+            'supported': self.supported,
+            'system_instruction': self.system_instruction,
+            'active_chats': active,
+            'opened': self.opened,
+            'rebuilt': self.rebuilt,
+            'stale': self.stale,
+            'discarded': self.discarded,
+            'trimmed_turns': self.trimmed_turns
+        }
+    
+    def _lock_for(self, session_id: str) -> threading.Lock:
+        with self._lock:
+            lock = self._session_locks.get(session_id)
+            if lock is None:
+                lock = self._session_locks[session_id] = threading.Lock()
+            return lock
+    
+    def _history_to_contents(self, interview_type: str, history: List[str]) -> ChatHistory:
+        """Chat turns equivalent to session history entries"""
+        contents: ChatHistory = []
+        for entry in history:
+            if entry.startswith(SYSTEM_PREFIX):
+                role, text = 'user', self.opening_message(interview_type)
+            elif entry.startswith(CANDIDATE_PREFIX):
+                role, text = 'user', entry[len(CANDIDATE_PREFIX):]
+            elif entry.startswith(INTERVIEWER_PREFIX):
+                role, text = 'model', entry[len(INTERVIEWER_PREFIX):]
+            else:
+                continue
+            
+            # Turns must alternate; a turn whose reply failed merges into the next one
+            if contents and contents[-1]['role'] == role:
+                contents[-1]['parts'][0] += f"\n{text}"
+            else:
+                contents.append({'role': role, 'parts': [text]})
+        
+        if contents and contents[0]['role'] == 'model':
+            contents.insert(0, {'role': 'user', 'parts': [self.opening_message(interview_type)]})
+        return contents
@@ -0,0 +1,271 @@
+"""
+Clang Syntax-Check Pool for AI Interview Simulator
+C++ 語法檢查池：優先使用常駐的 libclang，否則經由 stdin 呼叫 clang++，並以預編譯標頭加速常見 STL 引入
+"""
+
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import threading
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from metrics import CLANG_CHECK_SECONDS
+
+try:
+    from clang import cindex
+except ImportError:  # libclang bindings are optional
+    cindex = None
+
+logger = logging.getLogger(__name__)
+
+CHECK_TIMEOUT_WARNING = "C++ 語法檢查超時"
+CHECK_FAILED_WARNING = "C++ 語法檢查過程中發生問題"
+
+# Headers baked into the precompiled header; code including only these can use it
+COMMON_STL_HEADERS = (
+    'algorithm', 'array', 'bitset', 'cassert', 'climits', 'cmath', 'cstdint', 'cstdio',
+    'cstring', 'deque', 'functional', 'iomanip', 'iostream', 'iterator', 'limits', 'list',
+    'map', 'memory', 'numeric', 'queue', 'set', 'sstream', 'stack', 'string', 'tuple',
+    'unordered_map', 'unordered_set', 'utility', 'vector'
+)
+
+_INCLUDE_PATTERN = re.compile(r'^\s*#\s*include\s*([<"])([^>"]+)[>"]', re.MULTILINE)
+
+class ClangPool:
+    """
+    Bounded pool of C++ syntax checks
+    
+    With the libclang Python bindings installed, each worker thread keeps a
+    clang Index in-process and parses submissions from memory, so no process
+    is started per check. Otherwise clang++ is run with the source piped over
+    stdin, so no temp file is written. Either way, code whose #includes all come
+    from COMMON_STL_HEADERS (or <bits/stdc++.h> when the toolchain has it)
+    is checked against a precompiled header built once in the background,
+    which removes most of the header-parsing cost. At most `max_concurrency`
+    checks run at once; further callers wait their turn.
+    """
+    
+    def __init__(self,
+                 max_concurrency: int = 4,
+                 std: str = 'c++17',
+                 pch_dir: Optional[str] = None,
+                 timeout: float = 10,
+                 binary: str = 'clang++'):
+        """
+        Initialize clang pool
+        
+        Args:
+            max_concurrency: Maximum number of simultaneous checks
+            std: C++ language standard
+            pch_dir: Directory for the precompiled header (None disables it)
+            timeout: Seconds allowed per check
+            binary: clang++ executable used for subprocess checks and PCH builds
+        """
+        self.std = std
+        self.pch_dir = pch_dir
+        self.timeout = timeout
+        self.binary = binary
+        
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._local = threading.local()
+        self._pch_path: Optional[str] = None
+        self._pch_headers: FrozenSet[str] = frozenset()
+        self._pch_thread: Optional[threading.Thread] = None
+        
+        self.binary_version = self._detect_binary()
+        self.uses_libclang = cindex is not None and self._libclang_loads()
+        self.available = self.uses_libclang or self.binary_version is not None
+        
+        # Statistics
+        self.checks = 0
+        self.pch_checks = 0
+        self.timeouts = 0
+    
+    def start(self):
+        """Build (or reuse) the precompiled header in the background"""
+        if not self.available or not self.pch_dir or self.binary_version is None:
+            return
+        if self._pch_thread is not None:
+            return
+        
+        self._pch_thread = threading.Thread(target=self._build_pch, name='clang-pch-build', daemon=True)
+        self._pch_thread.start()
+    
+    def check(self, code: str) -> Tuple[List[str], List[str]]:
+        """
+        Syntax-check C++ code
+        
+        Args:
+            code: C++ source code
+        
+        Returns:
+            Tuple of (errors, warnings)
+        """
+        pch_path = self._pch_path if self._can_use_pch(code) else None
+        
+        with self._slots:
+            self.checks += 1
+            if pch_path:
+                self.pch_checks += 1
+            
+            backend = 'libclang' if self.uses_libclang else 'subprocess'
+            try:
+                with CLANG_CHECK_SECONDS.labels(backend, 'yes' if pch_path else 'no').time():
+                    if self.uses_libclang:
+                        return self._check_with_libclang(code, pch_path)
+                    return self._check_with_subprocess(code, pch_path)
+            
+            except subprocess.TimeoutExpired:
+                self.timeouts += 1
+                return [], [CHECK_TIMEOUT_WARNING]
+            except Exception as e:
+                logger.warning(f"Error using clang for C++ validation: {e}")
+                return [], [CHECK_FAILED_WARNING]
+    
+    def get_stats(self) -> Dict[str, object]:
+        """Get pool statistics"""
+        return {
+            'backend': 'libclang' if self.uses_libclang else ('subprocess' if self.available else None),
+            'pch_ready': self._pch_path is not None,
+            'checks': self.checks,
+            'pch_checks': self.pch_checks,
+            'timeouts': self.timeouts
+        }
+    
+    def _base_args(self, pch_path: Optional[str]) -> List[str]:
+        """Compiler arguments shared by both backends"""
+        args = ['-x', 'c++', f'-std={self.std}', '-Wall']
+        if pch_path:
+            args += ['-include-pch', pch_path]
+        return args
+    
+    def _check_with_subprocess(self, code: str, pch_path: Optional[str]) -> Tuple[List[str], List[str]]:
+        """Run clang++ -fsyntax-only with the source on stdin"""
+        result = subprocess.run(
+            [self.binary, '-fsyntax-only', *self._base_args(pch_path), '-'],
+            input=code, capture_output=True, text=True, timeout=self.timeout
+        )
+        
+        errors = []
+        warnings = []
+        for line in result.stderr.strip().split('\n') if result.stderr else []:
+            if 'error:' in line:
+                errors.append(f"C++ 語法錯誤: {line.split('error:')[-1].strip()}")
+            elif 'warning:' in line:
+                warnings.append(f"C++ 警告: {line.split('warning:')[-1].strip()}")
+        
+        # If no errors from clang, but return code is not 0
+        if result.returncode != 0 and not errors:
+            errors.append("C++ 程式碼包含語法錯誤")
+        
+        return errors, warnings
+    
+    def _check_with_libclang(self, code: str, pch_path: Optional[str]) -> Tuple[List[str], List[str]]:
+        """Parse the source in-process with this thread's clang Index"""
+        index = getattr(self._local, 'index', None)
+        if index is None:
+            index = cindex.Index.create()
+            self._local.index = index
+        
+        translation_unit = index.parse(
+            'submission.cpp',
+            args=self._base_args(pch_path),
+            unsaved_files=[('submission.cpp', code)]
+        )
+        
+        errors = []
+        warnings = []
+        for diagnostic in translation_unit.diagnostics:
+            if diagnostic.severity >= cindex.Diagnostic.Error:
+                errors.append(f"C++ 語法錯誤: {diagnostic.spelling}")
+            elif diagnostic.severity == cindex.Diagnostic.Warning:
+                warnings.append(f"C++ 警告: {diagnostic.spelling}")
+        
+        return errors, warnings
+    
+    def _can_use_pch(self, code: str) -> bool:
+        """Whether every #include in the code is covered by the precompiled header"""
+        if self._pch_path is None:
+            return False
+        for delimiter, header in _INCLUDE_PATTERN.findall(code):
+            if delimiter != '<' or header.strip() not in self._pch_headers:
+                return False
+        return True
+    
+    def _detect_binary(self) -> Optional[str]:
+        """Return the clang++ version string, or None if it cannot be run"""
+        try:
+            result = subprocess.run([self.binary, '--version'], capture_output=True, text=True, timeout=5)
+            return result.stdout.strip() if result.returncode == 0 else None
+        except (OSError, subprocess.SubprocessError):
+            return None
+    
+    def _libclang_loads(self) -> bool:
+        """Whether the libclang shared library can actually be loaded"""
+        try:
+            cindex.Index.create()
+            return True
+        except Exception as e:
+            logger.info(f"libclang bindings present but unusable, using clang++ subprocess: {e}")
+            return False
+    
+    def _build_pch(self):
+        """Compile the common-header PCH, preferring <bits/stdc++.h> when it exists"""
+        candidates = [
+            ('bits/stdc++.h', *COMMON_STL_HEADERS),
+            COMMON_STL_HEADERS
+        ]
+        
+        try:
+            os.makedirs(self.pch_dir, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not create PCH directory {self.pch_dir}: {e}")
+            return
+        
+        for headers in candidates:
+            source = ''.join(f'#include <{header}>\n' for header in headers)
+            # Key the file on toolchain and contents so an upgraded clang never loads a stale PCH
+            fingerprint = hashlib.sha1(f'{self.binary_version}\n{self.std}\n{source}'.encode('utf-8')).hexdigest()[:12]
+            header_path = os.path.join(self.pch_dir, f'common-{fingerprint}.hpp')
+            pch_path = header_path + '.pch'
+            
+            if not os.path.exists(pch_path):
+                # Per-process temp names: validation workers may build the same PCH concurrently
+                temp_header = f'{header_path}.{os.getpid()}.tmp'
+                temp_path = f'{pch_path}.{os.getpid()}.tmp'
+                try:
+                    with open(temp_header, 'w', encoding='utf-8') as f:
+                        f.write(source)
+                    os.replace(temp_header, header_path)
+                    result = subprocess.run(
+                        [self.binary, '-x', 'c++-header', f'-std={self.std}', '-Wall',
+                         header_path, '-o', temp_path],
+                        capture_output=True, text=True, timeout=120
+                    )
+                    if result.returncode != 0:
+                        self._remove_temp_files(temp_header, temp_path)
+                        continue
+                    os.replace(temp_path, pch_path)
+                except (OSError, subprocess.SubprocessError) as e:
+                    logger.warning(f"Could not build precompiled header: {e}")
+                    self._remove_temp_files(temp_header, temp_path)
+                    continue
+            
+            self._pch_headers = frozenset(headers)
+            self._pch_path = pch_path
+            logger.info(f"Clang precompiled header ready: {pch_path}")
+            return
+        
+        logger.warning("Clang precompiled header unavailable; checking without it")
+    
+    def _remove_temp_files(self, *paths: str):
+        """Delete leftovers of a failed PCH build"""
+        for path in paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove {path}: {e}")
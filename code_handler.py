@@ -4,19 +4,35 @@ Code Handler Module for AI Interview Simulator
 """
 
 import re
-import ast
 import logging
-import subprocess
-import tempfile
-import os
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, field
 from enum import Enum
 import time
 import hashlib
+from clang_pool import CHECK_FAILED_WARNING, CHECK_TIMEOUT_WARNING, ClangPool
+from complexity import ComplexityReport, analyze_complexity
+from parsed_source import ParsedSource
+from config import Config
+from incremental import apply_edits, apply_text_edits, parse_edits
+from metrics import VALIDATION_STAGE_SECONDS
+from response_cache import ResponseCache, estimate_size
+from security_scanner import SecurityScanner
+from session_reaper import SessionReaper
+from validation_pool import ValidationPool, ValidationQueueFull
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever validation rules change so cached results are not reused
+VALIDATOR_VERSION = 4
+
+VALIDATION_TIMEOUT_ERROR = "程式碼驗證超時，請稍後再試"
+
+# Warnings caused by the checker failing rather than by the code; such results are not cached
+TRANSIENT_VALIDATION_WARNINGS = frozenset({CHECK_TIMEOUT_WARNING, CHECK_FAILED_WARNING})
+
 class CodeLanguage(Enum):
     """Supported programming languages"""
     PYTHON = "python"
@@ -42,6 +58,7 @@ class CodeValidationResult:
     complexity_score: int
     security_issues: List[str]
     suggestions: List[str]
+    function_metrics: List[Dict[str, Any]] = field(default_factory=list)
 
 @dataclass
 class CodeSnippet:
@@ -61,10 +78,45 @@ class CodeHandler:
     處理程式碼輸入、驗證、格式化和安全檢查
     """
     
-    def __init__(self):
-        """Initialize code handler"""
+    def __init__(self, validation_workers: Optional[int] = None):
+        """
+        Initialize code handler
+        
+        Args:
+            validation_workers: Worker processes for validation
+                                (defaults to Config.VALIDATION_WORKERS; 0 validates inline)
+        """
         self.code_snippets: Dict[str, CodeSnippet] = {}
         
+        # session_id -> snippet IDs in insertion order (dict used as an ordered set)
+        self.session_index: Dict[str, Dict[str, None]] = {}
+        self._snippet_lock = threading.Lock()
+        
+        # Validation results keyed on (language, code hash, validator version)
+        self.validation_cache = ResponseCache(
+            max_entries=Config.VALIDATION_CACHE_MAX_ENTRIES,
+            max_bytes=Config.VALIDATION_CACHE_MAX_BYTES,
+            ttl_seconds=None,
+            size_fn=lambda result: estimate_size(asdict(result))
+        )
+        
+        # CPU-heavy validation runs in worker processes when enabled
+        self.validation_pool = ValidationPool(
+            max_workers=Config.VALIDATION_WORKERS if validation_workers is None else validation_workers,
+            max_queue=Config.VALIDATION_QUEUE_LIMIT,
+            timeout=Config.VALIDATION_TIMEOUT
+        )
+        
+        # Parsed editor buffers that edits can be applied to, least recently used first
+        self.documents: "OrderedDict[str, ParsedSource]" = OrderedDict()
+        self.max_documents = Config.INCREMENTAL_MAX_DOCUMENTS
+        self._document_lock = threading.Lock()
+        self.incremental_validations = 0
+        
+        # Snippets of a session are dropped once it has stored nothing for a while
+        self.snippet_retention = Config.SNIPPET_RETENTION
+        self.reaper = SessionReaper(self.remove_session_snippets, interval=Config.REAPER_INTERVAL, name='snippet-reaper')
+        
         # Configuration limits
         self.max_code_length = 10000  # Maximum characters
         self.max_lines = 500          # Maximum lines
@@ -112,8 +164,16 @@ class CodeHandler:
             ]
         }
         
-        # Check if clang is available for C++ validation
-        self.clang_available = self._check_clang_availability()
+        # All security rules compiled once into a single-pass scanner
+        self.security_scanner = SecurityScanner(self.security_patterns)
+        
+        # Long-lived clang checker for C++ validation (libclang or clang++ over stdin)
+        self.clang_pool = ClangPool(
+            max_concurrency=Config.CLANG_MAX_CONCURRENCY,
+            pch_dir=Config.CLANG_PCH_DIR
+        )
+        self.clang_available = self.clang_pool.available
+        self.clang_pool.start()
         
         # Language-specific validation patterns
         self.language_patterns = {
@@ -166,40 +226,227 @@ class CodeHandler:
         
         logger.info("Code Handler initialized")
     
-    def validate_code(self, code: str, language: str) -> CodeValidationResult:
+    def validate_code(self, code: str, language: str, source: Optional[ParsedSource] = None) -> CodeValidationResult:
         """
         Comprehensive code validation
         
+        Results are memoized, so resubmitting unchanged code (for example from
+        the editor, store_code and evaluation) validates it only once. With
+        the validation pool enabled the work runs in a worker process and
+        this thread only waits for it.
+        
         Args:
             code: Source code to validate
             language: Programming language
+            source: Already parsed form of the code, used when validating inline
             
         Returns:
             Validation result with detailed analysis
+            
+        Raises:
+            ValidationQueueFull: If the validation pool is saturated
+        """
+        cache_key = self._validation_cache_key(code, language)
+        cached = self.validation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        if not self.validation_pool.enabled:
+            result, cacheable = self._run_validation(code, language, source)
+        else:
+            result, cacheable = self._run_pooled_validation(code, language, source)
+        
+        if cacheable:
+            self.validation_cache.put(cache_key, result)
+        return result
+    
+    async def validate_code_async(self, code: str, language: str) -> CodeValidationResult:
+        """
+        Coroutine version of validate_code for async views
+        
+        Awaits the validation pool instead of blocking the event loop's thread.
+        
+        Raises:
+            ValidationQueueFull: If the validation pool is saturated
+        """
+        cache_key = self._validation_cache_key(code, language)
+        cached = self.validation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        if not self.validation_pool.enabled:
+            result, cacheable = self._run_validation(code, language)
+        else:
+            try:
+                result, cacheable = await self.validation_pool.run_async(code, language)
+            except ValidationQueueFull:
+                raise
+            except TimeoutError as e:
+                logger.warning(f"Code validation timed out: {e}")
+                result, cacheable = self._timeout_result(language), False
+            except Exception as e:
+                logger.warning(f"Validation worker failed, validating inline: {e}")
+                result, cacheable = self._run_validation(code, language)
+        
+        if cacheable:
+            self.validation_cache.put(cache_key, result)
+        return result
+    
+    def validate_document(self, code: str, language: str) -> Tuple[str, CodeValidationResult]:
+        """
+        Validate a full editor buffer and keep its parsed form for later edits
+        
+        Args:
+            code: Source code to validate
+            language: Programming language
+            
+        Returns:
+            Tuple of (ID to send as base_snippet_id with the next edits, validation result)
+        """
+        source = ParsedSource(code, language)
+        # With the pool enabled the worker parses; source stays unparsed here
+        result = self.validate_code(code, language, None if self.validation_pool.enabled else source)
+        return self._remember_document(source), result
+    
+    def validate_edits(self, base_snippet_id: str, edits: Any) -> Tuple[str, CodeValidationResult]:
+        """
+        Validate an editor buffer sent as edits to an earlier version
+        
+        Only the lines around the edits are re-tokenized and bracket-matched;
+        the rest, and the complexity of unchanged Python top-level statements,
+        is reused from the base. A base that was never tokenized in this
+        process (a stored snippet, or a buffer the validation pool validated)
+        offers nothing to reuse; with the pool enabled the edited buffer is
+        then validated there as a whole file instead of on this thread.
+        
+        Args:
+            base_snippet_id: ID returned by an earlier validation, or a stored snippet ID
+            edits: List of {start, end, text} character-offset edits, applied in order
+            
+        Returns:
+            Tuple of (ID of the edited buffer, validation result)
+            
+        Raises:
+            KeyError: If the base is unknown or was evicted (the client should resend the full code)
+            ValueError: If the edits are malformed
+            ValidationQueueFull: If the buffer goes to the validation pool and it is saturated
+        """
+        text_edits = parse_edits(edits)
+        
+        with self._document_lock:
+            base = self.documents.get(base_snippet_id)
+            if base is not None:
+                self.documents.move_to_end(base_snippet_id)
+        
+        if base is None:
+            snippet = self.get_code_snippet(base_snippet_id)
+            if snippet is None:
+                raise KeyError(base_snippet_id)
+            base = ParsedSource(snippet.code, snippet.language)
+        
+        if self.validation_pool.enabled and not base.is_tokenized:
+            source = ParsedSource(apply_text_edits(base.code, text_edits), base.language)
+            pooled = True
+        else:
+            source = apply_edits(base, text_edits)
+            self.incremental_validations += 1
+            pooled = False
+        
+        # Intermediate keystroke buffers are looked up in the cache but not added to it
+        result = self.validation_cache.get(self._validation_cache_key(source.code, source.language))
+        if result is None:
+            if pooled:
+                result, _ = self._run_pooled_validation(source.code, source.language)
+            else:
+                result, _ = self._run_validation(source.code, source.language, source)
+        return self._remember_document(source), result
+    
+    def get_document_stats(self) -> Dict[str, int]:
+        """Get incremental validation statistics"""
+        with self._document_lock:
+            return {
+                'documents': len(self.documents),
+                'max_documents': self.max_documents,
+                'incremental_validations': self.incremental_validations
+            }
+    
+    def _remember_document(self, source: ParsedSource) -> str:
+        """Keep a parsed buffer as a base for edits; returns its content-derived ID"""
+        document_id = hashlib.sha256(f"{source.language}\0{source.code}".encode('utf-8')).hexdigest()[:16]
+        with self._document_lock:
+            self.documents[document_id] = source
+            self.documents.move_to_end(document_id)
+            while len(self.documents) > self.max_documents:
+                self.documents.popitem(last=False)
+        return document_id
+    
+    def _validation_cache_key(self, code: str, language: str) -> str:
+        """Key identifying a validation run; the exact code is hashed since counts depend on it"""
+        code_hash = hashlib.sha256(code.encode('utf-8')).hexdigest()
+        return f"v{VALIDATOR_VERSION}:{language}:{code_hash}"
+    
+    def _timeout_result(self, language: str) -> CodeValidationResult:
+        """Result reported when a worker did not finish in time"""
+        return CodeValidationResult(
+            is_valid=False,
+            language=language,
+            errors=[VALIDATION_TIMEOUT_ERROR],
+            warnings=[],
+            line_count=0,
+            char_count=0,
+            complexity_score=0,
+            security_issues=[],
+            suggestions=[]
+        )
+    
+    def _run_pooled_validation(self,
+                               code: str,
+                               language: str,
+                               source: Optional[ParsedSource] = None) -> Tuple[CodeValidationResult, bool]:
+        """
+        Validate in the pool, falling back to this thread if a worker fails
+        
+        Raises:
+            ValidationQueueFull: If the validation pool is saturated
         """
+        try:
+            return self.validation_pool.run(code, language)
+        except ValidationQueueFull:
+            raise
+        except TimeoutError as e:
+            logger.warning(f"Code validation timed out: {e}")
+            return self._timeout_result(language), False
+        except Exception as e:
+            logger.warning(f"Validation worker failed, validating inline: {e}")
+            return self._run_validation(code, language, source)
+    
+    def _run_validation(self,
+                        code: str,
+                        language: str,
+                        source: Optional[ParsedSource] = None) -> Tuple[CodeValidationResult, bool]:
+        """Run the validation pipeline; returns (result, whether it may be cached)"""
+        # Stage end times, exported as validate_code stage durations
+        marks = {'start': time.perf_counter()}
         try:
             errors = []
             warnings = []
             security_issues = []
             suggestions = []
             
-            # Basic length and structure validation
-            char_count = len(code)
-            line_count = len(code.splitlines())
+            # Split, tokenize and parse once; every stage below shares this
+            if source is None:
+                source = ParsedSource(code, language)
             
-            # Check length limits
-            if char_count < self.min_code_length:
-                errors.append(f"程式碼太短，至少需要 {self.min_code_length} 個字元")
-            
-            if char_count > self.max_code_length:
-                errors.append(f"程式碼太長，最多允許 {self.max_code_length} 個字元")
-            
-            if line_count > self.max_lines:
-                errors.append(f"程式碼行數太多，最多允許 {self.max_lines} 行")
+            # Basic length and structure validation
+            char_count = source.char_count
+            line_count = source.line_count
+            errors.extend(self._check_length_limits(source))
+            marks['length'] = time.perf_counter()
             
             # Check for empty or whitespace-only code
-            if not code.strip():
+            if source.is_blank:
                 errors.append("程式碼不能為空")
+                self._observe_stage_timings(language, marks)
                 return CodeValidationResult(
                     is_valid=False,
                     language=language,
@@ -210,23 +457,29 @@ class CodeHandler:
                     complexity_score=0,
                     security_issues=security_issues,
                     suggestions=suggestions
-                )
+                ), True
             
             # Language-specific validation
             language_enum = self._get_language_enum(language)
             if language_enum:
-                lang_errors, lang_warnings = self._validate_language_syntax(code, language_enum)
+                lang_errors, lang_warnings = self._validate_language_syntax(source, language_enum)
                 errors.extend(lang_errors)
                 warnings.extend(lang_warnings)
+            marks['syntax'] = time.perf_counter()
             
             # Security checks
             security_issues = self._check_security_issues(code)
+            marks['security'] = time.perf_counter()
             
             # Complexity analysis
-            complexity_score = self._calculate_complexity(code, language)
+            complexity_report = self._analyze_complexity(source)
+            complexity_score = complexity_report.score
+            marks['complexity'] = time.perf_counter()
             
             # Generate suggestions
-            suggestions = self._generate_suggestions(code, language, complexity_score)
+            suggestions = self._generate_suggestions(source, complexity_report)
+            marks['suggestions'] = time.perf_counter()
+            self._observe_stage_timings(language, marks)
             
             # Determine if code is valid
             is_valid = len(errors) == 0
@@ -240,8 +493,9 @@ class CodeHandler:
                 char_count=char_count,
                 complexity_score=complexity_score,
                 security_issues=security_issues,
-                suggestions=suggestions
-            )
+                suggestions=suggestions,
+                function_metrics=[function.to_dict() for function in complexity_report.functions]
+            ), TRANSIENT_VALIDATION_WARNINGS.isdisjoint(warnings)
             
         except Exception as e:
             logger.error(f"Error validating code: {e}")
@@ -255,7 +509,17 @@ class CodeHandler:
                 complexity_score=0,
                 security_issues=[],
                 suggestions=[]
-            )
+            ), False
+    
+    def _observe_stage_timings(self, language: str, marks: Dict[str, float]):
+        """Export the time between consecutive stage marks, plus the total"""
+        # Unknown languages share one label so client input cannot grow the series count
+        language_enum = self._get_language_enum(language)
+        label = language_enum.value if language_enum else 'other'
+        stages = list(marks.items())
+        for (_, previous), (stage, end) in zip(stages, stages[1:]):
+            VALIDATION_STAGE_SECONDS.labels(label, stage).observe(end - previous)
+        VALIDATION_STAGE_SECONDS.labels(label, 'total').observe(stages[-1][1] - stages[0][1])
     
     def store_code_snippet(self, 
                           session_id: str, 
@@ -295,8 +559,11 @@ class CodeHandler:
                 problem_description=problem_description
             )
             
-            # Store snippet
-            self.code_snippets[snippet_id] = snippet
+            # Store snippet and index it under its session
+            with self._snippet_lock:
+                self.code_snippets[snippet_id] = snippet
+                self.session_index.setdefault(session_id, {})[snippet_id] = None
+            self.reaper.schedule(session_id, snippet.timestamp + self.snippet_retention)
             
             logger.info(f"Stored code snippet {snippet_id} for session {session_id}")
             return snippet_id
@@ -317,20 +584,62 @@ class CodeHandler:
         """
         return self.code_snippets.get(snippet_id)
     
-    def get_session_snippets(self, session_id: str) -> List[CodeSnippet]:
+    def get_session_snippets(self, 
+                            session_id: str, 
+                            offset: int = 0, 
+                            limit: Optional[int] = None,
+                            latest: Optional[int] = None) -> List[CodeSnippet]:
         """
-        Get all code snippets for a session
+        Get code snippets for a session, oldest first
         
         Args:
             session_id: Session identifier
+            offset: Number of snippets to skip
+            limit: Maximum number of snippets to return (None for all)
+            latest: If set, return only the most recent N snippets (overrides offset/limit)
             
         Returns:
             List of code snippets
         """
-        return [
-            snippet for snippet in self.code_snippets.values()
-            if snippet.session_id == session_id
-        ]
+        with self._snippet_lock:
+            snippet_ids = list(self.session_index.get(session_id, ()))
+            
+            if latest is not None:
+                snippet_ids = snippet_ids[-latest:] if latest > 0 else []
+            else:
+                end = None if limit is None else offset + limit
+                snippet_ids = snippet_ids[offset:end]
+            
+            return [self.code_snippets[snippet_id] for snippet_id in snippet_ids]
+    
+    def get_snippet_count(self) -> int:
+        """Get the number of stored snippets across all sessions"""
+        return len(self.code_snippets)
+    
+    def count_session_snippets(self, session_id: str) -> int:
+        """Get the number of stored snippets for a session"""
+        with self._snippet_lock:
+            return len(self.session_index.get(session_id, ()))
+    
+    def remove_session_snippets(self, session_id: str) -> int:
+        """
+        Delete all code snippets of a session
+        
+        Args:
+            session_id: Session identifier
+            
+        Returns:
+            Number of snippets removed
+        """
+        with self._snippet_lock:
+            snippet_ids = self.session_index.pop(session_id, {})
+            for snippet_id in snippet_ids:
+                self.code_snippets.pop(snippet_id, None)
+        self.reaper.cancel(session_id)
+        
+        if snippet_ids:
+            logger.info(f"Removed {len(snippet_ids)} code snippet(s) for session {session_id}")
+        return len(snippet_ids)
     
     def format_code(self, code: str, language: str) -> str:
         """
@@ -373,6 +682,21 @@ class CodeHandler:
         """
         return [lang.value for lang in CodeLanguage]
     
+    def _check_length_limits(self, source: ParsedSource) -> List[str]:
+        """Errors for code outside the character and line limits"""
+        errors = []
+        
+        if source.char_count < self.min_code_length:
+            errors.append(f"程式碼太短，至少需要 {self.min_code_length} 個字元")
+        
+        if source.char_count > self.max_code_length:
+            errors.append(f"程式碼太長，最多允許 {self.max_code_length} 個字元")
+        
+        if source.line_count > self.max_lines:
+            errors.append(f"程式碼行數太多，最多允許 {self.max_lines} 行")
+        
+        return errors
+    
     def _get_language_enum(self, language: str) -> Optional[CodeLanguage]:
         """Convert string to language enum"""
         try:
@@ -380,12 +704,12 @@ class CodeHandler:
         except ValueError:
             return None
     
-    def _validate_language_syntax(self, code: str, language: CodeLanguage) -> Tuple[List[str], List[str]]:
+    def _validate_language_syntax(self, source: ParsedSource, language: CodeLanguage) -> Tuple[List[str], List[str]]:
         """
         Language-specific syntax validation
         
         Args:
-            code: Source code
+            source: Parsed source code
             language: Programming language enum
             
         Returns:
@@ -396,11 +720,11 @@ class CodeHandler:
         
         try:
             if language == CodeLanguage.PYTHON:
-                errors, warnings = self._validate_python_syntax(code)
+                errors, warnings = self._validate_python_syntax(source)
             elif language == CodeLanguage.JAVASCRIPT:
-                errors, warnings = self._validate_javascript_syntax(code)
+                errors, warnings = self._validate_javascript_syntax(source)
             elif language == CodeLanguage.CPP:
-                errors, warnings = self._validate_cpp_syntax_with_clang(code)
+                errors, warnings = self._validate_cpp_syntax_with_clang(source)
             # Add more language validations as needed
             
         except Exception as e:
@@ -409,104 +733,66 @@ class CodeHandler:
         
         return errors, warnings
     
-    def _validate_python_syntax(self, code: str) -> Tuple[List[str], List[str]]:
-        """Validate Python syntax"""
+    def _validate_python_syntax(self, source: ParsedSource) -> Tuple[List[str], List[str]]:
+        """Validate Python syntax using the shared AST"""
         errors = []
         warnings = []
         
-        try:
-            # Try to parse the code
-            ast.parse(code)
-        except SyntaxError as e:
-            errors.append(f"Python 語法錯誤: {e.msg} (第 {e.lineno} 行)")
-        except Exception as e:
-            warnings.append(f"Python 程式碼分析警告: {str(e)}")
+        # Parsing happens once, in ParsedSource
+        if source.python_regions is None:
+            e = source.parse_error
+            if isinstance(e, SyntaxError):
+                errors.append(f"Python 語法錯誤: {e.msg} (第 {e.lineno} 行)")
+            elif e is not None:
+                warnings.append(f"Python 程式碼分析警告: {str(e)}")
         
         return errors, warnings
     
-    def _validate_javascript_syntax(self, code: str) -> Tuple[List[str], List[str]]:
+    def _validate_javascript_syntax(self, source: ParsedSource) -> Tuple[List[str], List[str]]:
         """Basic JavaScript syntax validation"""
         errors = []
         warnings = []
         
-        # Basic bracket matching
-        brackets = {'(': ')', '[': ']', '{': '}'}
-        stack = []
+        # Basic bracket matching (strings and comments are skipped)
+        brackets = source.brackets
         
-        for char in code:
-            if char in brackets:
-                stack.append(brackets[char])
-            elif char in brackets.values():
-                if not stack or stack.pop() != char:
-                    errors.append("JavaScript 括號不匹配")
-                    break
+        if brackets.error is not None:
+            errors.append("JavaScript 括號不匹配")
         
-        if stack:
+        if brackets.unclosed:
             errors.append("JavaScript 括號未閉合")
         
         return errors, warnings
     
     def _check_security_issues(self, code: str) -> List[str]:
-        """Check for potential security issues"""
+        """Check for potential security issues, one entry per category with its line numbers"""
         security_issues = []
         
-        for category, patterns in self.security_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, code, re.IGNORECASE):
-                    security_issues.append(f"檢測到潛在的安全風險: {category}")
-                    break  # Only report once per category
+        for category, lines in self.security_scanner.scan(code).items():
+            shown = ', '.join(str(line) for line in lines[:5])
+            if len(lines) > 5:
+                shown += ', ...'
+            security_issues.append(f"檢測到潛在的安全風險: {category} (第 {shown} 行)")
         
         return security_issues
     
-    def _calculate_complexity(self, code: str, language: str) -> int:
-        """Calculate basic code complexity score"""
+    def _analyze_complexity(self, source: ParsedSource) -> ComplexityReport:
+        """Calculate complexity metrics (score and per-function metrics)"""
         try:
-            lines = code.splitlines()
-            complexity = 0
-            
-            # Count different complexity indicators
-            complexity += len([line for line in lines if line.strip()])  # Non-empty lines
-            complexity += code.count('if') * 2  # Conditional statements
-            complexity += code.count('for') * 2  # Loops
-            complexity += code.count('while') * 2
-            
-            # Language-specific complexity calculations
-            if language.lower() == 'python':
-                complexity += code.count('def') * 3  # Function definitions
-                complexity += code.count('class') * 4  # Class definitions
-            elif language.lower() == 'cpp':
-                complexity += len([line for line in lines if 'int ' in line or 'void ' in line or 'double ' in line]) * 3
-                complexity += code.count('class') * 4
-                complexity += code.count('struct') * 3
-                complexity += code.count('template') * 5
-                complexity += code.count('namespace') * 2
-            elif language.lower() in ['javascript', 'typescript']:
-                complexity += code.count('function') * 3
-                complexity += code.count('class') * 4
-                complexity += code.count('=>') * 2  # Arrow functions
-            elif language.lower() == 'java':
-                complexity += len([line for line in lines if 'public ' in line or 'private ' in line]) * 3
-                complexity += code.count('class') * 4
-                complexity += code.count('interface') * 4
-            
-            # Common complexity indicators for all languages
-            complexity += code.count('switch') * 3
-            complexity += code.count('case') * 1
-            complexity += code.count('try') * 2
-            complexity += code.count('catch') * 2
-            
-            # Normalize to 0-100 scale
-            return min(complexity, 100)
-            
-        except Exception:
-            return 0
+            return analyze_complexity(source)
+        except Exception as e:
+            logger.warning(f"Error analyzing complexity: {e}")
+            return ComplexityReport()
     
-    def _generate_suggestions(self, code: str, language: str, complexity: int) -> List[str]:
-        """Generate code improvement suggestions"""
+    def _generate_suggestions(self, source: ParsedSource, report: ComplexityReport) -> List[str]:
+        """Generate code improvement suggestions from the shared lines and tokens"""
         suggestions = []
+        language = source.language
         
         try:
-            lines = code.splitlines()
+            lines = source.lines
+            tokens = source.code_tokens()
+            identifiers = [token.text for token in tokens if token.kind in ('identifier', 'keyword')]
             
             # Check for very long lines
             long_lines = [i for i, line in enumerate(lines, 1) if len(line) > 100]
@@ -514,26 +800,39 @@ class CodeHandler:
                 suggestions.append("考慮將過長的程式碼行拆分（建議每行不超過100字元）")
             
             # Check for lack of comments
-            comment_count = sum(1 for line in lines if '#' in line or '//' in line)
+            comment_count = sum(1 for token in source.tokens if token.kind == 'comment')
             if len(lines) > 10 and comment_count == 0:
                 suggestions.append("建議增加註解說明程式碼邏輯")
             
             # Complexity suggestions
-            if complexity > 50:
+            if report.score > 50:
                 suggestions.append("程式碼複雜度較高，考慮拆分為更小的函數")
             
+            for function in report.functions:
+                if function.cyclomatic > 10:
+                    suggestions.append(f"函數 {function.name} 的循環複雜度為 {function.cyclomatic}，建議拆分")
+            
+            if report.max_nesting > 3:
+                suggestions.append(f"巢狀層數達 {report.max_nesting} 層，考慮提早返回或抽出函數以降低巢狀深度")
+            
             # Language-specific suggestions
             if language.lower() == 'python':
-                if 'print(' in code and code.count('print(') > 3:
+                print_calls = sum(
+                    1 for token, following in zip(tokens, tokens[1:])
+                    if token.text == 'print' and following.text == '('
+                )
+                if print_calls > 3:
                     suggestions.append("考慮使用 logging 模組取代過多的 print 語句")
             elif language.lower() == 'cpp':
-                if 'using namespace std' in code:
+                texts = [token.text for token in tokens]
+                if any(texts[i:i + 3] == ['using', 'namespace', 'std'] for i in range(len(texts) - 2)):
                     suggestions.append("考慮使用 std:: 前綴而非 'using namespace std' 以避免命名空間污染")
-                if 'cout' in code and '#include <iostream>' not in code:
+                includes = [token.text for token in tokens if token.kind == 'preprocessor']
+                if 'cout' in identifiers and not any(re.match(r'#\s*include\s*<iostream>', text) for text in includes):
                     suggestions.append("使用 cout 需要 #include <iostream>")
-                if code.count('new ') > 0 and code.count('delete ') == 0:
+                if identifiers.count('new') > 0 and identifiers.count('delete') == 0:
                     suggestions.append("使用 new 分配記憶體後記得使用 delete 釋放，或考慮使用智慧指標")
-                if 'malloc' in code or 'free' in code:
+                if 'malloc' in identifiers or 'free' in identifiers:
                     suggestions.append("C++ 中建議使用 new/delete 或智慧指標，而非 malloc/free")
             
         except Exception as e:
@@ -575,109 +874,35 @@ class CodeHandler:
         except Exception:
             return code  # Return original if formatting fails
     
-    def _check_clang_availability(self) -> bool:
-        """Check if clang is available on the system"""
-        try:
-            result = subprocess.run(['clang++', '--version'], 
-                                  capture_output=True, 
-                                  text=True, 
-                                  timeout=5)
-            return result.returncode == 0
-        except (subprocess.SubprocessError, FileNotFoundError, subprocess.TimeoutExpired):
-            return False
-    
-    def _validate_cpp_syntax_with_clang(self, code: str) -> Tuple[List[str], List[str]]:
-        """Validate C++ syntax using clang compiler"""
-        errors = []
-        warnings = []
-        
+    def _validate_cpp_syntax_with_clang(self, source: ParsedSource) -> Tuple[List[str], List[str]]:
+        """Validate C++ syntax using the shared clang pool"""
         # If clang is not available, fall back to basic validation
         if not self.clang_available:
-            return self._validate_cpp_syntax_basic(code)
+            return self._validate_cpp_syntax_basic(source)
         
-        try:
-            # Create a temporary file with C++ code
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.cpp', delete=False) as temp_file:
-                temp_file.write(code)
-                temp_file_path = temp_file.name
-            
-            try:
-                # Run clang++ to check syntax
-                result = subprocess.run([
-                    'clang++', 
-                    '-fsyntax-only',  # Only check syntax, don't compile
-                    '-std=c++17',     # Use C++17 standard
-                    '-Wall',          # Enable warnings
-                    temp_file_path
-                ], capture_output=True, text=True, timeout=10)
-                
-                if result.stderr:
-                    # Parse clang error messages
-                    stderr_lines = result.stderr.strip().split('\n')
-                    for line in stderr_lines:
-                        if 'error:' in line:
-                            # Extract error message
-                            error_msg = line.split('error:')[-1].strip()
-                            errors.append(f"C++ 語法錯誤: {error_msg}")
-                        elif 'warning:' in line:
-                            # Extract warning message
-                            warning_msg = line.split('warning:')[-1].strip()
-                            warnings.append(f"C++ 警告: {warning_msg}")
-                
-                # If no errors from clang, but return code is not 0
-                if result.returncode != 0 and not errors:
-                    errors.append("C++ 程式碼包含語法錯誤")
-                    
-            finally:
-                # Clean up temporary file
-                try:
-                    os.unlink(temp_file_path)
-                except OSError:
-                    pass
-                    
-        except subprocess.TimeoutExpired:
-            warnings.append("C++ 語法檢查超時")
-        except Exception as e:
-            logger.warning(f"Error using clang for C++ validation: {e}")
-            warnings.append("C++ 語法檢查過程中發生問題")
-        
-        return errors, warnings
+        return self.clang_pool.check(source.code)
     
-    def _validate_cpp_syntax_basic(self, code: str) -> Tuple[List[str], List[str]]:
+    def _validate_cpp_syntax_basic(self, source: ParsedSource) -> Tuple[List[str], List[str]]:
         """Basic C++ syntax validation (fallback when clang is not available)"""
         errors = []
         warnings = []
         
         try:
-            lines = code.splitlines()
-            
-            # Basic bracket matching for C++
-            brackets = {'(': ')', '[': ']', '{': '}'}
-            stack = []
-            line_num = 0
-            
-            for line in lines:
-                line_num += 1
-                # Skip comments
-                if '//' in line:
-                    line = line[:line.index('//')]
-                
-                for char in line:
-                    if char in brackets:
-                        stack.append((brackets[char], line_num))
-                    elif char in brackets.values():
-                        if not stack:
-                            errors.append(f"C++ 第 {line_num} 行: 多餘的 '{char}'")
-                            break
-                        expected_char, _ = stack.pop()
-                        if expected_char != char:
-                            errors.append(f"C++ 第 {line_num} 行: 括號不匹配，期望 '{expected_char}' 但找到 '{char}'")
-                            break
+            code = source.code
+            lines = source.lines
+            
+            # Basic bracket matching for C++ (strings and comments are skipped)
+            brackets = source.brackets
+            error = brackets.error
+            if error is not None:
+                if error.expected is None:
+                    errors.append(f"C++ 第 {error.line} 行: 多餘的 '{error.found}'")
+                else:
+                    errors.append(f"C++ 第 {error.line} 行: 括號不匹配，期望 '{error.expected}' 但找到 '{error.found}'")
             
             # Check for unclosed brackets
-            if stack:
-                for char, line_num in stack:
-                    errors.append(f"C++ 第 {line_num} 行: 未閉合的括號 '{char}'")
+            for char, line_num in brackets.unclosed:
+                errors.append(f"C++ 第 {line_num} 行: 未閉合的括號 '{char}'")
             
             # Check for basic C++ syntax patterns
             code_lower = code.lower()
@@ -0,0 +1,594 @@
+"""
+Complexity Engine for AI Interview Simulator
+程式碼複雜度分析：Python 使用 AST，其餘語言使用可逐行續接的單次掃描分詞器，提供每個函數的指標
+"""
+
+import ast
+import logging
+import re
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+if TYPE_CHECKING:
+    from parsed_source import ParsedSource
+
+logger = logging.getLogger(__name__)
+
+class Token(NamedTuple):
+    """A lexical token"""
+    kind: str   # identifier, keyword, number, string, comment, preprocessor, operator, punct, other
+    text: str
+    line: int   # 1-based
+
+# Tokenizer state carried from one line to the next: None, or (token kind, closing delimiter)
+LineState = Optional[Tuple[str, str]]
+
+@dataclass(frozen=True)
+class LanguageSpec:
+    """Lexical and structural rules the generic tokenizer and metrics walk need"""
+    name: str
+    keywords: FrozenSet[str]
+    decision_keywords: FrozenSet[str]                   # each occurrence adds a path
+    decision_operators: FrozenSet[str] = frozenset({'&&', '||', '?'})
+    control_keywords: FrozenSet[str] = frozenset()      # open a nested block
+    function_keywords: FrozenSet[str] = frozenset()     # introduce a function definition
+    class_keywords: FrozenSet[str] = frozenset({'class', 'struct', 'interface', 'enum'})
+    line_comments: Tuple[str, ...] = ('//',)
+    block_comment: Optional[Tuple[str, str]] = ('/*', '*/')
+    quotes: str = '"'                                   # single-line string delimiters
+    char_literals: bool = True                          # '' delimits a single character
+    multiline_strings: Tuple[str, ...] = ()
+    preprocessor: bool = False
+    parenthesized_conditions: bool = True               # False where `for a; b; c {` is legal (Go)
+
+_C_CONTROL = frozenset({'if', 'else', 'for', 'while', 'do', 'switch', 'try', 'catch'})
+_C_DECISIONS = frozenset({'if', 'for', 'while', 'case', 'catch'})
+
+LANGUAGE_SPECS: Dict[str, LanguageSpec] = {
+    'python': LanguageSpec(
+        name='python',
+        keywords=frozenset({
+            'and', 'as', 'assert', 'async', 'await', 'break', 'class', 'continue', 'def', 'del',
+            'elif', 'else', 'except', 'finally', 'for', 'from', 'global', 'if', 'import', 'in',
+            'is', 'lambda', 'nonlocal', 'not', 'or', 'pass', 'raise', 'return', 'try', 'while',
+            'with', 'yield', 'None', 'True', 'False'
+        }),
+        decision_keywords=frozenset({'if', 'elif', 'for', 'while', 'except', 'and', 'or'}),
+        decision_operators=frozenset(),
+        function_keywords=frozenset({'def'}),
+        class_keywords=frozenset({'class'}),
+        line_comments=('#',),
+        block_comment=None,
+        quotes='"\'',
+        char_literals=False,
+        multiline_strings=('"""', "'''")
+    ),
+    'javascript': LanguageSpec(
+        name='javascript',
+        keywords=frozenset({
+            'break', 'case', 'catch', 'class', 'const', 'continue', 'default', 'delete', 'do',
+            'else', 'export', 'extends', 'finally', 'for', 'function', 'if', 'import', 'in',
+            'instanceof', 'let', 'new', 'of', 'return', 'switch', 'this', 'throw', 'try',
+            'typeof', 'var', 'void', 'while', 'yield', 'async', 'await'
+        }),
+        decision_keywords=_C_DECISIONS,
+        decision_operators=frozenset({'&&', '||', '??', '?'}),
+        control_keywords=_C_CONTROL,
+        function_keywords=frozenset({'function'}),
+        class_keywords=frozenset({'class'}),
+        quotes='"\'',
+        char_literals=False,
+        multiline_strings=('`',)
+    ),
+    'java': LanguageSpec(
+        name='java',
+        keywords=frozenset({
+            'abstract', 'boolean', 'break', 'byte', 'case', 'catch', 'char', 'class', 'continue',
+            'default', 'do', 'double', 'else', 'enum', 'extends', 'final', 'finally', 'float',
+            'for', 'if', 'implements', 'import', 'instanceof', 'int', 'interface', 'long', 'new',
+            'package', 'private', 'protected', 'public', 'return', 'short', 'static', 'super',
+            'switch', 'synchronized', 'this', 'throw', 'throws', 'try', 'void', 'while'
+        }),
+        decision_keywords=_C_DECISIONS,
+        control_keywords=_C_CONTROL,
+        multiline_strings=('"""',)
+    ),
+    'csharp': LanguageSpec(
+        name='csharp',
+        keywords=frozenset({
+            'abstract', 'bool', 'break', 'case', 'catch', 'class', 'const', 'continue', 'default',
+            'do', 'double', 'else', 'enum', 'finally', 'for', 'foreach', 'if', 'in', 'int',
+            'interface', 'namespace', 'new', 'override', 'private', 'protected', 'public',
+            'return', 'static', 'string', 'struct', 'switch', 'this', 'throw', 'try', 'using',
+            'var', 'virtual', 'void', 'while'
+        }),
+        decision_keywords=_C_DECISIONS | {'foreach'},
+        decision_operators=frozenset({'&&', '||', '??', '?'}),
+        control_keywords=_C_CONTROL | {'foreach'}
+    ),
+    'cpp': LanguageSpec(
+        name='cpp',
+        keywords=frozenset({
+            'auto', 'bool', 'break', 'case', 'catch', 'char', 'class', 'const', 'constexpr',
+            'continue', 'default', 'delete', 'do', 'double', 'else', 'enum', 'float', 'for',
+            'if', 'inline', 'int', 'long', 'namespace', 'new', 'nullptr', 'private',
+            'protected', 'public', 'return', 'short', 'static', 'struct', 'switch', 'template',
+            'this', 'throw', 'try', 'typename', 'unsigned', 'using', 'virtual', 'void', 'while'
+        }),
+        decision_keywords=_C_DECISIONS,
+        control_keywords=_C_CONTROL,
+        class_keywords=frozenset({'class', 'struct', 'enum', 'union'}),
+        preprocessor=True
+    ),
+    'c': LanguageSpec(
+        name='c',
+        keywords=frozenset({
+            'break', 'case', 'char', 'const', 'continue', 'default', 'do', 'double', 'else',
+            'enum', 'float', 'for', 'if', 'int', 'long', 'return', 'short', 'sizeof', 'static',
+            'struct', 'switch', 'typedef', 'union', 'unsigned', 'void', 'while'
+        }),
+        decision_keywords=frozenset({'if', 'for', 'while', 'case'}),
+        control_keywords=frozenset({'if', 'else', 'for', 'while', 'do', 'switch'}),
+        class_keywords=frozenset({'struct', 'enum', 'union'}),
+        preprocessor=True
+    ),
+    'go': LanguageSpec(
+        name='go',
+        keywords=frozenset({
+            'break', 'case', 'chan', 'const', 'continue', 'default', 'defer', 'else', 'for',
+            'func', 'go', 'if', 'import', 'interface', 'map', 'package', 'range', 'return',
+            'select', 'struct', 'switch', 'type', 'var'
+        }),
+        decision_keywords=frozenset({'if', 'for', 'case'}),
+        decision_operators=frozenset({'&&', '||'}),
+        control_keywords=frozenset({'if', 'else', 'for', 'switch', 'select'}),
+        function_keywords=frozenset({'func'}),
+        class_keywords=frozenset({'struct', 'interface'}),
+        quotes='"',
+        multiline_strings=('`',),
+        parenthesized_conditions=False
+    ),
+    'rust': LanguageSpec(
+        name='rust',
+        keywords=frozenset({
+            'as', 'break', 'const', 'continue', 'else', 'enum', 'fn', 'for', 'if', 'impl', 'in',
+            'let', 'loop', 'match', 'mod', 'mut', 'pub', 'ref', 'return', 'self', 'Self',
+            'static', 'struct', 'trait', 'type', 'unsafe', 'use', 'where', 'while'
+        }),
+        decision_keywords=frozenset({'if', 'for', 'while', 'loop', '=>'}),
+        decision_operators=frozenset({'&&', '||'}),
+        control_keywords=frozenset({'if', 'else', 'for', 'while', 'loop', 'match'}),
+        function_keywords=frozenset({'fn'}),
+        class_keywords=frozenset({'struct', 'enum', 'trait', 'impl'}),
+        parenthesized_conditions=False
+    )
+}
+LANGUAGE_SPECS['typescript'] = replace(
+    LANGUAGE_SPECS['javascript'],
+    name='typescript',
+    keywords=LANGUAGE_SPECS['javascript'].keywords | {'interface', 'type', 'enum', 'implements'},
+    class_keywords=frozenset({'class', 'interface', 'enum'})
+)
+
+# Fallback for languages without a spec (e.g. SQL): C-style comments and strings
+GENERIC_SPEC = LanguageSpec(
+    name='generic',
+    keywords=frozenset(),
+    decision_keywords=frozenset({'if', 'for', 'while', 'case'}),
+    decision_operators=frozenset({'&&', '||'}),
+    quotes='"\'',
+    char_literals=False
+)
+
+_OPERATOR_PATTERN = (
+    r'&&|\|\||\?\?|\?\.|=>|->|::|\+\+|--|<<=?|>>=?|[-+*/%&|^!=<>]=|[-+*/%&|^!=<>?:~.,;@]'
+)
+
+_compiled_specs: Dict[str, 're.Pattern'] = {}
+
+def _token_pattern(spec: LanguageSpec) -> 're.Pattern':
+    """Master regex recognizing one token at a position, built once per language"""
+    pattern = _compiled_specs.get(spec.name)
+    if pattern is not None:
+        return pattern
+    
+    parts = [r'(?P<ws>\s+)']
+    parts.append('(?P<comment>(?:' + '|'.join(re.escape(marker) for marker in spec.line_comments) + ').*)')
+    openers = list(spec.multiline_strings)
+    if spec.block_comment:
+        openers.append(spec.block_comment[0])
+    if openers:
+        # Longest first so '"""' wins over '"'
+        openers.sort(key=len, reverse=True)
+        parts.append('(?P<opener>' + '|'.join(re.escape(opener) for opener in openers) + ')')
+    if spec.quotes:
+        parts.append('(?P<string>' + '|'.join(
+            f'{re.escape(quote)}(?:[^{re.escape(quote)}\\\\]|\\\\.)*{re.escape(quote)}' for quote in spec.quotes
+        ) + ')')
+    if spec.char_literals:
+        parts.append(r"(?P<char>'(?:\\[^']{1,8}|[^'\\])')")
+    parts += [
+        r'(?P<number>\d[\w.]*)',
+        r'(?P<identifier>[A-Za-z_$][\w$]*)',
+        f'(?P<operator>{_OPERATOR_PATTERN})',
+        r'(?P<punct>[()\[\]{}])',
+        r'(?P<other>.)'
+    ]
+    
+    pattern = re.compile('|'.join(parts))
+    _compiled_specs[spec.name] = pattern
+    return pattern
+
+def get_language_spec(language: str) -> LanguageSpec:
+    """Spec for a language name, or the generic fallback"""
+    return LANGUAGE_SPECS.get(language.lower(), GENERIC_SPEC)
+
+def tokenize_line(line: str,
+                  line_number: int,
+                  spec: LanguageSpec,
+                  state: LineState = None) -> Tuple[List[Token], LineState]:
+    """
+    Tokenize one line, resuming from the state the previous line ended in
+    
+    Args:
+        line: Line text without its newline
+        line_number: 1-based line number
+        spec: Language spec
+        state: State returned for the previous line (None at the start of a file)
+    
+    Returns:
+        Tuple of (tokens, state at the end of this line)
+    """
+    tokens: List[Token] = []
+    position = 0
+    
+    if state is not None:
+        kind, closing = state
+        end = line.find(closing)
+        if end == -1:
+            tokens.append(Token(kind, line, line_number))
+            return tokens, state
+        position = end + len(closing)
+        tokens.append(Token(kind, line[:position], line_number))
+    
+    if spec.preprocessor and line.lstrip().startswith('#') and position == 0:
+        return [Token('preprocessor', line.strip(), line_number)], None
+    
+    pattern = _token_pattern(spec)
+    length = len(line)
+    while position < length:
+        match = pattern.match(line, position)
+        kind = match.lastgroup
+        text = match.group()
+        
+        if kind == 'opener':
+            if spec.block_comment and text == spec.block_comment[0]:
+                kind, closing = 'comment', spec.block_comment[1]
+            else:
+                kind, closing = 'string', text
+            end = line.find(closing, match.end())
+            if end == -1:
+                tokens.append(Token(kind, line[position:], line_number))
+                return tokens, (kind, closing)
+            text = line[position:end + len(closing)]
+        elif kind == 'ws':
+            position = match.end()
+            continue
+        elif kind == 'char':
+            kind = 'string'
+        elif kind == 'identifier' and text in spec.keywords:
+            kind = 'keyword'
+        
+        tokens.append(Token(kind, text, line_number))
+        position += len(text)
+    
+    return tokens, None
+
+def tokenize(code: str, language: str) -> List[Token]:
+    """Tokenize a whole source file in one pass"""
+    spec = get_language_spec(language)
+    tokens: List[Token] = []
+    state: LineState = None
+    for line_number, line in enumerate(code.splitlines(), 1):
+        line_tokens, state = tokenize_line(line, line_number, spec, state)
+        tokens.extend(line_tokens)
+    return tokens
+
+@dataclass
+class FunctionMetrics:
+    """Complexity metrics of one function"""
+    name: str
+    start_line: int
+    end_line: int
+    cyclomatic: int = 1
+    max_nesting: int = 0
+    
+    @property
+    def length(self) -> int:
+        return self.end_line - self.start_line + 1
+    
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'name': self.name,
+            'start_line': self.start_line,
+            'end_line': self.end_line,
+            'length': self.length,
+            'cyclomatic': self.cyclomatic,
+            'max_nesting': self.max_nesting
+        }
+
+@dataclass
+class ComplexityReport:
+    """Whole-file complexity metrics"""
+    score: int = 0                  # 0-100
+    decision_points: int = 0
+    max_nesting: int = 0
+    class_count: int = 0
+    functions: List[FunctionMetrics] = field(default_factory=list)
+    non_empty_lines: int = 0
+    
+    @property
+    def cyclomatic(self) -> int:
+        return self.decision_points + 1
+
+class _PythonComplexityVisitor(ast.NodeVisitor):
+    """Collects decision points, nesting depth and per-function metrics from a Python AST"""
+    
+    _NESTING_NODES = (ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try) + (
+        (ast.Match,) if hasattr(ast, 'Match') else ()
+    ) + ((ast.TryStar,) if hasattr(ast, 'TryStar') else ())
+    
+    def __init__(self):
+        self.report = ComplexityReport()
+        self._functions: List[Tuple[FunctionMetrics, int]] = []   # (function, depth it was defined at)
+        self._depth = 0
+    
+    def _add_decisions(self, count: int = 1):
+        self.report.decision_points += count
+        if self._functions:
+            self._functions[-1][0].cyclomatic += count
+    
+    def _enter_block(self):
+        self._depth += 1
+        self.report.max_nesting = max(self.report.max_nesting, self._depth)
+        if self._functions:
+            function, base_depth = self._functions[-1]
+            function.max_nesting = max(function.max_nesting, self._depth - base_depth)
+    
+    def _visit_nested(self, nodes):
+        self._enter_block()
+        for node in nodes:
+            self.visit(node)
+        self._depth -= 1
+    
+    def visit_FunctionDef(self, node):
+        function = FunctionMetrics(
+            name=node.name,
+            start_line=node.lineno,
+            end_line=getattr(node, 'end_lineno', None) or node.lineno
+        )
+        self.report.functions.append(function)
+        self._functions.append((function, self._depth))
+        self.generic_visit(node)
+        self._functions.pop()
+    
+    visit_AsyncFunctionDef = visit_FunctionDef
+    
+    def visit_ClassDef(self, node):
+        self.report.class_count += 1
+        self.generic_visit(node)
+    
+    def visit_If(self, node):
+        self._add_decisions()
+        self.visit(node.test)
+        self._visit_nested(node.body)
+        orelse = node.orelse
+        if len(orelse) == 1 and isinstance(orelse[0], ast.If) and orelse[0].col_offset == node.col_offset:
+            self.visit(orelse[0])  # elif: same depth
+        elif orelse:
+            self._visit_nested(orelse)
+    
+    def generic_visit(self, node):
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler)):
+            self._add_decisions()
+        elif isinstance(node, ast.BoolOp):
+            self._add_decisions(len(node.values) - 1)
+        elif isinstance(node, ast.comprehension):
+            self._add_decisions(1 + len(node.ifs))
+        elif hasattr(ast, 'match_case') and isinstance(node, ast.match_case):
+            self._add_decisions()
+        
+        if isinstance(node, self._NESTING_NODES):
+            self._enter_block()
+            super().generic_visit(node)
+            self._depth -= 1
+        else:
+            super().generic_visit(node)
+
+class PythonRegion(NamedTuple):
+    """A group of top-level Python statements (several only when they share lines)"""
+    first_line: int                          # 1-based file line the group starts on
+    text: Optional[str]                      # source lines of the group; None if unknown
+    statements: Optional[List[ast.stmt]]     # None when the text's metrics are already known
+    line_offset: int = 0                     # added to statement line numbers to get file lines
+
+def _analyze_python(regions: List[PythonRegion],
+                    previous_regions: Optional[Dict[str, ComplexityReport]] = None
+                    ) -> Tuple[ComplexityReport, Dict[str, ComplexityReport]]:
+    """
+    Metrics from the top-level statement groups of a Python module
+    
+    Top-level statements do not affect each other's metrics, so each group is
+    measured on its own and its result is keyed by its source text, with
+    function lines stored relative to the group. A group found in
+    `previous_regions` is not visited again.
+    
+    Args:
+        regions: Statement groups in file order
+        previous_regions: Results returned for an earlier version of the code
+    
+    Returns:
+        Tuple of (report, per-group results of this version)
+    """
+    report = ComplexityReport()
+    results: Dict[str, ComplexityReport] = {}
+    previous_regions = previous_regions or {}
+    
+    for region in regions:
+        part = previous_regions.get(region.text) if region.text is not None else None
+        if part is None:
+            visitor = _PythonComplexityVisitor()
+            for statement in region.statements:
+                visitor.visit(statement)
+            part = visitor.report
+            to_relative = region.line_offset - (region.first_line - 1)
+            for function in part.functions:
+                function.start_line += to_relative
+                function.end_line += to_relative
+        if region.text is not None:
+            results[region.text] = part
+        
+        report.decision_points += part.decision_points
+        report.max_nesting = max(report.max_nesting, part.max_nesting)
+        report.class_count += part.class_count
+        offset = region.first_line - 1
+        report.functions.extend(
+            replace(function, start_line=function.start_line + offset, end_line=function.end_line + offset)
+            for function in part.functions
+        )
+    
+    return report, results
+
+def _analyze_tokens(tokens: List[Token], spec: LanguageSpec) -> ComplexityReport:
+    """
+    Metrics from a brace-delimited token stream
+    
+    A '{' opens a function when it follows a function keyword, or a
+    parenthesized parameter list whose '(' directly follows an identifier
+    (e.g. `int main() {`, `void run() const {`). It opens a control block
+    when it follows a control keyword. Decisions are charged to the
+    innermost open function.
+    """
+    report = ComplexityReport()
+    stack: List[Tuple[str, Optional[FunctionMetrics]]] = []   # (block kind, function)
+    functions: List[FunctionMetrics] = []
+    pending: Optional[str] = None        # kind of block the next '{' opens
+    pending_name: Optional[str] = None
+    pending_line = 0
+    header_depth = 0                     # paren depth where the pending header started
+    paren_depth = 0
+    in_signature = False                 # inside `name(...)` that may be a parameter list
+    previous: Optional[Token] = None
+    
+    def nesting_inside(function: Optional[FunctionMetrics]) -> int:
+        depth = 0
+        for kind, owner in reversed(stack):
+            if owner is not function:
+                break
+            if kind == 'control':
+                depth += 1
+        return depth
+    
+    for token in tokens:
+        kind, text = token.kind, token.text
+        if kind in ('comment', 'preprocessor'):
+            continue
+        
+        current = functions[-1] if functions else None
+        
+        if text in spec.decision_keywords or (kind == 'operator' and text in spec.decision_operators):
+            report.decision_points += 1
+            if current is not None:
+                current.cyclomatic += 1
+        
+        if kind == 'keyword':
+            if text in spec.function_keywords:
+                pending, pending_name, pending_line, header_depth = 'function', None, token.line, paren_depth
+                in_signature = False
+            elif text in spec.class_keywords:
+                report.class_count += 1
+                pending, header_depth = 'class', paren_depth
+            elif text in spec.control_keywords and pending != 'function':
+                pending, header_depth = 'control', paren_depth
+        elif kind == 'identifier':
+            if pending == 'function' and pending_name is None and paren_depth == header_depth:
+                pending_name = text
+        elif text == '(':
+            if pending is None and not in_signature and previous is not None and previous.kind == 'identifier':
+                pending_name, pending_line, header_depth = previous.text, previous.line, paren_depth
+                in_signature = True
+            paren_depth += 1
+        elif text == ')':
+            paren_depth = max(0, paren_depth - 1)
+            if in_signature and paren_depth == header_depth:
+                pending = 'function'
+                in_signature = False
+        elif text == ';':
+            keeps_header = pending == 'control' and (paren_depth > header_depth or not spec.parenthesized_conditions)
+            if not keeps_header:
+                pending, pending_name, in_signature = None, None, False
+        elif text == '{':
+            if pending == 'function':
+                function = FunctionMetrics(
+                    name=pending_name or '<anonymous>',
+                    start_line=pending_line or token.line,
+                    end_line=token.line
+                )
+                report.functions.append(function)
+                functions.append(function)
+                stack.append(('function', function))
+            elif pending == 'control':
+                stack.append(('control', current))
+                depth = nesting_inside(current)
+                report.max_nesting = max(report.max_nesting, depth)
+                if current is not None:
+                    current.max_nesting = max(current.max_nesting, depth)
+            else:
+                stack.append((pending or 'block', current))
+            pending, pending_name, in_signature = None, None, False
+        elif text == '}':
+            if stack:
+                block_kind, owner = stack.pop()
+                if block_kind == 'function' and owner is not None:
+                    owner.end_line = token.line
+                    if functions and functions[-1] is owner:
+                        functions.pop()
+            pending = None
+        
+        previous = token
+    
+    return report
+
+def complexity_score(report: ComplexityReport) -> int:
+    """Combine a report into the 0-100 score shown to users"""
+    score = (
+        report.non_empty_lines +
+        report.decision_points * 2 +
+        len(report.functions) * 3 +
+        report.class_count * 4 +
+        max(0, report.max_nesting - 2) * 3
+    )
+    return min(score, 100)
+
+def analyze_complexity(source: 'ParsedSource') -> ComplexityReport:
+    """
+    Analyze code complexity from an already split and tokenized submission
+    
+    Args:
+        source: Parsed submission (for Python its statement groups are used;
+            results of groups seen in source.previous_regions are reused and
+            this version's are stored in source.complexity_regions)
+    
+    Returns:
+        ComplexityReport with whole-file and per-function metrics
+    """
+    regions = source.python_regions if source.spec.name == 'python' else None
+    if regions is not None:
+        report, source.complexity_regions = _analyze_python(regions, source.previous_regions)
+    else:
+        # Also used for Python that does not parse
+        report = _analyze_tokens(source.tokens, source.spec)
+    
+    report.non_empty_lines = sum(1 for line in source.lines if line.strip())
+    report.score = complexity_score(report)
+    return report
@@ -0,0 +1,525 @@
+"""
+Empirical Complexity Estimator for AI Interview Simulator
+以實測估計時間複雜度：在沙箱中以遞增規模的輸入執行受測函式，將執行時間曲線擬合至常見的 Big-O 類別並給出信心值
+"""
+
+import ast
+import hashlib
+import json
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from execution_engine import ExecutionEngine, TestCase
+from response_cache import ResponseCache, estimate_size
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the harness or the fit changes so cached estimates are not reused
+ESTIMATOR_VERSION = 1
+
+# Candidate classes in order of growth: (label, log f(n), complexity level as used by LLMClient).
+# The exponential class fits its own base (see fit_complexity), so its log f(n) is only per unit base.
+COMPLEXITY_CLASSES: Tuple[Tuple[str, Any, str], ...] = (
+    ('O(1)', lambda n: 0.0, 'Low'),
+    ('O(log n)', lambda n: math.log(math.log2(n) + 1), 'Low'),
+    ('O(n)', lambda n: math.log(n), 'Medium'),
+    ('O(n log n)', lambda n: math.log(n) + math.log(math.log2(n) + 1), 'Medium'),
+    ('O(n²)', lambda n: 2 * math.log(n), 'High'),
+    ('O(2^n)', lambda n: n * math.log(2), 'Very High'),
+)
+
+# Slowest exponential base considered (fib-style recursion grows by about 1.618)
+_MIN_EXPONENTIAL_BASE = 1.5
+
+# Languages whose functions can be timed (the harness is Python)
+MEASURABLE_LANGUAGES = ('python',)
+
+INPUT_KINDS = ('int', 'list', 'sorted_list', 'string', 'list_target')
+
+# Parameter names that suggest an input kind when none is given
+_INT_PARAMS = frozenset({'n', 'num', 'number', 'k', 'x', 'count', 'steps'})
+_STRING_PARAMS = frozenset({'s', 'string', 'text', 'word', 'str', 'sentence'})
+
+_RESULT_MARKER = '__COMPLEXITY_RESULT__'
+
+# Appended after the submission, which is exec'd from a string so its own
+# `if __name__ == '__main__'` block and prints stay out of the way.
+_HARNESS_TEMPLATE = '''
+import io, json, random, signal, sys, time
+
+_stdout = sys.stdout
+sys.stdout = io.StringIO()
+
+class _Budget(Exception):
+    pass
+
+def _alarm(signum, frame):
+    raise _Budget()
+
+def _make_args(kind, n, rng):
+    if kind == 'int':
+        return (n,)
+    if kind == 'string':
+        return (''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(n)),)
+    values = [rng.randrange(10 ** 6) for _ in range(n)]
+    if kind == 'sorted_list':
+        values.sort()
+    if kind == 'list_target':
+        return (values, -1)
+    return (values,)
+
+def _fresh(args):
+    return tuple(list(arg) if isinstance(arg, list) else arg for arg in args)
+
+def _per_call(target, args, min_total):
+    best = float('inf')
+    total = 0.0
+    reps = 0
+    while total < min_total and reps < 1000:
+        call_args = _fresh(args)
+        start = time.perf_counter()
+        target(*call_args)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        reps += 1
+    return best
+
+def _noop(*args):
+    return None
+
+def _main(config):
+    result = {{'points': [], 'overhead': 0.0, 'error': None}}
+    try:
+        namespace = {{'__name__': '__submission__'}}
+        exec(compile(config['code'], 'solution.py', 'exec'), namespace)
+        owner, _, name = config['function'].rpartition('.')
+        target = getattr(namespace[owner](), name) if owner else namespace[name]
+    except BaseException as e:
+        result['error'] = f"{{type(e).__name__}}: {{e}}"
+        return result
+    
+    signal.signal(signal.SIGALRM, _alarm)
+    deadline = time.perf_counter() + config['budget']
+    rng = random.Random(0)
+    result['overhead'] = _per_call(_noop, _make_args(config['kind'], config['sizes'][0], rng), config['min_total'])
+    for n in config['sizes']:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        args = _make_args(config['kind'], n, random.Random(n))
+        signal.setitimer(signal.ITIMER_REAL, remaining)
+        try:
+            seconds = _per_call(target, args, config['min_total'])
+        except _Budget:
+            break
+        except Exception as e:
+            result['error'] = f"{{type(e).__name__}} at n={{n}}: {{e}}"
+            break
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        result['points'].append([n, float(f"{{seconds:.4g}}")])
+        if seconds > config['size_budget']:
+            break
+    return result
+
+_result = _main(json.loads({config!r}))
+sys.stdout = _stdout
+print({marker!r} + json.dumps(_result))
+'''
+
+@dataclass
+class ComplexityEstimate:
+    """Best-fitting complexity class of a function's measured runtime"""
+    function_name: str
+    input_kind: str
+    complexity: Optional[str] = None     # e.g. 'O(n log n)'; None if it could not be measured
+    level: Optional[str] = None          # Low / Medium / High / Very High
+    confidence: float = 0.0              # share of the fit weight held by the best class (0-1)
+    points: List[Tuple[int, float]] = field(default_factory=list)  # (n, seconds per call)
+    residuals: Dict[str, float] = field(default_factory=dict)      # RMS log-space error per class
+    error: str = ''
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'function_name': self.function_name,
+            'input_kind': self.input_kind,
+            'complexity': self.complexity,
+            'level': self.level,
+            'confidence': round(self.confidence, 3),
+            'points': [list(point) for point in self.points],
+            'residuals': {label: round(value, 4) for label, value in self.residuals.items()},
+            'error': self.error
+        }
+
+def fit_complexity(points: Sequence[Tuple[int, float]],
+                   overhead: float = 0.0,
+                   min_points: int = 4) -> Tuple[Optional[str], float, Dict[str, float]]:
+    """
+    Fit measured runtimes against the candidate complexity classes
+    
+    Each class is fitted as t = c·f(n) in log space, where the one free
+    parameter c absorbs the machine speed; the fit error is the RMS of
+    log(t) - log(c·f(n)). O(2^n) stands for any exponential b^n and also
+    fits the base b (at least 1.5), since recursive solutions rarely double
+    exactly. O(1) is fitted on raw times. Growing classes use
+    times with the per-call overhead removed, keeping only points where the
+    function's own work is at least as large as that overhead.
+    
+    Args:
+        points: (n, seconds per call) in increasing n
+        overhead: Seconds per call spent outside the function's own work
+        min_points: Fewest points a class must be fitted on
+    
+    Returns:
+        Tuple of (best class label or None, confidence, error per fitted class).
+        Confidence is the best class's share of 1/error² across all classes.
+    """
+    residuals: Dict[str, float] = {}
+    for label, log_growth, _ in COMPLEXITY_CLASSES:
+        if label == 'O(1)':
+            usable = [(n, t) for n, t in points if t > 0]
+        else:
+            usable = [(n, t - overhead) for n, t in points if t - overhead >= max(overhead, 1e-9)]
+        if len(usable) < min_points:
+            continue
+        
+        offsets = [math.log(t) - log_growth(n) for n, t in usable]
+        if label == 'O(2^n)':
+            offsets = _remove_exponential_trend(usable, offsets)
+        mean = sum(offsets) / len(offsets)
+        residuals[label] = math.sqrt(sum((offset - mean) ** 2 for offset in offsets) / len(offsets))
+    
+    if not residuals:
+        return None, 0.0, residuals
+    
+    # Small epsilon keeps a near-perfect fit from dividing by zero
+    weights = {label: 1.0 / (error ** 2 + 1e-4) for label, error in residuals.items()}
+    best = max(weights, key=weights.get)
+    return best, weights[best] / sum(weights.values()), residuals
+
+def _remove_exponential_trend(usable: List[Tuple[int, float]], offsets: List[float]) -> List[float]:
+    """Offsets from 2^n re-expressed against the best-fitting base b^n"""
+    sizes = [n for n, _ in usable]
+    mean_n = sum(sizes) / len(sizes)
+    mean_offset = sum(offsets) / len(offsets)
+    spread = sum((n - mean_n) ** 2 for n in sizes)
+    slope = sum((n - mean_n) * (offset - mean_offset) for n, offset in zip(sizes, offsets)) / spread if spread else 0.0
+    
+    # Offsets are log t - n·ln 2, so the fitted base is 2·e^slope
+    slope = max(slope, math.log(_MIN_EXPONENTIAL_BASE / 2))
+    return [offset - slope * n for n, offset in zip(sizes, offsets)]
+
+def detect_entry_point(code: str) -> Optional[Tuple[str, List[str]]]:
+    """
+    Find the function to measure: the first public top-level function, else
+    the first public method of the first top-level class (as 'Class.method')
+    
+    Returns:
+        Tuple of (function name, parameter names without self), or None
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    
+    functions = (ast.FunctionDef, ast.AsyncFunctionDef)
+    for node in tree.body:
+        if isinstance(node, functions) and not node.name.startswith('_'):
+            return node.name, [arg.arg for arg in node.args.args]
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            for item in node.body:
+                if isinstance(item, functions) and not item.name.startswith('_'):
+                    return f"{node.name}.{item.name}", [arg.arg for arg in item.args.args[1:]]
+    return None
+
+def guess_input_kind(parameters: List[str]) -> str:
+    """Pick an input kind from a function's parameter names"""
+    if not parameters:
+        return 'int'
+    first = parameters[0].lower()
+    if first in _INT_PARAMS:
+        return 'int'
+    if first in _STRING_PARAMS:
+        return 'string'
+    return 'list_target' if len(parameters) >= 2 else 'list'
+
+def _find_parameters(code: str, function_name: str) -> Optional[List[str]]:
+    """Parameter names (without self) of a named function or 'Class.method', or None if it is not defined"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    
+    owner, _, name = function_name.rpartition('.')
+    body = tree.body
+    if owner:
+        classes = [node for node in body if isinstance(node, ast.ClassDef) and node.name == owner]
+        body = classes[0].body if classes else []
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == name:
+            parameters = [arg.arg for arg in node.args.args]
+            return parameters[1:] if owner else parameters
+    return None
+
+class ComplexityEstimator:
+    """
+    Estimates a Python function's time complexity by timing it on inputs of
+    increasing size inside the execution engine's sandbox
+    
+    One sandboxed process measures every size in turn (sizes grow by about
+    1.5x), stopping once a size takes longer than `size_budget` or the whole
+    run exceeds `time_budget`, so exponential functions end early instead of
+    timing out. Each size reports the fastest of repeated calls, and
+    fit_complexity picks the closest class.
+    
+    A measurement takes seconds, so callers on a request path use cached()
+    and estimate_in_background() instead of estimate(). Successful estimates
+    are memoized by code hash, function and input kind, and identical
+    measurements already running are shared rather than started again.
+    """
+    
+    def __init__(self,
+                 engine: ExecutionEngine,
+                 max_size: int = 100000,
+                 time_budget: float = 3.0,
+                 size_budget: float = 0.25,
+                 min_points: int = 4,
+                 max_workers: int = 2,
+                 max_pending: int = 32,
+                 cache_entries: int = 1024):
+        """
+        Initialize complexity estimator
+        
+        Args:
+            engine: Execution engine that runs the measurements
+            max_size: Largest input size tried
+            time_budget: Seconds of measurement per estimate
+            size_budget: Stop after a size whose single call takes longer than this
+            min_points: Fewest measured sizes needed for a fit
+            max_workers: Background measurements run at once
+            max_pending: Background measurements queued or running before new ones are refused
+            cache_entries: Estimates kept in the memo cache
+        """
+        self.engine = engine
+        self.max_size = max_size
+        self.time_budget = time_budget
+        self.size_budget = size_budget
+        self.min_points = min_points
+        self.max_pending = max_pending
+        self.sizes = self._input_sizes(max_size)
+        self.cache = ResponseCache(
+            max_entries=cache_entries,
+            ttl_seconds=None,
+            size_fn=lambda estimate: estimate_size(estimate.to_dict())
+        )
+        
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='complexity')
+        # cache key -> callbacks waiting for the measurement in progress
+        self._pending: Dict[str, List[Callable[[ComplexityEstimate], None]]] = {}
+        self._lock = threading.Lock()
+        
+        # Statistics
+        self.estimates = 0
+        self.failures = 0
+        self.background_estimates = 0
+        self.coalesced = 0
+        self.rejected = 0
+    
+    def cached(self,
+               code: str,
+               language: str = 'python',
+               function_name: Optional[str] = None,
+               input_kind: Optional[str] = None) -> Optional[ComplexityEstimate]:
+        """Memoized estimate for these arguments, or None if the code has not been measured"""
+        return self.cache.get(self._cache_key(code, language, function_name, input_kind))
+    
+    def estimate_in_background(self,
+                               code: str,
+                               callback: Callable[[ComplexityEstimate], None],
+                               language: str = 'python',
+                               function_name: Optional[str] = None,
+                               input_kind: Optional[str] = None) -> bool:
+        """
+        Measure on a background thread and pass the estimate to `callback`
+        
+        Args:
+            code: Source code defining the function
+            callback: Called on the background thread with the estimate
+            language: Programming language (only Python can be measured)
+            function_name: Function to time, or 'Class.method' (detected if omitted)
+            input_kind: One of INPUT_KINDS (guessed from the parameter names if omitted)
+        
+        Returns:
+            False if max_pending measurements are already queued and this one was dropped
+        """
+        key = self._cache_key(code, language, function_name, input_kind)
+        with self._lock:
+            waiting = self._pending.get(key)
+            if waiting is not None:
+                waiting.append(callback)
+                self.coalesced += 1
+                return True
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                return False
+            self._pending[key] = [callback]
+            self.background_estimates += 1
+        
+        self._executor.submit(self._run_background, key, code, language, function_name, input_kind)
+        return True
+    
+    def estimate(self,
+                 code: str,
+                 language: str = 'python',
+                 function_name: Optional[str] = None,
+                 input_kind: Optional[str] = None) -> ComplexityEstimate:
+        """
+        Measure how a function's runtime scales with input size
+        
+        Args:
+            code: Source code defining the function
+            language: Programming language (only Python can be measured)
+            function_name: Function to time, or 'Class.method' (detected if omitted)
+            input_kind: One of INPUT_KINDS (guessed from the parameter names if omitted)
+        
+        Returns:
+            ComplexityEstimate; `complexity` is None and `error` explains why when
+            nothing could be measured
+        """
+        key = self._cache_key(code, language, function_name, input_kind)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        estimate = self._measure(code, language, function_name, input_kind)
+        if estimate.complexity is not None:
+            # Failures are not kept: a run cut short by a loaded machine may succeed next time
+            self.cache.put(key, estimate)
+        return estimate
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get estimator statistics"""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'estimates': self.estimates,
+            'failures': self.failures,
+            'background_estimates': self.background_estimates,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+            'pending': pending,
+            'cache': self.cache.get_stats(),
+            'max_size': self.max_size,
+            'time_budget': self.time_budget
+        }
+    
+    def _run_background(self, key: str, code: str, language: str,
+                        function_name: Optional[str], input_kind: Optional[str]):
+        try:
+            estimate = self.estimate(code, language, function_name, input_kind)
+        except Exception as e:
+            logger.error(f"Error estimating complexity: {e}")
+            estimate = ComplexityEstimate(function_name=function_name or '', input_kind=input_kind or '',
+                                          error=str(e))
+        
+        with self._lock:
+            callbacks = self._pending.pop(key, [])
+        for callback in callbacks:
+            try:
+                callback(estimate)
+            except Exception as e:
+                logger.error(f"Error delivering complexity estimate: {e}")
+    
+    def _measure(self, code: str, language: str,
+                 function_name: Optional[str], input_kind: Optional[str]) -> ComplexityEstimate:
+        self.estimates += 1
+        
+        if language.lower() not in MEASURABLE_LANGUAGES:
+            return self._failed(function_name or '', input_kind or '', f"measuring {language} code is not supported")
+        
+        if function_name:
+            parameters = _find_parameters(code, function_name)
+            if parameters is None:
+                return self._failed(function_name, input_kind or '', f"function '{function_name}' not found")
+        else:
+            entry_point = detect_entry_point(code)
+            if entry_point is None:
+                return self._failed('', input_kind or '', "no function to measure")
+            function_name, parameters = entry_point
+        
+        input_kind = input_kind or guess_input_kind(parameters)
+        if input_kind not in INPUT_KINDS:
+            return self._failed(function_name, input_kind, f"input_kind must be one of {', '.join(INPUT_KINDS)}")
+        
+        config = {
+            'code': code,
+            'function': function_name,
+            'kind': input_kind,
+            'sizes': self.sizes,
+            'budget': self.time_budget,
+            'size_budget': self.size_budget,
+            'min_total': 0.02
+        }
+        harness = _HARNESS_TEMPLATE.format(config=json.dumps(config), marker=_RESULT_MARKER)
+        
+        # Input generation and interpreter start-up come on top of the measurement budget
+        report = self.engine.run(harness, 'python', [TestCase(input='', expected_output='')],
+                                 time_limit=self.time_budget * 2 + 2)
+        run = report.results[0]
+        measured = self._parse_harness_output(run.stdout)
+        if measured is None:
+            return self._failed(function_name, input_kind, f"measurement run failed ({run.status})")
+        if measured['error'] and len(measured['points']) < self.min_points:
+            return self._failed(function_name, input_kind, measured['error'])
+        
+        points = [(int(n), float(seconds)) for n, seconds in measured['points']]
+        best, confidence, residuals = fit_complexity(points, measured['overhead'], self.min_points)
+        if best is None:
+            return self._failed(function_name, input_kind, "too few input sizes could be measured", points)
+        
+        levels = {label: level for label, _, level in COMPLEXITY_CLASSES}
+        return ComplexityEstimate(
+            function_name=function_name,
+            input_kind=input_kind,
+            complexity=best,
+            level=levels[best],
+            confidence=confidence,
+            points=points,
+            residuals=residuals
+        )
+    
+    def _failed(self, function_name: str, input_kind: str, error: str,
+                points: Optional[List[Tuple[int, float]]] = None) -> ComplexityEstimate:
+        self.failures += 1
+        return ComplexityEstimate(function_name=function_name, input_kind=input_kind, points=points or [], error=error)
+    
+    @staticmethod
+    def _cache_key(code: str, language: str, function_name: Optional[str], input_kind: Optional[str]) -> str:
+        """Key identifying a measurement; the exact code is hashed since timings depend on it"""
+        code_hash = hashlib.sha256(code.encode('utf-8')).hexdigest()
+        return f"v{ESTIMATOR_VERSION}:{language.lower()}:{function_name or ''}:{input_kind or ''}:{code_hash}"
+    
+    @staticmethod
+    def _parse_harness_output(stdout: str) -> Optional[Dict[str, Any]]:
+        for line in reversed(stdout.splitlines()):
+            if line.startswith(_RESULT_MARKER):
+                try:
+                    return json.loads(line[len(_RESULT_MARKER):])
+                except ValueError:
+                    return None
+        return None
+    
+    @staticmethod
+    def _input_sizes(max_size: int) -> List[int]:
+        sizes = []
+        n = 1
+        while n <= max_size:
+            sizes.append(n)
+            n = max(n + 1, int(n * 1.5))
+        return sizes
@@ -17,17 +17,99 @@ class Config:
     # Google Gemini API
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
     GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-pro')
+    LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 200))  # Max in-flight async Gemini calls
+    
+    # Model backend: 'gemini', or 'stub' for offline load testing without API quota
+    LLM_BACKEND = os.environ.get('LLM_BACKEND', 'gemini').lower()
+    LLM_STUB_LATENCY = os.environ.get('LLM_STUB_LATENCY', 'lognormal:0.8,0.4')  # first-token seconds (see llm_backends)
+    LLM_STUB_TOKEN_RATE = float(os.environ.get('LLM_STUB_TOKEN_RATE', 60))  # output tokens per second
+    LLM_STUB_FAILURE_RATE = float(os.environ.get('LLM_STUB_FAILURE_RATE', 0.0))  # share of calls that fail
+    LLM_STUB_REPLIES_PATH = os.environ.get('LLM_STUB_REPLIES_PATH', '')  # JSON [[keyword, template], ...]
+    LLM_STUB_SEED = int(os.environ['LLM_STUB_SEED']) if os.environ.get('LLM_STUB_SEED') else None
     
     # Application settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     JSON_SORT_KEYS = False
+    ASGI_SYNC_WORKERS = int(os.environ.get('ASGI_SYNC_WORKERS', 32))  # threads for sync and streaming routes under asgi.py
     
     # Interview settings
     DEFAULT_INTERVIEW_TYPE = 'technical'
     MAX_SESSION_TIME = 3600  # 1 hour in seconds
+    SESSION_IDLE_TIMEOUT = int(os.environ.get('SESSION_IDLE_TIMEOUT', 900))  # seconds without activity
+    REAPER_INTERVAL = float(os.environ.get('REAPER_INTERVAL', 30))  # max seconds between expiry sweeps
+    
+    # Session storage: 'memory' (single process) or 'sqlite' (shared by all workers)
+    SESSION_STORE_BACKEND = os.environ.get('SESSION_STORE_BACKEND', 'memory')
+    SESSION_STORE_PATH = os.environ.get('SESSION_STORE_PATH', os.path.join('data', 'sessions.db'))
+    
+    # Completed-session archive: recent sessions in memory, older ones spilled to disk
+    ARCHIVE_MAX_SESSIONS = int(os.environ.get('ARCHIVE_MAX_SESSIONS', 500))
+    ARCHIVE_MAX_BYTES = int(os.environ.get('ARCHIVE_MAX_BYTES', 64 * 1024 * 1024))
+    ARCHIVE_SEGMENT_PATH = os.environ.get('ARCHIVE_SEGMENT_PATH', os.path.join('data', 'completed_sessions.seg'))
+    ARCHIVE_MAX_DISK_SESSIONS = int(os.environ.get('ARCHIVE_MAX_DISK_SESSIONS', 10000))  # older spilled sessions are deleted
+    ARCHIVE_MAX_SEGMENT_BYTES = int(os.environ.get('ARCHIVE_MAX_SEGMENT_BYTES', 256 * 1024 * 1024))
     
     # Code analysis settings
     MAX_CODE_LENGTH = 10000  # Maximum characters in code submission
+    CLANG_MAX_CONCURRENCY = int(os.environ.get('CLANG_MAX_CONCURRENCY', os.cpu_count() or 4))
+    CLANG_PCH_DIR = os.environ.get('CLANG_PCH_DIR', os.path.join('data', 'clang_pch'))
+    VALIDATION_CACHE_MAX_ENTRIES = int(os.environ.get('VALIDATION_CACHE_MAX_ENTRIES', 4096))
+    VALIDATION_CACHE_MAX_BYTES = int(os.environ.get('VALIDATION_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    SNIPPET_RETENTION = int(os.environ.get('SNIPPET_RETENTION', 3600))  # seconds after a session's last stored snippet
+    INCREMENTAL_MAX_DOCUMENTS = int(os.environ.get('INCREMENTAL_MAX_DOCUMENTS', 256))  # editor buffers kept for edits
+    VALIDATION_WORKERS = int(os.environ.get('VALIDATION_WORKERS', 0))  # worker processes; 0 validates on the request thread
+    VALIDATION_QUEUE_LIMIT = int(os.environ.get('VALIDATION_QUEUE_LIMIT', 64))  # queued or running validations
+    VALIDATION_TIMEOUT = float(os.environ.get('VALIDATION_TIMEOUT', 15))  # seconds a request waits for a worker
+    
+    # Sandboxed test-case execution
+    EXECUTION_MAX_WORKERS = int(os.environ.get('EXECUTION_MAX_WORKERS', os.cpu_count() or 4))  # test cases run at once
+    EXECUTION_TIME_LIMIT = float(os.environ.get('EXECUTION_TIME_LIMIT', 2.0))  # CPU seconds per test case
+    EXECUTION_MEMORY_LIMIT_MB = int(os.environ.get('EXECUTION_MEMORY_LIMIT_MB', 256))
+    EXECUTION_OUTPUT_LIMIT_KB = int(os.environ.get('EXECUTION_OUTPUT_LIMIT_KB', 1024))
+    EXECUTION_COMPILE_TIMEOUT = float(os.environ.get('EXECUTION_COMPILE_TIMEOUT', 30))  # seconds
+    EXECUTION_CPP_COMPILER = os.environ.get('EXECUTION_CPP_COMPILER', '')  # empty picks clang++ or g++
+    EXECUTION_LAUNCHER_DIR = os.environ.get('EXECUTION_LAUNCHER_DIR', os.path.join('data', 'sandbox'))
+    EXECUTION_MAX_TEST_CASES = int(os.environ.get('EXECUTION_MAX_TEST_CASES', 50))  # per problem
+    EXECUTION_SANDBOX_UID = int(os.environ.get('EXECUTION_SANDBOX_UID', 65534))  # uid and gid code runs as when the server is root
+    
+    # Empirical complexity estimation of submitted functions (Python only)
+    EMPIRICAL_COMPLEXITY_ENABLED = os.environ.get('EMPIRICAL_COMPLEXITY_ENABLED', 'True').lower() == 'true'
+    EMPIRICAL_COMPLEXITY_MAX_SIZE = int(os.environ.get('EMPIRICAL_COMPLEXITY_MAX_SIZE', 100000))  # largest input size
+    EMPIRICAL_COMPLEXITY_TIME_BUDGET = float(os.environ.get('EMPIRICAL_COMPLEXITY_TIME_BUDGET', 3.0))  # seconds per estimate
+    EMPIRICAL_COMPLEXITY_MIN_CONFIDENCE = float(os.environ.get('EMPIRICAL_COMPLEXITY_MIN_CONFIDENCE', 0.6))  # to override the LLM
+    EMPIRICAL_COMPLEXITY_WORKERS = int(os.environ.get('EMPIRICAL_COMPLEXITY_WORKERS', 2))  # background measurements at once
+    EMPIRICAL_COMPLEXITY_MAX_PENDING = int(os.environ.get('EMPIRICAL_COMPLEXITY_MAX_PENDING', 32))  # queued before new ones are skipped
+    EMPIRICAL_COMPLEXITY_CACHE_ENTRIES = int(os.environ.get('EMPIRICAL_COMPLEXITY_CACHE_ENTRIES', 1024))  # memoized estimates
+    
+    # Conversation context sent with each interview turn (approximate tokens)
+    CONTEXT_TOKEN_BUDGETS = {
+        'technical': int(os.environ.get('CONTEXT_BUDGET_TECHNICAL', 2000)),
+        'behavioral': int(os.environ.get('CONTEXT_BUDGET_BEHAVIORAL', 1500)),
+        'system_design': int(os.environ.get('CONTEXT_BUDGET_SYSTEM_DESIGN', 3000))
+    }
+    CONTEXT_SUMMARY_TOKENS = int(os.environ.get('CONTEXT_SUMMARY_TOKENS', 400))  # rolling summary of older turns
+    CONTEXT_MAX_CODE_LINES = int(os.environ.get('CONTEXT_MAX_CODE_LINES', 40))  # longer code blocks are cut
+    CHAT_SESSIONS_ENABLED = os.environ.get('CHAT_SESSIONS_ENABLED', 'True').lower() == 'true'  # Gemini multi-turn chats
+    
+    # Interview evaluation kept up to date in the background after each answer
+    RUNNING_EVALUATION_WORKERS = int(os.environ.get('RUNNING_EVALUATION_WORKERS', 4))  # sessions folded at once
+    RUNNING_EVALUATION_WAIT = float(os.environ.get('RUNNING_EVALUATION_WAIT', 10))  # seconds end_interview waits for a fold
+    
+    # LLM response cache (analyze_code / evaluate_code_solution)
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 3600))  # seconds
+    
+    # Pre-generated coding problem pool
+    PROBLEM_POOL_ENABLED = os.environ.get('PROBLEM_POOL_ENABLED', 'True').lower() == 'true'
+    PROBLEM_POOL_DEPTH = int(os.environ.get('PROBLEM_POOL_DEPTH', 5))          # problems kept per bucket
+    PROBLEM_POOL_LOW_WATER = int(os.environ.get('PROBLEM_POOL_LOW_WATER', 2))  # refill below this
+    PROBLEM_POOL_PATH = os.environ.get('PROBLEM_POOL_PATH', os.path.join('data', 'problem_pool.json'))
+    PROBLEM_POOL_PROMOTE_AFTER = int(os.environ.get('PROBLEM_POOL_PROMOTE_AFTER', 3))  # misses before a non-prewarm key is pooled
+    PROBLEM_POOL_PREWARM = os.environ.get(
+        'PROBLEM_POOL_PREWARM',
+        'easy:algorithms:python;medium:algorithms:python;hard:algorithms:python'
+    )
     SUPPORTED_LANGUAGES = ['python', 'javascript', 'java', 'cpp', 'c', 'go', 'rust']
     
     @staticmethod
@@ -35,7 +117,7 @@ class Config:
         """Validate required configuration"""
         errors = []
         
-        if not Config.GEMINI_API_KEY:
+        if Config.LLM_BACKEND == 'gemini' and not Config.GEMINI_API_KEY:
             errors.append("GEMINI_API_KEY is required")
             
         return errors
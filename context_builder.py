@@ -0,0 +1,187 @@
+"""
+Context Builder for AI Interview Simulator
+依權杖預算組裝對話上下文：固定保留系統提示，較舊的對話濃縮為摘要，並截斷過長的程式碼區塊
+"""
+
+import functools
+import logging
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PREFIX = "System: "
+
+# CJK ideographs, kana, hangul and full-width punctuation count about one token per character
+_WIDE_CHARS = re.compile(r'[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+_CODE_BLOCK = re.compile(r'```[^\n]*\n.*?(?:```|\Z)', re.DOTALL)
+_SENTENCE_END = re.compile(r'[。！？!?\n]|\.(?:\s|$)')
+
+@functools.lru_cache(maxsize=4096)
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate the model's token count for a text without calling the API
+    
+    Wide (CJK) characters count as one token each and everything else as one
+    token per four characters, which tracks Gemini's tokenizer closely enough
+    for budgeting.
+    """
+    wide = len(_WIDE_CHARS.findall(text))
+    return wide + math.ceil((len(text) - wide) / 4)
+
+class ContextBuilder:
+    """
+    Builds the conversation context sent ahead of each prompt
+    
+    The system prompt (the history's "System: " entry) is always kept. The
+    most recent entries are added newest-first until the interview type's
+    token budget is spent; every older entry is reduced to a one-line
+    extract (speaker and first sentence) in a summary that rolls forward as
+    the window moves, itself capped at `summary_budget` tokens. Code blocks
+    longer than `max_code_lines` keep only their head and tail.
+    """
+    
+    def __init__(self,
+                 budgets: Optional[Dict[str, int]] = None,
+                 default_budget: int = 3000,
+                 summary_budget: int = 400,
+                 max_code_lines: int = 40,
+                 summary_chars: int = 80):
+        """
+        Initialize context builder
+        
+        Args:
+            budgets: Token budget of the context per interview type
+            default_budget: Budget for interview types not in `budgets`
+            summary_budget: Tokens of the budget the rolling summary may use
+            max_code_lines: Longest code block kept whole
+            summary_chars: Longest extract kept per summarized entry
+        """
+        self.budgets = dict(budgets or {})
+        self.default_budget = default_budget
+        self.summary_budget = summary_budget
+        self.max_code_lines = max_code_lines
+        self.summary_chars = summary_chars
+        
+        # Statistics
+        self.builds = 0
+        self.summarized_entries = 0
+        self.context_tokens = 0
+    
+    def budget_for(self, interview_type: Optional[str]) -> int:
+        """Token budget of the context for an interview type"""
+        return self.budgets.get(interview_type or '', self.default_budget)
+    
+    def build(self, history: List[str], interview_type: Optional[str] = None, prompt: str = '') -> str:
+        """
+        Assemble the context for one model call
+        
+        Args:
+            history: Session history entries ("System: ...", "Interviewer: ...", ...)
+            interview_type: Interview type selecting the token budget
+            prompt: The prompt the context goes with; a system prompt it already
+                    contains is not repeated
+        
+        Returns:
+            Context text (empty when there is no history)
+        """
+        if not history:
+            return ''
+        
+        pinned, turns = self._split_pinned(history)
+        pinned = [entry for entry in pinned if entry[len(SYSTEM_PREFIX):].strip() not in prompt]
+        budget = self.budget_for(interview_type) - sum(estimate_tokens(entry) for entry in pinned)
+        
+        # Newest turns first, leaving room for the summary of whatever does not fit
+        recent: List[str] = []
+        remaining = budget - self.summary_budget
+        cut = len(turns)
+        for index in range(len(turns) - 1, -1, -1):
+            entry = self.truncate_code(turns[index])
+            tokens = estimate_tokens(entry)
+            if tokens > remaining:
+                break
+            recent.append(entry)
+            remaining -= tokens
+            cut = index
+        recent.reverse()
+        
+        parts = list(pinned)
+        if cut > 0:
+            parts.append(self._summarize(turns[:cut], self.summary_budget + max(remaining, 0)))
+            self.summarized_entries += cut
+        parts.extend(recent)
+        
+        context = "\n".join(parts)
+        self.builds += 1
+        self.context_tokens += estimate_tokens(context)
+        return context
+    
+    def get_stats(self) -> Dict[str, object]:
+        """Get builder statistics"""
+        return {
+            'builds': self.builds,
+            'summarized_entries': self.summarized_entries,
+            'average_context_tokens': round(self.context_tokens / self.builds, 1) if self.builds else 0,
+            'budgets': dict(self.budgets, default=self.default_budget)
+        }
+    
+    @staticmethod
+    def _split_pinned(history: List[str]) -> Tuple[List[str], List[str]]:
+        """Separate system prompts from conversation turns"""
+        pinned = [entry for entry in history if entry.startswith(SYSTEM_PREFIX)]
+        turns = [entry for entry in history if not entry.startswith(SYSTEM_PREFIX)]
+        return pinned, turns
+    
+    def truncate_code(self, entry: str) -> str:
+        """Shorten code blocks longer than max_code_lines to their head and tail"""
+        if '```' not in entry:
+            return entry
+        return _CODE_BLOCK.sub(self._truncate_block, entry)
+    
+    def _truncate_block(self, match: 're.Match') -> str:
+        lines = match.group(0).split('\n')
+        if len(lines) <= self.max_code_lines:
+            return match.group(0)
+        head = self.max_code_lines * 2 // 3
+        tail = self.max_code_lines - head
+        omitted = len(lines) - head - tail
+        return '\n'.join(lines[:head] + [f"... （省略 {omitted} 行）..."] + lines[-tail:])
+    
+    def _summarize(self, turns: List[str], budget: int) -> str:
+        """Rolling summary of older turns, dropping the oldest extracts past the budget"""
+        lines = [_extract(turn, self.summary_chars) for turn in turns]
+        header = "先前對話摘要："
+        used = estimate_tokens(header)
+        kept: List[str] = []
+        for line in reversed(lines):
+            tokens = estimate_tokens(line) + 1
+            if used + tokens > budget:
+                break
+            kept.append(line)
+            used += tokens
+        kept.reverse()
+        
+        if len(kept) < len(lines):
+            kept.insert(0, f"- （更早的 {len(lines) - len(kept)} 則對話已省略）")
+        return "\n".join([header] + kept)
+
+@functools.lru_cache(maxsize=4096)
+def _extract(turn: str, max_chars: int) -> str:
+    """One summary line for a turn: its speaker and first sentence, code reduced to a line count"""
+    speaker, separator, text = turn.partition(': ')
+    if not separator:
+        speaker, text = '', turn
+    
+    text = _CODE_BLOCK.sub(_code_placeholder, text).strip()
+    match = _SENTENCE_END.search(text)
+    sentence = text[:match.end()].strip() if match else text
+    if len(sentence) > max_chars:
+        sentence = sentence[:max_chars].rstrip() + '…'
+    return f"- {speaker}: {sentence}" if speaker else f"- {sentence}"
+
+def _code_placeholder(match: 're.Match') -> str:
+    # The fence lines are not code
+    code_lines = max(match.group(0).count('\n') - 1, 0)
+    return f" [程式碼 {code_lines} 行] "
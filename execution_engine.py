@@ -0,0 +1,542 @@
+"""
+Execution Engine for AI Interview Simulator
+沙箱化的測試案例執行引擎：在隔離的沙箱（見 sandbox.py）中以 rlimit 與逾時限制編譯並執行 Python / C++ 解答，回報每個案例的結果、耗時與記憶體峰值
+"""
+
+import functools
+import hashlib
+import logging
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sandbox import Sandbox, SandboxUnavailable
+from session_store import SessionStore, create_session_store
+
+logger = logging.getLogger(__name__)
+
+STATUS_PASSED = 'passed'
+STATUS_WRONG_ANSWER = 'wrong_answer'
+STATUS_RUNTIME_ERROR = 'runtime_error'
+STATUS_TIME_LIMIT = 'time_limit_exceeded'
+STATUS_MEMORY_LIMIT = 'memory_limit_exceeded'
+STATUS_OUTPUT_LIMIT = 'output_limit_exceeded'
+STATUS_SANDBOX_ERROR = 'sandbox_error'
+
+# How much of each case's stdout/stderr is kept in the report
+_REPORTED_OUTPUT_CHARS = 2000
+
+# Runs the submission under an audit hook that refuses networking, new processes and ctypes.
+# The sandbox already blocks all of these; the hook gives Python code a readable error instead.
+_PYTHON_BOOTSTRAP = '''
+import sys
+_BLOCKED_MODULES = {'_socket', '_posixsubprocess', '_ctypes'}
+_BLOCKED_EVENTS = ('socket.', 'subprocess.', 'os.system', 'os.exec', 'os.fork', 'os.forkpty',
+                   'os.posix_spawn', 'os.spawn', 'os.kill', 'os.killpg', 'pty.spawn', 'ctypes.')
+def _sandbox_hook(event, args):
+    if event == 'import' and args[0] in _BLOCKED_MODULES or event.startswith(_BLOCKED_EVENTS):
+        raise PermissionError(f"{event} is not allowed in the sandbox")
+sys.addaudithook(_sandbox_hook)
+_path = sys.argv[1]
+sys.argv = sys.argv[1:]
+with open(_path, encoding='utf-8') as _file:
+    _code = compile(_file.read(), 'solution.py', 'exec')
+del _file, _path
+exec(_code, {'__name__': '__main__', '__builtins__': __builtins__})
+'''
+
+# A process forked from the server starts with the server's resident set as its
+# peak RSS, and exec keeps that peak. This launcher is exec'd first and forks the
+# submission from its own tiny address space, so the submission's rusage is its own.
+# Its wall time likewise spans only fork to wait4, leaving out namespace and mount setup.
+# Usage: launcher <report file> <program> [args...];
+# writes "<wait status> <maxrss KB> <user us> <sys us> <wall us>".
+_LAUNCHER_SOURCE = r'''
+#include <cstdio>
+#include <sys/resource.h>
+#include <sys/wait.h>
+#include <time.h>
+#include <unistd.h>
+
+static long monotonic_us() {
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    return (long)now.tv_sec * 1000000L + now.tv_nsec / 1000;
+}
+
+int main(int argc, char** argv) {
+    if (argc < 3) return 2;
+    long start_us = monotonic_us();
+    pid_t pid = fork();
+    if (pid < 0) return 3;
+    if (pid == 0) {
+        struct rlimit none = {0, 0};
+        setrlimit(RLIMIT_NPROC, &none);
+        execv(argv[2], argv + 2);
+        _exit(127);
+    }
+    int status = 0;
+    struct rusage usage;
+    if (wait4(pid, &status, 0, &usage) < 0) return 4;
+    long wall_us = monotonic_us() - start_us;
+    FILE* report = fopen(argv[1], "w");
+    if (!report) return 5;
+    fprintf(report, "%d %ld %ld %ld %ld\n", status, usage.ru_maxrss,
+            (long)usage.ru_utime.tv_sec * 1000000L + usage.ru_utime.tv_usec,
+            (long)usage.ru_stime.tv_sec * 1000000L + usage.ru_stime.tv_usec, wall_us);
+    return fclose(report) == 0 ? 0 : 5;
+}
+'''
+
+@dataclass
+class TestCase:
+    """One stdin/stdout test case"""
+    input: str
+    expected_output: str
+    name: str = ''
+
+@dataclass
+class TestResult:
+    """Outcome of one test case"""
+    name: str
+    status: str
+    passed: bool
+    wall_time_ms: float
+    cpu_time_ms: float
+    peak_memory_kb: int
+    exit_code: Optional[int]
+    stdout: str = ''
+    stderr: str = ''
+
+@dataclass
+class ExecutionReport:
+    """Outcome of running a submission against its test cases"""
+    language: str
+    results: List[TestResult] = field(default_factory=list)
+    compile_error: str = ''
+    sandboxed: bool = False
+    
+    @property
+    def passed_count(self) -> int:
+        return sum(1 for result in self.results if result.passed)
+    
+    @property
+    def all_passed(self) -> bool:
+        return not self.compile_error and bool(self.results) and self.passed_count == len(self.results)
+    
+    @property
+    def max_wall_time_ms(self) -> float:
+        return max((result.wall_time_ms for result in self.results), default=0.0)
+    
+    @property
+    def max_peak_memory_kb(self) -> int:
+        return max((result.peak_memory_kb for result in self.results), default=0)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'language': self.language,
+            'compile_error': self.compile_error,
+            'passed': self.passed_count,
+            'total': len(self.results),
+            'all_passed': self.all_passed,
+            'max_wall_time_ms': self.max_wall_time_ms,
+            'max_peak_memory_kb': self.max_peak_memory_kb,
+            'sandboxed': self.sandboxed,
+            'results': [asdict(result) for result in self.results]
+        }
+    
+    def summary(self) -> str:
+        """Plain-text summary for the evaluation prompt"""
+        if self.compile_error:
+            return f"編譯失敗：\n{self.compile_error[:1000]}"
+        
+        lines = [
+            f"通過 {self.passed_count}/{len(self.results)} 個測試案例，"
+            f"最長執行時間 {self.max_wall_time_ms:.1f} ms，記憶體峰值 {self.max_peak_memory_kb} KB"
+        ]
+        for result in self.results:
+            lines.append(
+                f"- {result.name}: {result.status}（{result.wall_time_ms:.1f} ms, {result.peak_memory_kb} KB）"
+            )
+        return '\n'.join(lines)
+
+def parse_test_cases(raw_cases: Any, max_cases: int = 50) -> List[TestCase]:
+    """
+    Validate test cases sent by a client
+    
+    Args:
+        raw_cases: List of {input, expected_output, name?} objects
+        max_cases: Maximum number of cases accepted
+    
+    Returns:
+        List of TestCase
+    
+    Raises:
+        ValueError: If the cases are malformed
+    """
+    if not isinstance(raw_cases, list) or not raw_cases:
+        raise ValueError("test_cases must be a non-empty list")
+    if len(raw_cases) > max_cases:
+        raise ValueError(f"at most {max_cases} test cases are allowed")
+    
+    cases = []
+    for index, raw in enumerate(raw_cases, 1):
+        if not isinstance(raw, dict):
+            raise ValueError("each test case must be an object with input and expected_output")
+        case_input = raw.get('input', '')
+        expected = raw.get('expected_output')
+        name = raw.get('name') or f"case {index}"
+        if not isinstance(case_input, str) or not isinstance(expected, str) or not isinstance(name, str):
+            raise ValueError("test case input, expected_output and name must be strings")
+        cases.append(TestCase(input=case_input, expected_output=expected, name=name))
+    return cases
+
+def make_problem_id(problem: str) -> str:
+    """Stable ID for a problem statement that has no ID of its own"""
+    return hashlib.sha256(problem.strip().encode('utf-8')).hexdigest()[:16]
+
+def _normalize_output(text: str) -> str:
+    """Ignore trailing whitespace on each line and trailing blank lines"""
+    lines = text.replace('\r\n', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).rstrip('\n')
+
+class ExecutionEngine:
+    """
+    Runs submissions against stdin/stdout test cases in a subprocess sandbox
+    
+    Each case runs in its own process and scratch directory inside a
+    Sandbox: private namespaces, a root file system holding only system
+    directories, the interpreter and the scratch directory, an unprivileged
+    uid and a seccomp filter. On top of that come rlimits on CPU time,
+    address space, output file size, open files and process count, a
+    wall-clock timeout and a minimal environment. Python additionally runs
+    under an audit hook that blocks sockets, subprocesses and ctypes. C++ is
+    compiled once per run, in the sandbox too, so #include cannot read host
+    files. When the sandbox cannot be set up on this host, nothing is run.
+    Cases are spread over a shared thread pool
+    (the threads only wait on child processes). Peak memory and CPU time
+    come from the submission's rusage, collected by a small native launcher
+    (see _LAUNCHER_SOURCE), which also times the run itself so wall time
+    leaves out sandbox setup; without a C++ compiler the launcher cannot be
+    built, peak memory includes the server's own resident set and wall time
+    includes sandbox setup.
+    """
+    
+    def __init__(self,
+                 max_workers: Optional[int] = None,
+                 time_limit: float = 2.0,
+                 memory_limit_mb: int = 256,
+                 output_limit_kb: int = 1024,
+                 compile_timeout: float = 30,
+                 cpp_compiler: Optional[str] = None,
+                 launcher_dir: Optional[str] = None,
+                 max_test_cases: int = 50,
+                 sandbox_uid: int = 65534):
+        """
+        Initialize execution engine
+        
+        Args:
+            max_workers: Test cases run at once across all requests (defaults to the CPU count)
+            time_limit: CPU seconds allowed per test case
+            memory_limit_mb: Address-space limit per test case
+            output_limit_kb: Maximum stdout plus stderr per test case
+            compile_timeout: Seconds allowed for compiling C++
+            cpp_compiler: C++ compiler (defaults to clang++ or g++, whichever exists)
+            launcher_dir: Directory the launcher and the sandbox root are kept in (defaults to a temporary directory)
+            max_test_cases: Maximum test cases per run or stored problem
+            sandbox_uid: Unprivileged uid and gid code runs as when the server runs as root
+        """
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self.time_limit = time_limit
+        self.memory_limit_mb = memory_limit_mb
+        self.output_limit_kb = output_limit_kb
+        self.compile_timeout = compile_timeout
+        self.max_test_cases = max_test_cases
+        self.cpp_compiler = cpp_compiler or shutil.which('clang++') or shutil.which('g++')
+        
+        launcher_dir = os.path.abspath(launcher_dir or os.path.join(tempfile.gettempdir(), 'interview-sandbox'))
+        self.launcher_path = self._build_launcher(launcher_dir) if self.cpp_compiler else None
+        
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sandbox')
+        self._env = {'PATH': '/usr/local/bin:/usr/bin:/bin', 'LANG': 'C.UTF-8', 'HOME': '/tmp'}
+        self.sandbox = Sandbox(
+            os.path.join(launcher_dir, 'root'), uid=sandbox_uid, gid=sandbox_uid,
+            read_only_paths=[self.launcher_path] if self.launcher_path else []
+        )
+        
+        # Problem ID -> list of test case dicts
+        self.test_cases: SessionStore = create_session_store('test_cases')
+        
+        # Statistics
+        self.runs = 0
+        self.cases_run = 0
+        self.compile_errors = 0
+        
+        logger.info(f"Execution engine initialized (workers: {self.max_workers}, C++ compiler: {self.cpp_compiler})")
+    
+    @property
+    def sandboxed(self) -> bool:
+        """Whether code can be run; without the sandbox nothing is"""
+        return self.sandbox.available
+    
+    def supported_languages(self) -> List[str]:
+        """Languages submissions can be run in"""
+        if not self.sandboxed:
+            return []
+        return ['python', 'cpp'] if self.cpp_compiler else ['python']
+    
+    def save_test_cases(self, problem_id: str, cases: List[TestCase]):
+        """Store the test cases of a problem, replacing any existing ones"""
+        self.test_cases[problem_id] = [asdict(case) for case in cases]
+    
+    def get_test_cases(self, problem_id: str) -> Optional[List[TestCase]]:
+        """Get the stored test cases of a problem, or None if there are none"""
+        stored = self.test_cases.get(problem_id)
+        if stored is None:
+            return None
+        return [TestCase(**case) for case in stored]
+    
+    def run(self,
+            code: str,
+            language: str,
+            cases: List[TestCase],
+            time_limit: Optional[float] = None) -> ExecutionReport:
+        """
+        Run a submission against test cases
+        
+        Args:
+            code: Source code reading stdin and writing stdout
+            language: 'python' or 'cpp'
+            cases: Test cases to run
+            time_limit: CPU seconds per case, overriding the engine's limit
+        
+        Returns:
+            ExecutionReport with one result per case, in order
+        
+        Raises:
+            SandboxUnavailable: If the sandbox cannot be set up on this host
+            ValueError: If the language cannot be run
+        """
+        if not self.sandboxed:
+            raise SandboxUnavailable(f"code execution is disabled: {self.sandbox.unavailable_reason}")
+        language = language.lower()
+        if language not in self.supported_languages():
+            raise ValueError(f"running {language} code is not supported")
+        
+        time_limit = time_limit or self.time_limit
+        self.runs += 1
+        report = ExecutionReport(language=language, sandboxed=True)
+        
+        with tempfile.TemporaryDirectory(prefix='sandbox-') as work_dir:
+            # Scratch directories must be readable by the sandbox's uid
+            os.chmod(work_dir, 0o755)
+            
+            if language == 'python':
+                source_path = os.path.join(work_dir, 'solution.py')
+                with open(source_path, 'w', encoding='utf-8') as f:
+                    f.write(code)
+                command = [sys.executable, '-I', '-S', '-B', '-X', 'utf8', '-c', _PYTHON_BOOTSTRAP, source_path]
+            else:
+                command, report.compile_error = self._compile_cpp(code, work_dir)
+                if report.compile_error:
+                    self.compile_errors += 1
+                    return report
+            
+            futures = [
+                self._executor.submit(
+                    self._run_case, command, case, os.path.join(work_dir, f'case-{index}'), time_limit
+                )
+                for index, case in enumerate(cases)
+            ]
+            report.results = [future.result() for future in futures]
+        
+        self.cases_run += len(cases)
+        return report
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get engine statistics"""
+        return {
+            'workers': self.max_workers,
+            'languages': self.supported_languages(),
+            'sandboxed': self.sandboxed,
+            'exact_memory': self.launcher_path is not None,
+            'runs': self.runs,
+            'cases_run': self.cases_run,
+            'compile_errors': self.compile_errors,
+            'stored_problems': len(self.test_cases)
+        }
+    
+    def _build_launcher(self, launcher_dir: str) -> Optional[str]:
+        """Compile the launcher, reusing an existing build of the same source"""
+        digest = hashlib.sha256(f"{self.cpp_compiler}\0{_LAUNCHER_SOURCE}".encode('utf-8')).hexdigest()[:12]
+        launcher_path = os.path.join(launcher_dir, f'launcher-{digest}')
+        if os.access(launcher_path, os.X_OK):
+            return launcher_path
+        
+        try:
+            os.makedirs(launcher_dir, exist_ok=True)
+            # Build under a per-process name so concurrent workers never see a partial binary
+            partial_path = f"{launcher_path}.{os.getpid()}"
+            subprocess.run(
+                [self.cpp_compiler, '-x', 'c++', '-O2', '-o', partial_path, '-'],
+                input=_LAUNCHER_SOURCE, capture_output=True, text=True, timeout=self.compile_timeout, check=True
+            )
+            os.chmod(partial_path, 0o755)
+            os.replace(partial_path, launcher_path)
+            return launcher_path
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Could not build the sandbox launcher, peak memory will be approximate: {e}")
+            return None
+    
+    def _compile_cpp(self, code: str, work_dir: str) -> Tuple[List[str], str]:
+        """Compile a C++ submission; returns (command to run it, compile error text)"""
+        source_path = os.path.join(work_dir, 'solution.cpp')
+        binary_path = os.path.join(work_dir, 'solution')
+        with open(source_path, 'w', encoding='utf-8') as f:
+            f.write(code)
+        
+        self.sandbox.prepare_writable(work_dir)
+        
+        try:
+            result = subprocess.run(
+                [self.cpp_compiler, '-std=c++17', '-O2', '-pipe', '-o', binary_path, source_path],
+                capture_output=True, text=True, timeout=self.compile_timeout, env=self._env, cwd=work_dir,
+                start_new_session=True,
+                preexec_fn=self.sandbox.preexec([(work_dir, True)], work_dir, self._limit_compiler)
+            )
+        except subprocess.TimeoutExpired:
+            return [], f"Compilation exceeded {self.compile_timeout} seconds"
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.error(f"Sandbox failed to compile a submission: {e}")
+            return [], "The sandbox could not compile the submission"
+        
+        if result.returncode != 0:
+            # Report paths relative to the submission rather than our scratch directory
+            return [], result.stderr.replace(source_path, 'solution.cpp')[:5000]
+        return [binary_path], ''
+    
+    def _run_case(self, command: List[str], case: TestCase, case_dir: str, time_limit: float) -> TestResult:
+        """Run one test case in its own directory and judge the output"""
+        os.mkdir(case_dir)
+        os.chmod(case_dir, 0o777)
+        input_path = os.path.join(case_dir, 'input.txt')
+        output_path = os.path.join(case_dir, 'output.txt')
+        error_path = os.path.join(case_dir, 'error.txt')
+        report_path = os.path.join(case_dir, 'rusage.txt')
+        if self.launcher_path:
+            command = [self.launcher_path, report_path] + command
+        work_dir = os.path.dirname(case_dir)
+        with open(input_path, 'w', encoding='utf-8') as f:
+            f.write(case.input)
+        
+        timed_out = threading.Event()
+        try:
+            with open(input_path, 'rb') as stdin, open(output_path, 'wb') as stdout, open(error_path, 'wb') as stderr:
+                start = time.perf_counter()
+                process = subprocess.Popen(
+                    command, stdin=stdin, stdout=stdout, stderr=stderr, cwd=case_dir,
+                    env=self._env, close_fds=True, start_new_session=True,
+                    preexec_fn=self.sandbox.preexec(
+                        [(work_dir, False), (case_dir, True)], case_dir,
+                        functools.partial(self._limit_child, time_limit)
+                    )
+                )
+            
+            # CPU time is capped by RLIMIT_CPU; this also catches sleeping or blocked code
+            def kill():
+                timed_out.set()
+                self._kill_group(process.pid)
+            
+            timer = threading.Timer(time_limit * 2 + 1, kill)
+            timer.start()
+            try:
+                _, status, usage = os.wait4(process.pid, 0)
+            finally:
+                timer.cancel()
+            wall_time_ms = (time.perf_counter() - start) * 1000
+            # Already reaped by wait4; keep Popen from waiting on the pid again
+            process.returncode = os.waitstatus_to_exitcode(status)
+            cpu_time_ms = (usage.ru_utime + usage.ru_stime) * 1000
+            peak_memory_kb = usage.ru_maxrss
+            
+            # The launcher's report describes the submission itself
+            if self.launcher_path and os.path.exists(report_path):
+                with open(report_path, encoding='utf-8') as f:
+                    status, peak_memory_kb, user_us, system_us, wall_us = map(int, f.read().split())
+                cpu_time_ms = (user_us + system_us) / 1000
+                wall_time_ms = wall_us / 1000
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            logger.error(f"Sandbox failed to run test case {case.name}: {e}")
+            return TestResult(case.name, STATUS_SANDBOX_ERROR, False, 0.0, 0.0, 0, None)
+        
+        # Stray processes the submission left in its session
+        self._kill_group(process.pid)
+        
+        with open(output_path, 'rb') as f:
+            output = f.read().decode('utf-8', errors='replace')
+        with open(error_path, 'rb') as f:
+            errors = f.read().decode('utf-8', errors='replace')
+        
+        exit_code = os.waitstatus_to_exitcode(status)
+        # Python ignores SIGXFSZ and fails the write instead, so also check what reached the files
+        output_bytes = os.path.getsize(output_path) + os.path.getsize(error_path)
+        
+        if timed_out.is_set() or cpu_time_ms > time_limit * 1000 or exit_code == -signal.SIGXCPU:
+            status_name = STATUS_TIME_LIMIT
+        elif exit_code == -signal.SIGXFSZ or output_bytes >= self.output_limit_kb * 1024:
+            status_name = STATUS_OUTPUT_LIMIT
+        elif exit_code != 0:
+            out_of_memory = 'MemoryError' in errors or 'bad_alloc' in errors
+            status_name = STATUS_MEMORY_LIMIT if out_of_memory else STATUS_RUNTIME_ERROR
+        elif _normalize_output(output) == _normalize_output(case.expected_output):
+            status_name = STATUS_PASSED
+        else:
+            status_name = STATUS_WRONG_ANSWER
+        
+        return TestResult(
+            name=case.name,
+            status=status_name,
+            passed=status_name == STATUS_PASSED,
+            wall_time_ms=round(wall_time_ms, 3),
+            cpu_time_ms=round(cpu_time_ms, 3),
+            peak_memory_kb=peak_memory_kb,
+            exit_code=exit_code,
+            stdout=output[:_REPORTED_OUTPUT_CHARS],
+            stderr=errors[:_REPORTED_OUTPUT_CHARS]
+        )
+    
+    def _limit_child(self, time_limit: float):
+        """Runs in the sandboxed child before exec: apply rlimits"""
+        cpu_seconds = int(time_limit) + 1
+        memory_bytes = self.memory_limit_mb * 1024 * 1024
+        output_bytes = self.output_limit_kb * 1024
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (output_bytes, output_bytes))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        if not self.launcher_path:
+            # Otherwise the launcher sets this after its one fork
+            resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    
+    def _limit_compiler(self):
+        """Runs in the sandboxed compiler before exec"""
+        cpu_seconds = int(self.compile_timeout) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    
+    @staticmethod
+    def _kill_group(pid: int):
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
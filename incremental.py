@@ -0,0 +1,175 @@
+"""
+Incremental Validation for AI Interview Simulator
+編輯器增量驗證：套用文字差異後只重新分詞受影響的行，從最近的括號檢查點續跑配對，未變動的區域沿用前一版結果
+"""
+
+import logging
+from typing import Any, List, NamedTuple
+
+from complexity import Token, tokenize_line
+from parsed_source import BracketScan, BracketStack, ParsedSource, scan_brackets
+
+logger = logging.getLogger(__name__)
+
+class TextEdit(NamedTuple):
+    """Replace code[start:end] with text (offsets in characters)"""
+    start: int
+    end: int
+    text: str
+
+def parse_edits(raw_edits: Any) -> List[TextEdit]:
+    """
+    Validate edits sent by the client
+    
+    Args:
+        raw_edits: List of {start, end, text} objects
+    
+    Returns:
+        List of TextEdit
+    
+    Raises:
+        ValueError: If the edits are malformed
+    """
+    if not isinstance(raw_edits, list):
+        raise ValueError("edits must be a list")
+    
+    edits = []
+    for raw in raw_edits:
+        if not isinstance(raw, dict):
+            raise ValueError("each edit must be an object with start, end and text")
+        start, end, text = raw.get('start'), raw.get('end', raw.get('start')), raw.get('text', '')
+        if type(start) is not int or type(end) is not int or not isinstance(text, str):
+            raise ValueError("edit start and end must be integers and text a string")
+        if start < 0 or end < start:
+            raise ValueError(f"invalid edit range {start}-{end}")
+        edits.append(TextEdit(start, end, text))
+    return edits
+
+def apply_text_edits(code: str, edits: List[TextEdit]) -> str:
+    """
+    Apply edits in order, each against the result of the previous one
+    
+    Raises:
+        ValueError: If an edit lies outside the text
+    """
+    for edit in edits:
+        if edit.end > len(code):
+            raise ValueError(f"edit range {edit.start}-{edit.end} is outside the code ({len(code)} characters)")
+        code = code[:edit.start] + edit.text + code[edit.end:]
+    return code
+
+def _shift_stack(stack: BracketStack, after_line: int, delta: int) -> BracketStack:
+    """Move openers below `after_line` by `delta` lines"""
+    if not delta:
+        return stack
+    return tuple((char, line + delta if line > after_line else line) for char, line in stack)
+
+def _shift_scan(scan: BracketScan, after_line: int, delta: int) -> BracketScan:
+    """Renumber a checkpoint taken below the edited lines"""
+    if not delta:
+        return scan
+    error = scan.error
+    if error is not None:
+        error = error._replace(line=error.line + delta, unclosed=_shift_stack(error.unclosed, after_line, delta))
+    return BracketScan(_shift_stack(scan.stack, after_line, delta), error)
+
+def _shift_tokens(tokens: List[Token], delta: int) -> List[Token]:
+    if not delta:
+        return tokens
+    return [Token(kind, text, line + delta) for kind, text, line in tokens]
+
+def apply_edits(base: ParsedSource, edits: List[TextEdit]) -> ParsedSource:
+    """
+    Build the parsed form of an edited copy of `base`, reusing its unchanged lines
+    
+    Lines shared with the base at the start and end of the file are found by
+    comparison. Only the lines in between are re-tokenized, starting from the
+    tokenizer state the previous line ended in, and re-tokenizing stops as
+    soon as that state matches the base again. Bracket matching restarts from
+    the checkpoint of the last unchanged line and stops once the open-bracket
+    stack matches the base's. Everything below is copied, renumbered if
+    lines were added or removed.
+    
+    Args:
+        base: Parsed previous version
+        edits: Edits to apply to base.code
+    
+    Returns:
+        ParsedSource of the edited code
+    
+    Raises:
+        ValueError: If an edit lies outside the text
+    """
+    code = apply_text_edits(base.code, edits)
+    lines = code.splitlines()
+    old_lines = base.lines
+    spec = base.spec
+    
+    old_tokens = base.line_tokens
+    old_states = base.line_states
+    old_scans = base.bracket_scans
+    
+    # Unchanged lines at the start and end
+    limit = min(len(lines), len(old_lines))
+    prefix = 0
+    while prefix < limit and lines[prefix] == old_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and lines[-1 - suffix] == old_lines[-1 - suffix]:
+        suffix += 1
+    
+    delta = len(lines) - len(old_lines)
+    changed_end = len(lines) - suffix          # first line (0-based) of the unchanged tail
+    old_changed_end = len(old_lines) - suffix  # the same line in the base; lines after it move by delta
+    
+    line_tokens = old_tokens[:prefix]
+    line_states = old_states[:prefix]
+    scans = old_scans[:prefix]
+    state = line_states[-1] if prefix else None
+    stack: BracketStack = scans[-1].stack if prefix else ()
+    
+    tokens_synced = False
+    index = prefix
+    while index < len(lines):
+        old_index = index - delta
+        if index >= changed_end:
+            if not tokens_synced:
+                tokens_synced = state == (old_states[old_index - 1] if old_index else None)
+            if tokens_synced:
+                old_stack = old_scans[old_index - 1].stack if old_index else ()
+                if stack == _shift_stack(old_stack, old_changed_end, delta):
+                    break
+        
+        if tokens_synced:
+            tokens = _shift_tokens(old_tokens[old_index], delta)
+            state = old_states[old_index]
+        else:
+            tokens, state = tokenize_line(lines[index], index + 1, spec, state)
+        scan = scan_brackets(tokens, stack)
+        stack = scan.stack
+        
+        line_tokens.append(tokens)
+        line_states.append(state)
+        scans.append(scan)
+        index += 1
+    
+    reused_from = index - delta
+    if delta:
+        line_tokens.extend(_shift_tokens(tokens, delta) for tokens in old_tokens[reused_from:])
+        scans.extend(_shift_scan(scan, old_changed_end, delta) for scan in old_scans[reused_from:])
+    else:
+        line_tokens.extend(old_tokens[reused_from:])
+        scans.extend(old_scans[reused_from:])
+    line_states.extend(old_states[reused_from:])
+    
+    logger.debug(f"Incremental parse: {index - prefix} of {len(lines)} line(s) re-scanned")
+    
+    return ParsedSource(
+        code,
+        base.language,
+        lines=lines,
+        line_tokens=line_tokens,
+        line_states=line_states,
+        bracket_scans=scans,
+        previous_regions=base.complexity_regions
+    )
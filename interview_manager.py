@@ -7,10 +7,17 @@ import logging
 import time
 import uuid
 from enum import Enum
-from typing import Dict, List, Optional, Tuple, Any
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Any
 from dataclasses import dataclass, asdict
 from llm_client import LLMClient
+from async_llm_client import AsyncLLMClient
+from complexity_estimator import MEASURABLE_LANGUAGES, ComplexityEstimate, ComplexityEstimator
 from config import Config
+from metrics import SESSION_HISTORY_BYTES
+from session_archive import SessionArchive
+from session_reaper import SessionReaper
+from session_store import SessionConflict, SessionStore, append_merge, batched, create_session_store
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +47,8 @@ class InterviewMetrics:
     total_questions: int = 0         # 總問題數
     correct_answers: int = 0         # 正確回答數
     response_quality: str = "B"      # 回答品質等級
+    empirical_complexity: str = ""   # 實測時間複雜度（如 O(n log n)）
+    empirical_complexity_confidence: float = 0.0  # 實測複雜度的信心值 (0-1)
 
 @dataclass
 class InterviewSession:
@@ -50,6 +59,7 @@ class InterviewSession:
     start_time: float = None
     end_time: float = None
     duration_minutes: float = 0
+    last_activity: float = None
     
     # Conversation data
     conversation_history: List[Dict] = None
@@ -75,6 +85,8 @@ class InterviewSession:
             self.feedback_history = []
         if self.start_time is None:
             self.start_time = time.time()
+        if self.last_activity is None:
+            self.last_activity = self.start_time
 
 class InterviewManager:
     """
@@ -82,11 +94,34 @@ class InterviewManager:
     Handles interview flow, state transitions, and logic
     """
     
-    def __init__(self, llm_client: LLMClient = None):
-        """Initialize interview manager"""
+    def __init__(self,
+                 llm_client: LLMClient = None,
+                 async_llm_client: AsyncLLMClient = None,
+                 complexity_estimator: Optional[ComplexityEstimator] = None):
+        """
+        Initialize interview manager
+        
+        Args:
+            llm_client: Synchronous LLM client
+            async_llm_client: Optional async LLM client used by the *_async methods,
+                              constructed over llm_client's sessions, running
+                              evaluator and chats
+            complexity_estimator: Optional estimator that measures submitted code's
+                                  time complexity in the background
+        """
         self.llm_client = llm_client or LLMClient()
-        self.active_sessions: Dict[str, InterviewSession] = {}
-        self.completed_sessions: List[InterviewSession] = []
+        self.async_llm_client = async_llm_client
+        self.complexity_estimator = complexity_estimator
+        self.active_sessions: SessionStore = create_session_store('interview_active', merge=append_merge(
+            lists=('conversation_history', 'feedback_history'), counters=('question_count',)
+        ))
+        self.completed_sessions = SessionArchive(
+            max_count=Config.ARCHIVE_MAX_SESSIONS,
+            max_bytes=Config.ARCHIVE_MAX_BYTES,
+            segment_path=Config.ARCHIVE_SEGMENT_PATH,
+            max_disk_count=Config.ARCHIVE_MAX_DISK_SESSIONS,
+            max_segment_bytes=Config.ARCHIVE_MAX_SEGMENT_BYTES
+        )
         
         # Interview configuration
         self.max_questions_per_type = {
@@ -101,8 +136,14 @@ class InterviewManager:
             InterviewType.SYSTEM_DESIGN: 60
         }
         
+        # Abandoned sessions are finalized in the background
+        self.idle_timeout = Config.SESSION_IDLE_TIMEOUT
+        self.reaper = SessionReaper(self._expire_session, interval=Config.REAPER_INTERVAL, name='interview-reaper')
+        self._expiry_listeners: List[Callable[[str], None]] = []
+        
         logger.info("Interview Manager initialized")
     
+    @batched('active_sessions', 'llm_client.sessions')
     def create_session(self, 
                       interview_type: str, 
                       candidate_name: str = "",
@@ -138,6 +179,7 @@ class InterviewManager:
             
             # Store session
             self.active_sessions[session_id] = session
+            self._touch(session)
             
             logger.info(f"Created interview session {session_id} for {interview_type}")
             return session_id
@@ -146,6 +188,7 @@ class InterviewManager:
             logger.error(f"Error creating interview session: {e}")
             raise
     
+    @batched('active_sessions', 'llm_client.sessions')
     def start_interview(self, session_id: str) -> Dict[str, Any]:
         """
         Start the interview process
@@ -166,39 +209,56 @@ class InterviewManager:
             initial_prompt = self._get_initial_prompt(session)
             
             # Get response from LLM
-            initial_question = self.llm_client.start_interview(session.interview_type.value)
-            
-            # Store initial interaction
-            session.current_question = initial_question
-            session.conversation_history.append({
-                'role': 'interviewer',
-                'content': initial_question,
-                'timestamp': time.time(),
-                'state': session.state.value
-            })
+            initial_question = self.llm_client.start_interview(session.interview_type.value, session_id)
             
-            session.question_count += 1
-            
-            logger.info(f"Started interview for session {session_id}")
+            return self._record_initial_question(session, initial_question)
             
+        except Exception as e:
+            logger.error(f"Error starting interview: {e}")
             return {
-                'success': True,
-                'session_id': session_id,
-                'question': initial_question,
-                'state': session.state.value,
-                'interview_type': session.interview_type.value,
-                'question_number': session.question_count,
-                'max_questions': self.max_questions_per_type[session.interview_type],
-                'time_limit_minutes': self.time_limits[session.interview_type]
+                'success': False,
+                'error': str(e)
             }
+    
+    @batched('active_sessions', 'llm_client.sessions')
+    def start_interview_stream(self, session_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of start_interview
+        
+        Args:
+            session_id: Session identifier
+            
+        Yields:
+            {'type': 'token', 'text': ...} events, then a final
+            {'type': 'done', 'result': ...} event carrying the same
+            payload start_interview returns
+        """
+        try:
+            session = self._get_session(session_id)
+            session.state = InterviewState.INTRODUCTION
+            
+            initial_question = ""
+            for event in self.llm_client.start_interview_stream(session.interview_type.value, session_id):
+                if event['type'] == 'token':
+                    yield event
+                else:
+                    initial_question = event['text']
             
+            result = self._record_initial_question(session, initial_question)
+            
+        except SessionConflict:
+            raise
         except Exception as e:
-            logger.error(f"Error starting interview: {e}")
-            return {
+            logger.error(f"Error streaming interview start: {e}")
+            result = {
                 'success': False,
                 'error': str(e)
             }
+        
+        self._flush_sessions()
+        yield {'type': 'done', 'result': result}
     
+    @batched('active_sessions', 'llm_client.sessions')
     def process_answer(self, session_id: str, answer: str) -> Dict[str, Any]:
         """
         Process candidate's answer and generate next question
@@ -214,12 +274,7 @@ class InterviewManager:
             session = self._get_session(session_id)
             
             # Store candidate's answer
-            session.conversation_history.append({
-                'role': 'candidate',
-                'content': answer,
-                'timestamp': time.time(),
-                'state': session.state.value
-            })
+            self._record_candidate_answer(session, answer)
             
             # Check if interview should continue
             should_continue = self._should_continue_interview(session)
@@ -230,46 +285,67 @@ class InterviewManager:
             # Get response from LLM
             response = self.llm_client.get_response(answer, session_id)
             
-            # Extract feedback and next question
-            feedback, next_question = self._parse_llm_response(response)
-            
-            # Update session
-            session.current_question = next_question
-            session.conversation_history.append({
-                'role': 'interviewer',
-                'content': response,
-                'timestamp': time.time(),
-                'state': session.state.value
-            })
-            
-            session.question_count += 1
-            session.feedback_history.append(feedback)
-            
-            # Update state if needed
-            self._update_interview_state(session)
-            
-            # Calculate progress
-            progress = self._calculate_progress(session)
+            return self._record_interviewer_response(session, response)
             
+        except Exception as e:
+            logger.error(f"Error processing answer: {e}")
             return {
-                'success': True,
-                'session_id': session_id,
-                'feedback': feedback,
-                'next_question': next_question,
-                'state': session.state.value,
-                'question_number': session.question_count,
-                'progress_percentage': progress,
-                'continuing': True
+                'success': False,
+                'error': str(e)
             }
+    
+    @batched('active_sessions', 'llm_client.sessions')
+    def process_answer_stream(self, session_id: str, answer: str) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of process_answer
+        
+        Tokens are forwarded as they arrive; the full interviewer response is
+        committed to the conversation history once the stream finishes.
+        
+        Args:
+            session_id: Session identifier
+            answer: Candidate's answer
             
+        Yields:
+            {'type': 'token', 'text': ...} events, then a final
+            {'type': 'done', 'result': ...} event carrying the same
+            payload process_answer returns
+        """
+        try:
+            session = self._get_session(session_id)
+            self._record_candidate_answer(session, answer)
+            
+            if not self._should_continue_interview(session):
+                result = self._end_interview(session_id)
+            else:
+                response = ""
+                for event in self.llm_client.get_response_stream(answer, session_id):
+                    if event['type'] == 'token':
+                        yield event
+                    else:
+                        response = event['text']
+                
+                result = self._record_interviewer_response(session, response)
+                
+        except SessionConflict:
+            raise
         except Exception as e:
-            logger.error(f"Error processing answer: {e}")
-            return {
+            logger.error(f"Error streaming answer: {e}")
+            result = {
                 'success': False,
                 'error': str(e)
             }
+        
+        self._flush_sessions()
+        yield {'type': 'done', 'result': result}
     
-    def submit_code(self, session_id: str, code: str, language: str = 'python') -> Dict[str, Any]:
+    @batched('active_sessions', 'llm_client.sessions')
+    def submit_code(self,
+                    session_id: str,
+                    code: str,
+                    language: str = 'python',
+                    function_name: Optional[str] = None,
+                    input_kind: Optional[str] = None) -> Dict[str, Any]:
         """
         Submit code for analysis during interview
         
@@ -277,6 +353,8 @@ class InterviewManager:
             session_id: Session identifier
             code: Code to analyze
             language: Programming language
+            function_name: Function whose complexity is measured (detected if omitted)
+            input_kind: Kind of generated input for that function (guessed if omitted)
             
         Returns:
             Code analysis results
@@ -289,40 +367,12 @@ class InterviewManager:
             
             # Analyze code using LLM
             analysis_result = self.llm_client.analyze_code(code, language)
+            estimate = self._cached_estimate(code, language, function_name, input_kind)
+            pending = estimate is None and self._measure_in_background(
+                session_id, code, language, function_name, input_kind
+            )
             
-            # Store code submission
-            session.conversation_history.append({
-                'role': 'candidate',
-                'content': f"Code submission ({language}):\n{code}",
-                'timestamp': time.time(),
-                'state': session.state.value,
-                'metadata': {
-                    'type': 'code_submission',
-                    'language': language,
-                    'analysis': analysis_result
-                }
-            })
-            
-            # Update metrics based on code analysis
-            self._update_metrics_from_code_analysis(session, analysis_result)
-            
-            # Generate follow-up question about the code
-            code_feedback = f"程式碼分析完成。{analysis_result['feedback'][:200]}... 請解釋你的實現思路。"
-            
-            session.conversation_history.append({
-                'role': 'interviewer',
-                'content': code_feedback,
-                'timestamp': time.time(),
-                'state': session.state.value
-            })
-            
-            return {
-                'success': True,
-                'session_id': session_id,
-                'analysis': analysis_result,
-                'feedback_question': code_feedback,
-                'state': session.state.value
-            }
+            return self._record_code_submission(session, code, language, analysis_result, estimate, pending)
             
         except Exception as e:
             logger.error(f"Error submitting code: {e}")
@@ -331,6 +381,7 @@ class InterviewManager:
                 'error': str(e)
             }
     
+    @batched('active_sessions', 'llm_client.sessions')
     def end_interview(self, session_id: str) -> Dict[str, Any]:
         """
         End the interview and generate final summary
@@ -343,6 +394,101 @@ class InterviewManager:
         """
         return self._end_interview(session_id)
     
+    # Async variants, used by the async Flask routes when an AsyncLLMClient is configured
+    
+    def _require_async_client(self) -> AsyncLLMClient:
+        """Get the async LLM client or raise if none is configured"""
+        if self.async_llm_client is None:
+            raise RuntimeError("Async LLM client is not configured")
+        return self.async_llm_client
+    
+    @batched('active_sessions', 'llm_client.sessions')
+    async def start_interview_async(self, session_id: str) -> Dict[str, Any]:
+        """Async variant of start_interview"""
+        try:
+            session = self._get_session(session_id)
+            session.state = InterviewState.INTRODUCTION
+            
+            initial_question = await self._require_async_client().start_interview(
+                session.interview_type.value, session_id
+            )
+            
+            return self._record_initial_question(session, initial_question)
+            
+        except Exception as e:
+            logger.error(f"Error starting interview: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @batched('active_sessions', 'llm_client.sessions')
+    async def process_answer_async(self, session_id: str, answer: str) -> Dict[str, Any]:
+        """Async variant of process_answer"""
+        try:
+            session = self._get_session(session_id)
+            self._record_candidate_answer(session, answer)
+            
+            if not self._should_continue_interview(session):
+                return await self.end_interview_async(session_id)
+            
+            response = await self._require_async_client().get_response(answer, session_id)
+            
+            return self._record_interviewer_response(session, response)
+            
+        except Exception as e:
+            logger.error(f"Error processing answer: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @batched('active_sessions', 'llm_client.sessions')
+    async def submit_code_async(self,
+                                session_id: str,
+                                code: str,
+                                language: str = 'python',
+                                function_name: Optional[str] = None,
+                                input_kind: Optional[str] = None) -> Dict[str, Any]:
+        """Async variant of submit_code"""
+        try:
+            session = self._get_session(session_id)
+            session.state = InterviewState.CODE_REVIEW
+            
+            analysis_result = await self._require_async_client().analyze_code(code, language)
+            estimate = self._cached_estimate(code, language, function_name, input_kind)
+            pending = estimate is None and self._measure_in_background(
+                session_id, code, language, function_name, input_kind
+            )
+            
+            return self._record_code_submission(session, code, language, analysis_result, estimate, pending)
+            
+        except Exception as e:
+            logger.error(f"Error submitting code: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @batched('active_sessions', 'llm_client.sessions')
+    async def end_interview_async(self, session_id: str) -> Dict[str, Any]:
+        """Async variant of end_interview"""
+        try:
+            session = self._get_session(session_id)
+            self._mark_completed(session)
+            
+            summary_result = await self._require_async_client().end_interview(session_id)
+            
+            return self._complete_session(session, summary_result)
+            
+        except Exception as e:
+            logger.error(f"Error ending interview: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @batched('active_sessions', 'llm_client.sessions')
     def get_session_status(self, session_id: str) -> Dict[str, Any]:
         """
         Get current session status and progress
@@ -382,12 +528,201 @@ class InterviewManager:
                 'error': str(e)
             }
     
+    def _flush_sessions(self):
+        """Write the request's session changes before a stream's final event, so a conflict reaches the client"""
+        self.active_sessions.flush()
+        self.llm_client.sessions.flush()
+    
     def _get_session(self, session_id: str) -> InterviewSession:
         """Get session by ID with validation"""
         if session_id not in self.active_sessions:
             raise ValueError(f"Session {session_id} not found")
         return self.active_sessions[session_id]
     
+    def _touch(self, session: InterviewSession):
+        """Record candidate activity and push back the session's expiry"""
+        session.last_activity = time.time()
+        self.reaper.schedule(session.session_id, self._session_deadline(session))
+    
+    def _session_deadline(self, session: InterviewSession) -> float:
+        """Time at which the session is over its time limit or idle timeout"""
+        time_limit = min(self.time_limits[session.interview_type] * 60, Config.MAX_SESSION_TIME)
+        return min(session.start_time + time_limit, session.last_activity + self.idle_timeout)
+    
+    def _record_initial_question(self, session: InterviewSession, initial_question: str) -> Dict[str, Any]:
+        """Store the opening question and build the start_interview payload"""
+        self._touch(session)
+        session.current_question = initial_question
+        self._append_conversation(session, {
+            'role': 'interviewer',
+            'content': initial_question,
+            'timestamp': time.time(),
+            'state': session.state.value
+        })
+        
+        session.question_count += 1
+        
+        logger.info(f"Started interview for session {session.session_id}")
+        
+        return {
+            'success': True,
+            'session_id': session.session_id,
+            'question': initial_question,
+            'state': session.state.value,
+            'interview_type': session.interview_type.value,
+            'question_number': session.question_count,
+            'max_questions': self.max_questions_per_type[session.interview_type],
+            'time_limit_minutes': self.time_limits[session.interview_type]
+        }
+    
+    def _record_candidate_answer(self, session: InterviewSession, answer: str):
+        """Append the candidate's answer to the conversation history"""
+        self._touch(session)
+        self._append_conversation(session, {
+            'role': 'candidate',
+            'content': answer,
+            'timestamp': time.time(),
+            'state': session.state.value
+        })
+    
+    def _record_interviewer_response(self, session: InterviewSession, response: str) -> Dict[str, Any]:
+        """Commit the interviewer's response and build the process_answer payload"""
+        # Extract feedback and next question
+        feedback, next_question = self._parse_llm_response(response)
+        
+        # Update session
+        session.current_question = next_question
+        self._append_conversation(session, {
+            'role': 'interviewer',
+            'content': response,
+            'timestamp': time.time(),
+            'state': session.state.value
+        })
+        
+        session.question_count += 1
+        session.feedback_history.append(feedback)
+        
+        # Update state if needed
+        self._update_interview_state(session)
+        
+        # Calculate progress
+        progress = self._calculate_progress(session)
+        
+        return {
+            'success': True,
+            'session_id': session.session_id,
+            'feedback': feedback,
+            'next_question': next_question,
+            'state': session.state.value,
+            'question_number': session.question_count,
+            'progress_percentage': progress,
+            'continuing': True
+        }
+    
+    def _cached_estimate(self,
+                         code: str,
+                         language: str,
+                         function_name: Optional[str],
+                         input_kind: Optional[str]) -> Optional[ComplexityEstimate]:
+        """The code's memoized complexity estimate, or None when it has not been measured yet"""
+        if self.complexity_estimator is None:
+            return None
+        return self.complexity_estimator.cached(code, language, function_name, input_kind)
+    
+    def _measure_in_background(self,
+                               session_id: str,
+                               code: str,
+                               language: str,
+                               function_name: Optional[str],
+                               input_kind: Optional[str]) -> bool:
+        """
+        Start measuring the code's time complexity without waiting for it
+        
+        The measurement takes seconds in the sandbox, so the submission is
+        answered with the LLM analysis alone and the estimate is folded into
+        the session's metrics when it arrives.
+        
+        Returns:
+            Whether a measurement was started (or joined one already running)
+        """
+        if self.complexity_estimator is None or language.lower() not in MEASURABLE_LANGUAGES:
+            return False
+        return self.complexity_estimator.estimate_in_background(
+            code, partial(self._apply_complexity_estimate, session_id),
+            language, function_name, input_kind
+        )
+    
+    @batched('active_sessions')
+    def _apply_complexity_estimate(self, session_id: str, estimate: ComplexityEstimate):
+        """Fold a background complexity estimate into the session's metrics, if the session is still active"""
+        session = self.active_sessions.get(session_id)
+        if session is None:
+            logger.debug(f"Complexity estimate for {session_id} arrived after the session ended")
+            return
+        self._apply_confident_estimate(session, estimate)
+    
+    @staticmethod
+    def _apply_confident_estimate(session: InterviewSession, estimate: ComplexityEstimate) -> bool:
+        """Record a measured complexity in the metrics when it is confident enough to trust"""
+        if not estimate.complexity or estimate.confidence < Config.EMPIRICAL_COMPLEXITY_MIN_CONFIDENCE:
+            return False
+        session.metrics.empirical_complexity = estimate.complexity
+        session.metrics.empirical_complexity_confidence = round(estimate.confidence, 3)
+        return True
+    
+    def _record_code_submission(self, 
+                                session: InterviewSession, 
+                                code: str, 
+                                language: str, 
+                                analysis_result: Dict,
+                                estimate: Optional[ComplexityEstimate] = None,
+                                estimate_pending: bool = False) -> Dict[str, Any]:
+        """Store a code submission with its analysis and build the submit_code payload"""
+        self._touch(session)
+        if estimate is not None:
+            # Copy: the analysis may be the response cache's own entry
+            analysis_result = dict(analysis_result, empirical_complexity=estimate.to_dict())
+            if self._apply_confident_estimate(session, estimate):
+                # A confident measurement replaces the complexity read from the LLM's prose
+                analysis_result['complexity'] = estimate.level
+        elif estimate_pending:
+            # Measured in the background; the result lands in the session metrics
+            analysis_result = dict(analysis_result, empirical_complexity_pending=True)
+        
+        # Store code submission
+        self._append_conversation(session, {
+            'role': 'candidate',
+            'content': f"Code submission ({language}):\n{code}",
+            'timestamp': time.time(),
+            'state': session.state.value,
+            'metadata': {
+                'type': 'code_submission',
+                'language': language,
+                'analysis': analysis_result
+            }
+        })
+        
+        # Update metrics based on code analysis
+        self._update_metrics_from_code_analysis(session, analysis_result)
+        
+        # Generate follow-up question about the code
+        code_feedback = f"程式碼分析完成。{analysis_result['feedback'][:200]}... 請解釋你的實現思路。"
+        
+        self._append_conversation(session, {
+            'role': 'interviewer',
+            'content': code_feedback,
+            'timestamp': time.time(),
+            'state': session.state.value
+        })
+        
+        return {
+            'success': True,
+            'session_id': session.session_id,
+            'analysis': analysis_result,
+            'feedback_question': code_feedback,
+            'state': session.state.value
+        }
+    
     def _get_initial_prompt(self, session: InterviewSession) -> str:
         """Generate initial prompt based on interview type and difficulty"""
         base_prompts = {
@@ -476,36 +811,12 @@ class InterviewManager:
         try:
             session = self._get_session(session_id)
             
-            # Update session state
-            session.state = InterviewState.COMPLETED
-            session.end_time = time.time()
-            session.duration_minutes = (session.end_time - session.start_time) / 60
+            self._mark_completed(session)
             
             # Generate final summary using LLM
             summary_result = self.llm_client.end_interview(session_id)
             
-            # Calculate final metrics
-            final_metrics = self._calculate_final_metrics(session)
-            session.metrics = final_metrics
-            
-            # Move to completed sessions
-            self.completed_sessions.append(session)
-            del self.active_sessions[session_id]
-            
-            logger.info(f"Interview completed for session {session_id}")
-            
-            return {
-                'success': True,
-                'session_id': session_id,
-                'summary': summary_result.get('summary', '面試已完成'),
-                'final_score': final_metrics.overall_score,
-                'grade': summary_result.get('score', 'B'),
-                'duration_minutes': round(session.duration_minutes, 1),
-                'total_questions': session.question_count,
-                'metrics': asdict(final_metrics),
-                'recommendations': summary_result.get('recommendations', []),
-                'interview_completed': True
-            }
+            return self._complete_session(session, summary_result)
             
         except Exception as e:
             logger.error(f"Error ending interview: {e}")
@@ -514,6 +825,91 @@ class InterviewManager:
                 'error': str(e)
             }
     
+    @batched('active_sessions', 'llm_client.sessions')
+    def _expire_session(self, session_id: str):
+        """
+        Finalize a session that passed its time limit or idle timeout
+        
+        Called from the reaper thread. No summary is requested from the LLM;
+        the session is scored locally, archived, and its LLM conversation and
+        any listener-owned resources (e.g. code snippets) are released.
+        
+        Args:
+            session_id: Session identifier
+        """
+        session = self.active_sessions.get(session_id)
+        if session is None:
+            return
+        
+        # Another worker may have seen activity since this deadline was scheduled
+        deadline = self._session_deadline(session)
+        if deadline > time.time():
+            self.reaper.schedule(session_id, deadline)
+            return
+        
+        self._mark_completed(session)
+        self._complete_session(session, {
+            'summary': '面試因超過時間限制或長時間未回應而自動結束',
+            'score': self._calculate_final_metrics(session).response_quality,
+            'recommendations': []
+        })
+        
+        self.llm_client.discard_session(session_id)
+        self.llm_client.running_evaluator.discard(session_id)
+        self.llm_client.chats.close(session_id)
+        
+        for listener in self._expiry_listeners:
+            try:
+                listener(session_id)
+            except Exception as e:
+                logger.error(f"Expiry listener failed for session {session_id}: {e}")
+        
+        logger.info(f"Expired idle interview session {session_id}")
+    
+    def add_expiry_listener(self, listener: Callable[[str], None]):
+        """
+        Register a callback run after a session is expired by the reaper
+        
+        Args:
+            listener: Called with the expired session ID
+        """
+        self._expiry_listeners.append(listener)
+    
+    def _mark_completed(self, session: InterviewSession):
+        """Update session state and timing for completion"""
+        session.state = InterviewState.COMPLETED
+        session.end_time = time.time()
+        session.duration_minutes = (session.end_time - session.start_time) / 60
+    
+    def _complete_session(self, session: InterviewSession, summary_result: Dict) -> Dict[str, Any]:
+        """Finalize metrics, archive the session and build the end_interview payload"""
+        session_id = session.session_id
+        
+        # Calculate final metrics
+        final_metrics = self._calculate_final_metrics(session)
+        session.metrics = final_metrics
+        
+        # Move to the completed-session archive
+        self.completed_sessions.add(session_id, session)
+        self._count_conversation(session.conversation_history, -1)
+        del self.active_sessions[session_id]
+        self.reaper.cancel(session_id)
+        
+        logger.info(f"Interview completed for session {session_id}")
+        
+        return {
+            'success': True,
+            'session_id': session_id,
+            'summary': summary_result.get('summary', '面試已完成'),
+            'final_score': final_metrics.overall_score,
+            'grade': summary_result.get('score', 'B'),
+            'duration_minutes': round(session.duration_minutes, 1),
+            'total_questions': session.question_count,
+            'metrics': asdict(final_metrics),
+            'recommendations': summary_result.get('recommendations', []),
+            'interview_completed': True
+        }
+    
     def _calculate_final_metrics(self, session: InterviewSession) -> InterviewMetrics:
         """Calculate final interview metrics"""
         # This is a simplified calculation - in practice, this would be more sophisticated
@@ -557,13 +953,44 @@ class InterviewManager:
             overall_score=overall_score,
             total_questions=session.question_count,
             correct_answers=max(1, session.question_count - 1),  # Simplified
-            response_quality=quality
+            response_quality=quality,
+            empirical_complexity=session.metrics.empirical_complexity,
+            empirical_complexity_confidence=session.metrics.empirical_complexity_confidence
         )
     
     def get_active_sessions_count(self) -> int:
         """Get number of active sessions"""
         return len(self.active_sessions)
     
+    def _append_conversation(self, session: InterviewSession, entry: Dict):
+        """Append an entry to a session's conversation history"""
+        session.conversation_history.append(entry)
+        self._count_conversation([entry])
+    
+    def _count_conversation(self, entries: List[Dict], sign: int = 1):
+        """
+        Keep the history gauge's running byte total, instead of summing every
+        session at scrape time; only an in-process store holds the histories.
+        Sizes are UTF-8 lengths: sys.getsizeof of a non-ASCII str grows once
+        its UTF-8 form is cached, so it would differ between append and removal
+        """
+        if not self.active_sessions.shared:
+            SESSION_HISTORY_BYTES.labels('interview').inc(
+                sign * sum(len(entry['content'].encode('utf-8')) for entry in entries)
+            )
+    
     def get_completed_sessions_count(self) -> int:
         """Get number of completed sessions"""
-        return len(self.completed_sessions) 
\ No newline at end of file
+        return len(self.completed_sessions)
+    
+    def get_completed_session(self, session_id: str) -> Optional[InterviewSession]:
+        """
+        Look up a completed session, whether still in memory or spilled to disk
+        
+        Args:
+            session_id: Session identifier
+            
+        Returns:
+            Completed session or None if unknown
+        """
+        return self.completed_sessions.get(session_id) 
\ No newline at end of file
@@ -0,0 +1,427 @@
+"""
+LLM Backends for AI Interview Simulator
+可替換的模型後端：Gemini 實作與可設定延遲、輸出速度、失敗率與回覆範本的本地模擬後端，供離線壓力測試使用
+"""
+
+import asyncio
+import inspect
+import itertools
+import json
+import logging
+import math
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import google.generativeai as genai
+
+from config import Config
+from context_builder import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Chat history entries use Gemini's content shape: {'role': 'user' | 'model', 'parts': [text]}
+ChatHistory = List[Dict[str, Any]]
+
+class LLMChat(ABC):
+    """One multi-turn conversation held by a backend"""
+    
+    @property
+    @abstractmethod
+    def history(self) -> ChatHistory:
+        """Turns so far"""
+    
+    @history.setter
+    @abstractmethod
+    def history(self, history: ChatHistory):
+        """Replace the turns (used to trim old exchanges)"""
+    
+    @abstractmethod
+    def send(self, message: str, generation_config: Dict) -> str:
+        """Send a user turn and return the reply"""
+    
+    @abstractmethod
+    def stream(self, message: str, generation_config: Dict) -> Iterator[str]:
+        """Send a user turn and yield the reply chunk by chunk"""
+    
+    @abstractmethod
+    async def send_async(self, message: str, generation_config: Dict) -> str:
+        """Coroutine variant of send"""
+
+class LLMBackend(ABC):
+    """
+    Text generation service behind LLMClient
+    
+    Single prompts go through generate/stream, or generate_async on an event loop;
+    backends with `supports_chat` also open multi-turn chats. Failures are
+    raised as exceptions and retried by the client.
+    """
+    
+    name = 'base'
+    supports_chat = False
+    supports_system_instruction = False
+    
+    @abstractmethod
+    def generate(self, prompt: str, generation_config: Dict) -> str:
+        """Generate a reply to a single prompt"""
+    
+    @abstractmethod
+    def stream(self, prompt: str, generation_config: Dict) -> Iterator[str]:
+        """Generate a reply to a single prompt, yielding it chunk by chunk"""
+    
+    @abstractmethod
+    async def generate_async(self, prompt: str, generation_config: Dict) -> str:
+        """Coroutine variant of generate"""
+    
+    def start_chat(self, history: ChatHistory, system_instruction: Optional[str] = None) -> LLMChat:
+        """
+        Open a chat continuing from `history`
+        
+        Args:
+            history: Earlier turns
+            system_instruction: Instructions for the whole chat (only if
+                                `supports_system_instruction`)
+        
+        Raises:
+            NotImplementedError: The backend has no chat support
+        """
+        raise NotImplementedError(f"{self.name} backend does not support chats")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get backend statistics"""
+        return {'backend': self.name}
+
+class GeminiChat(LLMChat):
+    """LLMChat over a google-generativeai ChatSession"""
+    
+    def __init__(self, session):
+        self._session = session
+    
+    @property
+    def history(self) -> ChatHistory:
+        return [
+            {'role': content.role, 'parts': [''.join(part.text for part in content.parts)]}
+            for content in self._session.history
+        ]
+    
+    @history.setter
+    def history(self, history: ChatHistory):
+        self._session.history = history
+    
+    def send(self, message: str, generation_config: Dict) -> str:
+        return self._session.send_message(message, generation_config=generation_config).text
+    
+    def stream(self, message: str, generation_config: Dict) -> Iterator[str]:
+        response = self._session.send_message(message, generation_config=generation_config, stream=True)
+        for chunk in response:
+            yield chunk.text
+    
+    async def send_async(self, message: str, generation_config: Dict) -> str:
+        response = await self._session.send_message_async(message, generation_config=generation_config)
+        return response.text
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google-generativeai"""
+    
+    name = 'gemini'
+    supports_chat = True
+    
+    def __init__(self, api_key: Optional[str] = None, model_name: Optional[str] = None):
+        """
+        Initialize Gemini backend
+        
+        Args:
+            api_key: Gemini API key (defaults to Config.GEMINI_API_KEY)
+            model_name: Model name (defaults to Config.GEMINI_MODEL)
+        
+        Raises:
+            ValueError: No API key is configured
+        """
+        api_key = api_key or Config.GEMINI_API_KEY
+        self.model_name = model_name or Config.GEMINI_MODEL
+        
+        if not api_key:
+            logger.error("GEMINI_API_KEY not found in configuration")
+            raise ValueError("GEMINI_API_KEY is required")
+        
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(self.model_name)
+        
+        # Older SDKs (such as the pinned 0.3.x) take no system instruction
+        self.supports_system_instruction = (
+            'system_instruction' in inspect.signature(genai.GenerativeModel.__init__).parameters
+        )
+        self._instructed_models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+    
+    def generate(self, prompt: str, generation_config: Dict) -> str:
+        return self.model.generate_content(prompt, generation_config=generation_config).text
+    
+    def stream(self, prompt: str, generation_config: Dict) -> Iterator[str]:
+        response = self.model.generate_content(prompt, generation_config=generation_config, stream=True)
+        for chunk in response:
+            yield chunk.text
+    
+    async def generate_async(self, prompt: str, generation_config: Dict) -> str:
+        response = await self.model.generate_content_async(prompt, generation_config=generation_config)
+        return response.text
+    
+    def start_chat(self, history: ChatHistory, system_instruction: Optional[str] = None) -> LLMChat:
+        model = self.model
+        if system_instruction and self.supports_system_instruction:
+            with self._lock:
+                model = self._instructed_models.get(system_instruction)
+                if model is None:
+                    model = genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
+                    self._instructed_models[system_instruction] = model
+        return GeminiChat(model.start_chat(history=history))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {'backend': self.name, 'model': self.model_name}
+
+class StubBackendError(Exception):
+    """Injected failure of the stub backend"""
+
+# (keyword in the prompt, reply template); the first match wins and the last entry is the default.
+# Templates may use {call} (call number), {prompt_tokens} and {excerpt} (start of the prompt's last line).
+# The defaults carry the markers LLMClient extracts scores, grades and complexity from.
+DEFAULT_STUB_REPLIES: Tuple[Tuple[str, str], ...] = (
+    ('請分析以下', "程式碼評分：80分。時間複雜度 O(n)，空間複雜度 O(1)。建議：1. 補上邊界條件檢查 2. 變數命名可以更清楚"),
+    ('請評估以下程式碼解答', "正確性：通過主要案例。程式碼品質評分：78分。時間複雜度 O(n log n)。綜合評級：B"),
+    ('生成一個', "題目：兩數之和（模擬題 #{call}）\n給定整數陣列 nums 與目標值 target，回傳和為 target 的兩個索引。"),
+    ('面試總結', "總評：B 等級。技術能力穩定，回答結構清楚。建議：多練習系統設計、加強複雜度分析"),
+    ('', "感謝你的回答（第 {call} 次回覆）。你提到「{excerpt}」，能否進一步說明你的思考過程與取捨？"),
+)
+
+class LatencyDistribution:
+    """
+    Seconds before the first token, sampled from a named distribution
+    
+    Specs are 'name:arg,arg': fixed:S, uniform:LOW,HIGH, normal:MEAN,STDEV,
+    exponential:MEAN, lognormal:MEDIAN,SIGMA. Negative samples are clipped to 0.
+    """
+    
+    _ARITY = {'fixed': 1, 'uniform': 2, 'normal': 2, 'exponential': 1, 'lognormal': 2}
+    
+    def __init__(self, spec: str):
+        """
+        Raises:
+            ValueError: Unknown distribution or wrong number of arguments
+        """
+        name, _, args = spec.partition(':')
+        self.name = name.strip().lower()
+        self.args = [float(arg) for arg in args.split(',') if arg.strip()]
+        if self._ARITY.get(self.name) != len(self.args):
+            raise ValueError(f"invalid latency distribution '{spec}'")
+        self.spec = spec
+    
+    def sample(self, rng: random.Random) -> float:
+        a = self.args
+        if self.name == 'fixed':
+            value = a[0]
+        elif self.name == 'uniform':
+            value = rng.uniform(a[0], a[1])
+        elif self.name == 'normal':
+            value = rng.gauss(a[0], a[1])
+        elif self.name == 'exponential':
+            value = rng.expovariate(1 / a[0]) if a[0] > 0 else 0.0
+        else:
+            value = a[0] * math.exp(rng.gauss(0, a[1]))
+        return max(value, 0.0)
+
+class StubChat(LLMChat):
+    """In-memory chat of the stub backend"""
+    
+    def __init__(self, backend: 'StubBackend', history: ChatHistory):
+        self._backend = backend
+        self._history = [dict(content) for content in history]
+    
+    @property
+    def history(self) -> ChatHistory:
+        return self._history
+    
+    @history.setter
+    def history(self, history: ChatHistory):
+        self._history = list(history)
+    
+    def send(self, message: str, generation_config: Dict) -> str:
+        return self._record(message, self._backend.generate(message, generation_config))
+    
+    def stream(self, message: str, generation_config: Dict) -> Iterator[str]:
+        chunks = []
+        for chunk in self._backend.stream(message, generation_config):
+            chunks.append(chunk)
+            yield chunk
+        self._record(message, ''.join(chunks))
+    
+    async def send_async(self, message: str, generation_config: Dict) -> str:
+        return self._record(message, await self._backend.generate_async(message, generation_config))
+    
+    def _record(self, message: str, reply: str) -> str:
+        self._history.extend([{'role': 'user', 'parts': [message]}, {'role': 'model', 'parts': [reply]}])
+        return reply
+
+class StubBackend(LLMBackend):
+    """
+    Local stand-in for Gemini with configurable timing and failures
+    
+    Each call waits a first-token latency drawn from `latency`, then emits
+    its reply at `token_rate` tokens per second in chunks of `chunk_tokens`
+    (non-streaming calls wait for the whole reply). A `failure_rate` share
+    of calls raise StubBackendError after the latency. Replies come from
+    keyword-matched templates. With a fixed seed the sampled latencies,
+    failures and replies repeat for the same sequence of calls.
+    """
+    
+    name = 'stub'
+    supports_chat = True
+    supports_system_instruction = True
+    
+    def __init__(self,
+                 latency: str = 'fixed:0',
+                 token_rate: float = 0,
+                 failure_rate: float = 0.0,
+                 replies: Optional[List[Tuple[str, str]]] = None,
+                 chunk_tokens: int = 8,
+                 seed: Optional[int] = None):
+        """
+        Initialize stub backend
+        
+        Args:
+            latency: First-token latency distribution spec (see LatencyDistribution)
+            token_rate: Output tokens per second (0 for instant output)
+            failure_rate: Probability (0-1) that a call fails
+            replies: (keyword, template) pairs replacing DEFAULT_STUB_REPLIES
+            chunk_tokens: Tokens per streamed chunk
+            seed: Random seed for reproducible runs
+        
+        Raises:
+            ValueError: Invalid latency spec or failure rate
+        """
+        if not 0 <= failure_rate <= 1:
+            raise ValueError("failure_rate must be between 0 and 1")
+        
+        self.latency = LatencyDistribution(latency)
+        self.token_rate = token_rate
+        self.failure_rate = failure_rate
+        self.replies = list(replies or DEFAULT_STUB_REPLIES)
+        self.chunk_tokens = max(chunk_tokens, 1)
+        
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls = itertools.count(1)
+        
+        # Statistics
+        self.calls = 0
+        self.failures = 0
+        self.output_tokens = 0
+    
+    @classmethod
+    def from_config(cls) -> 'StubBackend':
+        """Stub backend configured from Config.LLM_STUB_* settings"""
+        replies = None
+        if Config.LLM_STUB_REPLIES_PATH:
+            with open(Config.LLM_STUB_REPLIES_PATH, encoding='utf-8') as f:
+                replies = [tuple(pair) for pair in json.load(f)]
+        return cls(
+            latency=Config.LLM_STUB_LATENCY,
+            token_rate=Config.LLM_STUB_TOKEN_RATE,
+            failure_rate=Config.LLM_STUB_FAILURE_RATE,
+            replies=replies,
+            seed=Config.LLM_STUB_SEED
+        )
+    
+    def generate(self, prompt: str, generation_config: Dict) -> str:
+        delay, reply = self._plan(prompt, generation_config)
+        time.sleep(delay)
+        self._raise_if_failed(reply)
+        time.sleep(self._emit_seconds(estimate_tokens(reply)))
+        return reply
+    
+    def stream(self, prompt: str, generation_config: Dict) -> Iterator[str]:
+        delay, reply = self._plan(prompt, generation_config)
+        time.sleep(delay)
+        self._raise_if_failed(reply)
+        for chunk in self._chunks(reply):
+            time.sleep(self._emit_seconds(estimate_tokens(chunk)))
+            yield chunk
+    
+    async def generate_async(self, prompt: str, generation_config: Dict) -> str:
+        delay, reply = self._plan(prompt, generation_config)
+        await asyncio.sleep(delay)
+        self._raise_if_failed(reply)
+        await asyncio.sleep(self._emit_seconds(estimate_tokens(reply)))
+        return reply
+    
+    def start_chat(self, history: ChatHistory, system_instruction: Optional[str] = None) -> LLMChat:
+        return StubChat(self, history)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            'calls': self.calls,
+            'failures': self.failures,
+            'output_tokens': self.output_tokens,
+            'latency': self.latency.spec,
+            'token_rate': self.token_rate,
+            'failure_rate': self.failure_rate
+        }
+    
+    def _plan(self, prompt: str, generation_config: Dict) -> Tuple[float, Optional[str]]:
+        """Draw one call's latency and reply (None for a call chosen to fail)"""
+        with self._lock:
+            call = next(self._calls)
+            delay = self.latency.sample(self._rng)
+            failed = self._rng.random() < self.failure_rate
+            self.calls += 1
+            if failed:
+                self.failures += 1
+                return delay, None
+        
+        reply = self._render(prompt, call)
+        max_tokens = (generation_config or {}).get('max_output_tokens')
+        if max_tokens and estimate_tokens(reply) > max_tokens:
+            reply = reply[:max_tokens]
+        
+        with self._lock:
+            self.output_tokens += estimate_tokens(reply)
+        return delay, reply
+    
+    def _render(self, prompt: str, call: int) -> str:
+        lines = [line.strip() for line in prompt.strip().splitlines() if line.strip()]
+        excerpt = lines[-1][:30] if lines else ''
+        for keyword, template in self.replies:
+            if keyword in prompt:
+                break
+        return template.format(call=call, prompt_tokens=estimate_tokens(prompt), excerpt=excerpt)
+    
+    @staticmethod
+    def _raise_if_failed(reply: Optional[str]):
+        # Failures surface after the latency, like a request that times out or errors upstream
+        if reply is None:
+            raise StubBackendError("injected stub backend failure")
+    
+    def _emit_seconds(self, tokens: int) -> float:
+        return tokens / self.token_rate if self.token_rate > 0 else 0.0
+    
+    def _chunks(self, reply: str) -> Iterator[str]:
+        # About chunk_tokens tokens per chunk, treating four characters as a token
+        size = self.chunk_tokens * 4
+        for start in range(0, len(reply), size):
+            yield reply[start:start + size]
+
+def create_backend(name: Optional[str] = None) -> LLMBackend:
+    """
+    Create the backend named by `name` (defaults to Config.LLM_BACKEND)
+    
+    Raises:
+        ValueError: Unknown backend name, or Gemini without an API key
+    """
+    name = (name or Config.LLM_BACKEND).lower()
+    if name == 'gemini':
+        return GeminiBackend()
+    if name == 'stub':
+        return StubBackend.from_config()
+    raise ValueError(f"Unknown LLM backend: {name}")
@@ -3,40 +3,168 @@ Gemini LLM Client for AI Interview Simulator
 Complete implementation with Google Gemini API integration
 """
 import logging
+import sys
 import time
-from typing import Dict, List, Optional, Tuple
-import google.generativeai as genai
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from chat_sessions import ChatSessions
 from config import Config
+from context_builder import SYSTEM_PREFIX, ContextBuilder
+from llm_backends import LLMBackend, create_backend
+from metrics import LLM_ATTEMPT_SECONDS, LLM_CALL_SECONDS, SESSION_HISTORY_BYTES
+from response_cache import ResponseCache
+from running_evaluation import RunningEvaluator
+from session_store import SessionStore, append_merge, batched, create_session_store
+from single_flight import SingleFlight, prompt_key
 
 logger = logging.getLogger(__name__)
 
+# Fallback replies returned instead of model output; these are never cached
+EMPTY_RESPONSE_MESSAGE = "抱歉，我需要一點時間思考。請重新描述你的問題。"
+API_ERROR_MESSAGE = "抱歉，目前遇到技術問題。請稍後再試。"
+UNAVAILABLE_MESSAGE = "系統暫時無法回應，請重試。"
+FALLBACK_MESSAGES = frozenset({EMPTY_RESPONSE_MESSAGE, API_ERROR_MESSAGE, UNAVAILABLE_MESSAGE})
+
+CODE_ANALYSIS_PROMPT_TEMPLATE = """
+請分析以下 {language} 程式碼：
+
+```{language}
+{code}
+```
+
+請提供：
+1. 程式碼品質評分（0-100分）
+2. 詳細的技術回饋
+3. 具體的改進建議
+4. 時間和空間複雜度分析
+5. 潛在的 bug 或問題
+6. 程式碼風格評估
+
+請用繁體中文回應，格式化為結構化的分析報告。
+            """
+
+CODING_PROBLEM_PROMPT_TEMPLATE = """
+請生成一個 {difficulty} 難度的 {topic} 程式設計問題，適合 {language} 語言：
+
+要求：
+1. 清楚的問題描述
+2. 輸入輸出範例
+3. 約束條件
+4. 預期時間複雜度
+5. 提示（可選）
+
+請用繁體中文描述，格式化為結構化的程式設計問題。
+        """
+
+CODE_EVALUATION_PROMPT_TEMPLATE = """
+請評估以下程式碼解答：
+
+問題描述：
+{problem}
+
+解答程式碼 ({language}):
+```{language}
+{code}
+```
+{test_results}
+請提供：
+1. 正確性評估（是否解決了問題；若有實際測試結果，請以測試結果為準）
+2. 程式碼品質評分（0-100分）
+3. 時間和空間複雜度分析（若有實測執行時間與記憶體，請參考實測數據）
+4. 具體的優點和缺點
+5. 改進建議
+6. 替代解法提示
+7. 綜合評級（A-F）
+
+請用繁體中文提供詳細的評估報告。
+        """
+
+RUNNING_EVALUATION_PROMPT_TEMPLATE = """
+你正在為一場{interview_type}面試撰寫評估，評估會隨面試進行逐步更新。
+
+目前的評估：
+{previous}
+
+新增的面試對話：
+{entries}
+
+請將新增的對話併入目前的評估，輸出更新後的完整面試總結：
+1. 候選人表現總評（A-F等級）
+2. 技術能力評估
+3. 回答品質分析
+4. 具體的改進建議
+5. 整體印象和建議
+
+請用繁體中文提供專業的面試總結。
+        """
+
 class LLMClient:
     """
     Complete LLM client for interview simulation using Google Gemini API
     """
     
-    def __init__(self):
-        """Initialize Gemini LLM client"""
-        self.sessions: Dict[str, Dict] = {}
-        self.model = None
+    def __init__(self,
+                 response_cache: Optional[ResponseCache] = None,
+                 backend: Optional[LLMBackend] = None,
+                 sessions: Optional[SessionStore] = None,
+                 running_evaluator: Optional[RunningEvaluator] = None,
+                 chats: Optional[ChatSessions] = None):
+        """
+        Initialize Gemini LLM client
+        
+        Args:
+            response_cache: Cache for code analysis/evaluation responses
+                            (a new one is created from Config if omitted)
+            backend: Model backend (created from Config.LLM_BACKEND if omitted)
+            sessions: Session store, to share sessions with another client
+                      (a new one is created if omitted)
+            running_evaluator: Running evaluator, to share folds with another
+                               client (a new one is created if omitted)
+            chats: Chat sessions, to share chats with another client
+                   (new ones are created over `backend` if omitted)
         
-        # Validate configuration
-        if not Config.GEMINI_API_KEY:
-            logger.error("GEMINI_API_KEY not found in configuration")
-            raise ValueError("GEMINI_API_KEY is required")
+        Raises:
+            ValueError: The configured backend cannot be created (e.g. no Gemini API key)
+        """
+        if sessions is None:
+            # Two requests of one session may both append turns; keep both
+            sessions = create_session_store('llm_sessions', merge=append_merge(
+                lists=('history',), counters=('question_count', 'evaluation_submitted')
+            ))
+        self.sessions: SessionStore = sessions
+        if response_cache is None:
+            response_cache = ResponseCache(
+                max_entries=Config.RESPONSE_CACHE_MAX_ENTRIES,
+                max_bytes=Config.RESPONSE_CACHE_MAX_BYTES,
+                ttl_seconds=Config.RESPONSE_CACHE_TTL
+            )
+        self.response_cache = response_cache
+        self.single_flight = SingleFlight()
+        self.context_builder = ContextBuilder(
+            budgets=Config.CONTEXT_TOKEN_BUDGETS,
+            default_budget=Config.CONTEXT_TOKEN_BUDGETS['technical'],
+            summary_budget=Config.CONTEXT_SUMMARY_TOKENS,
+            max_code_lines=Config.CONTEXT_MAX_CODE_LINES
+        )
+        self.running_evaluator = running_evaluator or RunningEvaluator(
+            self._fold_evaluation,
+            max_workers=Config.RUNNING_EVALUATION_WORKERS,
+            finalize_wait=Config.RUNNING_EVALUATION_WAIT
+        )
         
         try:
-            # Configure Gemini API
-            genai.configure(api_key=Config.GEMINI_API_KEY)
-            
-            # Initialize model
-            self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
-            
-            logger.info(f"Gemini LLM client initialized successfully with model: {Config.GEMINI_MODEL}")
+            self.backend = backend or create_backend()
+            logger.info(f"LLM client initialized successfully with backend: {self.backend.name}")
             
         except Exception as e:
-            logger.error(f"Failed to initialize Gemini client: {e}")
+            logger.error(f"Failed to initialize LLM backend: {e}")
             raise
+        
+        self.chats = chats or ChatSessions(
+            self.backend,
+            instructions_for=self._get_interview_prompt,
+            budget_for=self.context_builder.budget_for,
+            enabled=Config.CHAT_SESSIONS_ENABLED
+        )
     
     def _get_interview_prompt(self, interview_type: str) -> str:
         """
@@ -91,87 +219,369 @@ class LLMClient:
         
         return prompts.get(interview_type, prompts['technical'])
     
-    def _call_gemini(self, prompt: str, conversation_history: List[str] = None) -> str:
+    def get_coalescing_stats(self) -> Dict[str, int]:
+        """Get single-flight statistics for identical concurrent prompts"""
+        return self.single_flight.get_stats()
+    
+    def discard_session(self, session_id: str):
+        """Delete a session if it exists, releasing its history from the history gauge"""
+        session = self.sessions.get(session_id)
+        if session is not None:
+            self._count_history(session['history'], -1)
+            del self.sessions[session_id]
+    
+    def _append_history(self, session: Dict, *entries: str):
+        """Append entries to a session's history"""
+        session['history'].extend(entries)
+        self._count_history(entries)
+    
+    def _count_history(self, entries: Iterable[str], sign: int = 1):
+        """
+        Keep the history gauge's running byte total, instead of summing every
+        session at scrape time; only an in-process store holds the histories
+        """
+        if not self.sessions.shared:
+            SESSION_HISTORY_BYTES.labels('llm').inc(sign * sum(sys.getsizeof(entry) for entry in entries))
+    
+    def _generation_config(self) -> Dict:
+        """Generation settings shared by every model call"""
+        return {
+            'candidate_count': 1,
+            'max_output_tokens': 2048,
+            'temperature': 0.7
+        }
+    
+    def _prepare_prompt(self, prompt: str, conversation_history: List[str] = None,
+                        interview_type: Optional[str] = None) -> str:
+        """Prepend the token-budgeted conversation context to the prompt"""
+        if conversation_history:
+            context = self.context_builder.build(conversation_history, interview_type, prompt)
+            if context:
+                return f"對話歷史：\n{context}\n\n當前問題：{prompt}"
+        return prompt
+    
+    def _call_gemini(self, prompt: str, conversation_history: List[str] = None,
+                     interview_type: Optional[str] = None) -> str:
         """
         Call Gemini API with error handling and retry logic
         
+        AsyncLLMClient overrides this with a coroutine; code that must block
+        on either client calls _call_gemini_blocking.
+        
+        Args:
+            prompt: User prompt
+            conversation_history: Previous conversation context
+            interview_type: Interview type whose context token budget applies
+            
+        Returns:
+            Generated response
+        """
+        return self._call_gemini_blocking(prompt, conversation_history, interview_type)
+    
+    def _call_gemini_blocking(self, prompt: str, conversation_history: List[str] = None,
+                              interview_type: Optional[str] = None) -> str:
+        """
+        Blocking Gemini call with retries, never overridden by subclasses
+        
+        Concurrent calls with an identical full prompt share one upstream call.
+        
         Args:
             prompt: User prompt
             conversation_history: Previous conversation context
+            interview_type: Interview type whose context token budget applies
+            
+        Returns:
+            Generated response
+        """
+        # Prepare context with conversation history
+        full_prompt = self._prepare_prompt(prompt, conversation_history, interview_type)
+        
+        with LLM_CALL_SECONDS.labels('sync').time():
+            return self.single_flight.do(
+                prompt_key(full_prompt),
+                lambda: self._generate_with_retry(full_prompt)
+            )
+    
+    def _generate_with_retry(self, full_prompt: str) -> str:
+        """Generate a response for a fully prepared prompt, retrying on failure"""
+        return self._with_retry(lambda: self.backend.generate(full_prompt, self._generation_config()))
+    
+    def _chat_with_retry(self, session_id: str, interview_type: str, history: List[str], message: str) -> str:
+        """
+        Send one message on the session's Gemini chat, retrying on failure
+        
+        Args:
+            session_id: Session identifier
+            interview_type: Interview type of the session
+            history: Session history before this message (to rebuild a missing chat)
+            message: The new user turn
             
         Returns:
             Generated response
         """
+        return self._with_retry(lambda: self._chat_send(session_id, interview_type, history, message))
+    
+    def _chat_send(self, session_id: str, interview_type: str, history: List[str], message: str) -> str:
+        """Single chat turn; a failed turn drops the chat so it is rebuilt from history"""
+        with self.chats.serialized(session_id):
+            chat = self.chats.get(session_id, interview_type, history)
+            try:
+                text = chat.send(message, self._generation_config())
+            except Exception:
+                self.chats.discard(session_id)
+                raise
+            if text:
+                # The caller stores this turn as a candidate and an interviewer entry
+                self.chats.commit(session_id, chat, interview_type, len(history) + 2)
+            else:
+                self.chats.discard(session_id)
+            return text
+    
+    def _with_retry(self, generate: Callable[[], str]) -> str:
+        """Run one Gemini call, retrying with backoff, and normalize its text"""
         max_retries = 3
         retry_delay = 1
         
         for attempt in range(max_retries):
+            start = time.perf_counter()
             try:
-                # Prepare context with conversation history
-                full_prompt = prompt
-                if conversation_history:
-                    context = "\n".join(conversation_history[-10:])  # Last 10 exchanges
-                    full_prompt = f"對話歷史：\n{context}\n\n當前問題：{prompt}"
-                
-                # Generate response
-                response = self.model.generate_content(
-                    full_prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        candidate_count=1,
-                        max_output_tokens=2048,
-                        temperature=0.7,
-                    )
-                )
+                text = generate()
                 
-                if response.text:
-                    return response.text.strip()
+                if text:
+                    LLM_ATTEMPT_SECONDS.labels('sync', attempt + 1, 'ok').observe(time.perf_counter() - start)
+                    return text.strip()
                 else:
+                    LLM_ATTEMPT_SECONDS.labels('sync', attempt + 1, 'empty').observe(time.perf_counter() - start)
                     logger.warning("Empty response from Gemini API")
-                    return "抱歉，我需要一點時間思考。請重新描述你的問題。"
+                    return EMPTY_RESPONSE_MESSAGE
                     
             except Exception as e:
+                LLM_ATTEMPT_SECONDS.labels('sync', attempt + 1, 'error').observe(time.perf_counter() - start)
                 logger.warning(f"Gemini API call failed (attempt {attempt + 1}): {e}")
                 if attempt < max_retries - 1:
                     time.sleep(retry_delay)
                     retry_delay *= 2
                 else:
                     logger.error(f"All Gemini API attempts failed: {e}")
-                    return "抱歉，目前遇到技術問題。請稍後再試。"
+                    return API_ERROR_MESSAGE
         
-        return "系統暫時無法回應，請重試。"
+        return UNAVAILABLE_MESSAGE
     
-    def start_interview(self, interview_type: str = 'technical') -> str:
+    def _stream_gemini(self, prompt: str, conversation_history: List[str] = None,
+                       interview_type: Optional[str] = None, outcome: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Stream Gemini API output chunk by chunk
+        
+        Retries only while nothing has been yielded yet; once tokens have
+        reached the caller a failure ends the stream with the partial text.
+        
+        Args:
+            prompt: User prompt
+            conversation_history: Previous conversation context
+            interview_type: Interview type whose context token budget applies
+            outcome: Dict whose 'complete' key is set once the stream ends normally
+            
+        Yields:
+            Text chunks as they arrive
+        """
+        full_prompt = self._prepare_prompt(prompt, conversation_history, interview_type)
+        yield from self._stream_with_retry(lambda: self.backend.stream(full_prompt, self._generation_config()),
+                                           outcome)
+    
+    def _stream_chat(self, session_id: str, interview_type: str, history: List[str], message: str) -> Iterator[str]:
+        """
+        Streaming variant of _chat_with_retry
+        
+        Yields:
+            Text chunks as they arrive
+        """
+        def generate() -> Iterator[str]:
+            with self.chats.serialized(session_id):
+                chat = self.chats.get(session_id, interview_type, history)
+                completed = False
+                try:
+                    yield from chat.stream(message, self._generation_config())
+                    completed = True
+                finally:
+                    # A broken or abandoned stream leaves the chat inconsistent; rebuild it next time
+                    if completed:
+                        self.chats.commit(session_id, chat, interview_type, len(history) + 2)
+                    else:
+                        self.chats.discard(session_id)
+        
+        yield from self._stream_with_retry(generate)
+    
+    def _stream_with_retry(self, generate: Callable[[], Iterator[str]],
+                           outcome: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Relay a Gemini stream, retrying only while nothing has been yielded yet
+        
+        Args:
+            generate: Starts one streaming call and yields its chunk texts
+            outcome: Dict whose 'complete' key is set to True only when the model's
+                     stream ended normally; an interrupted stream or a fallback
+                     message leaves it False
+        """
+        if outcome is not None:
+            outcome['complete'] = False
+        max_retries = 3
+        retry_delay = 1
+        
+        for attempt in range(max_retries):
+            emitted = False
+            try:
+                for text in generate():
+                    if text:
+                        emitted = True
+                        yield text
+                
+                if not emitted:
+                    logger.warning("Empty streamed response from Gemini API")
+                    yield EMPTY_RESPONSE_MESSAGE
+                elif outcome is not None:
+                    outcome['complete'] = True
+                return
+                
+            except Exception as e:
+                if emitted:
+                    logger.error(f"Gemini stream interrupted: {e}")
+                    return
+                logger.warning(f"Gemini streaming call failed (attempt {attempt + 1}): {e}")
+                if attempt < max_retries - 1:
+                    time.sleep(retry_delay)
+                    retry_delay *= 2
+                else:
+                    logger.error(f"All Gemini streaming attempts failed: {e}")
+                    yield API_ERROR_MESSAGE
+                    return
+    
+    def _create_session(self, session_id: str, interview_type: str) -> Dict:
+        """Create and register session data"""
+        session = {
+            'type': interview_type,
+            'history': [],
+            'start_time': time.time(),
+            'question_count': 0,
+            'evaluation_submitted': 0   # history entries handed to the running evaluator
+        }
+        self.discard_session(session_id)
+        self.sessions[session_id] = session
+        self.chats.discard(session_id)
+        return session
+    
+    def _get_or_create_session(self, session_id: str) -> Dict:
+        """Get session data, creating a technical session if missing"""
+        if session_id not in self.sessions:
+            logger.warning(f"Session {session_id} not found, creating new one")
+            return self._create_session(session_id, 'technical')
+        return self.sessions[session_id]
+    
+    def _build_follow_up_prompt(self, interview_type: str, message: str) -> str:
+        """Build the follow-up prompt for a candidate answer"""
+        interview_context = self._get_interview_prompt(interview_type)
+        return f"""
+基於以下面試背景：
+{interview_context}
+
+候選人剛才回答：{message}
+
+請根據候選人的回答：
+1. 給予簡短但建設性的回饋
+2. 提出相關的追問或下一個問題
+3. 保持面試的連續性和深度
+4. 如果回答不夠詳細，請要求更多細節
+
+回應應該專業且友善。
+            """
+    
+    def _build_code_analysis_prompt(self, code: str, language: str) -> str:
+        """Build the code analysis prompt"""
+        return CODE_ANALYSIS_PROMPT_TEMPLATE.format(language=language, code=code)
+    
+    def _code_analysis_cache_key(self, code: str, language: str) -> str:
+        """Cache key for a code analysis request"""
+        return ResponseCache.make_key(CODE_ANALYSIS_PROMPT_TEMPLATE, language, code)
+    
+    def _code_evaluation_cache_key(self, code: str, problem: str, language: str, test_results: str = '') -> str:
+        """Cache key for a code evaluation request"""
+        # Measured results change the prompt, so they are part of the key
+        if test_results:
+            problem = f"{problem}\0{test_results}"
+        return ResponseCache.make_key(CODE_EVALUATION_PROMPT_TEMPLATE, language, code, problem)
+    
+    def _is_cacheable_response(self, response: str) -> bool:
+        """Only genuine model output is cached, never fallback messages"""
+        return bool(response) and response not in FALLBACK_MESSAGES
+    
+    def _code_too_long_result(self, code: str, language: str) -> Optional[Dict]:
+        """Return the rejection result for oversized code, or None"""
+        if len(code) > Config.MAX_CODE_LENGTH:
+            return {
+                'score': 0,
+                'feedback': f"程式碼過長（{len(code)} 字符）。請提供較短的程式碼片段（最多 {Config.MAX_CODE_LENGTH} 字符）。",
+                'suggestions': ['減少程式碼長度'],
+                'language': language,
+                'complexity': 'Unknown'
+            }
+        return None
+    
+    def _build_code_analysis_result(self, analysis_response: str, language: str) -> Dict:
+        """Parse a code analysis response into the result structure"""
+        # Parse response (simplified scoring)
+        score = self._extract_score_from_response(analysis_response)
+        complexity = self._extract_complexity_from_response(analysis_response)
+        
+        return {
+            'score': score,
+            'feedback': analysis_response,
+            'suggestions': self._extract_suggestions_from_response(analysis_response),
+            'language': language,
+            'complexity': complexity
+        }
+    
+    def _code_analysis_fallback(self, language: str) -> Dict:
+        """Fallback result when code analysis fails"""
+        return {
+            'score': 50,
+            'feedback': f"程式碼分析遇到技術問題。基本觀察：這是一段 {language} 程式碼，建議檢查語法和邏輯。",
+            'suggestions': ['檢查語法正確性', '確認邏輯流程', '添加適當註解'],
+            'language': language,
+            'complexity': 'Medium'
+        }
+    
+    @batched('sessions')
+    def start_interview(self, interview_type: str = 'technical', session_id: Optional[str] = None) -> str:
         """
         Start a new interview session with Gemini
         
         Args:
             interview_type: Type of interview (technical, behavioral, system_design)
+            session_id: Session identifier to use (generated if omitted)
             
         Returns:
             Initial interview question from Gemini
         """
         try:
             # Generate unique session ID
-            session_id = f"session_{int(time.time())}"
+            session_id = session_id or f"session_{int(time.time())}"
             
             # Initialize session data
-            self.sessions[session_id] = {
-                'type': interview_type,
-                'history': [],
-                'start_time': time.time(),
-                'question_count': 0
-            }
+            session = self._create_session(session_id, interview_type)
             
             # Get system prompt
             system_prompt = self._get_interview_prompt(interview_type)
             
             # Generate initial question
-            initial_response = self._call_gemini(system_prompt)
+            if self.chats.get(session_id, interview_type, session['history']) is not None:
+                initial_response = self._chat_with_retry(
+                    session_id, interview_type, session['history'], self.chats.opening_message(interview_type)
+                )
+            else:
+                initial_response = self._call_gemini(system_prompt)
             
             # Store in session history
-            self.sessions[session_id]['history'].append(f"System: {system_prompt}")
-            self.sessions[session_id]['history'].append(f"Interviewer: {initial_response}")
-            self.sessions[session_id]['question_count'] += 1
+            self._append_history(session, f"System: {system_prompt}", f"Interviewer: {initial_response}")
+            session['question_count'] += 1
             
             logger.info(f"Started {interview_type} interview session: {session_id}")
             
@@ -181,6 +591,49 @@ class LLMClient:
             logger.error(f"Error starting interview: {e}")
             return "歡迎參加面試！請先簡單自我介紹，然後我們開始今天的技術討論。"
     
+    @batched('sessions')
+    def start_interview_stream(self, interview_type: str = 'technical',
+                               session_id: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Streaming variant of start_interview
+        
+        Args:
+            interview_type: Type of interview (technical, behavioral, system_design)
+            session_id: Session identifier to use (generated if omitted)
+            
+        Yields:
+            {'type': 'token', 'text': ...} events, then a final
+            {'type': 'done', 'text': <full question>} event
+        """
+        session_id = session_id or f"session_{int(time.time())}"
+        session = self._create_session(session_id, interview_type)
+        system_prompt = self._get_interview_prompt(interview_type)
+        chunks = []
+        
+        if self.chats.get(session_id, interview_type, session['history']) is not None:
+            stream = self._stream_chat(session_id, interview_type, session['history'],
+                                       self.chats.opening_message(interview_type))
+        else:
+            stream = self._stream_gemini(system_prompt)
+        
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield {'type': 'token', 'text': chunk}
+        except Exception as e:
+            logger.error(f"Error streaming interview start: {e}")
+        
+        initial_response = "".join(chunks).strip() or "歡迎參加面試！請先簡單自我介紹，然後我們開始今天的技術討論。"
+        
+        self._append_history(session, f"System: {system_prompt}", f"Interviewer: {initial_response}")
+        session['question_count'] += 1
+        
+        logger.info(f"Started {interview_type} interview session (streaming): {session_id}")
+        
+        self.sessions.flush()
+        yield {'type': 'done', 'text': initial_response}
+    
+    @batched('sessions')
     def get_response(self, message: str, session_id: str) -> str:
         """
         Get response from Gemini based on user message
@@ -193,44 +646,23 @@ class LLMClient:
             Gemini response
         """
         try:
-            # Check if session exists
-            if session_id not in self.sessions:
-                logger.warning(f"Session {session_id} not found, creating new one")
-                self.sessions[session_id] = {
-                    'type': 'technical',
-                    'history': [],
-                    'start_time': time.time(),
-                    'question_count': 0
-                }
-            
-            session = self.sessions[session_id]
+            session = self._get_or_create_session(session_id)
             
-            # Add user message to history
-            session['history'].append(f"Candidate: {message}")
-            
-            # Prepare prompt for follow-up question
-            interview_context = self._get_interview_prompt(session['type'])
-            follow_up_prompt = f"""
-基於以下面試背景：
-{interview_context}
-
-候選人剛才回答：{message}
-
-請根據候選人的回答：
-1. 給予簡短但建設性的回饋
-2. 提出相關的追問或下一個問題
-3. 保持面試的連續性和深度
-4. 如果回答不夠詳細，請要求更多細節
-
-回應應該專業且友善。
-            """
+            # The session's chat already holds the earlier turns
+            history = list(session['history'])
+            self._append_history(session, f"Candidate: {message}")
             
             # Get response from Gemini
-            response = self._call_gemini(follow_up_prompt, session['history'])
+            if self.chats.get(session_id, session['type'], history) is not None:
+                response = self._chat_with_retry(session_id, session['type'], history, message)
+            else:
+                follow_up_prompt = self._build_follow_up_prompt(session['type'], message)
+                response = self._call_gemini(follow_up_prompt, session['history'], session['type'])
             
             # Store response in history
-            session['history'].append(f"Interviewer: {response}")
+            self._append_history(session, f"Interviewer: {response}")
             session['question_count'] += 1
+            self._submit_for_evaluation(session_id, session)
             
             return response
             
@@ -238,6 +670,49 @@ class LLMClient:
             logger.error(f"Error processing message: {e}")
             return "感謝你的回答。能否請你詳細說明一下你的思考過程？"
     
+    @batched('sessions')
+    def get_response_stream(self, message: str, session_id: str) -> Iterator[Dict]:
+        """
+        Streaming variant of get_response
+        
+        The full response is committed to the session history once the
+        stream finishes.
+        
+        Args:
+            message: User's message
+            session_id: Session identifier
+            
+        Yields:
+            {'type': 'token', 'text': ...} events, then a final
+            {'type': 'done', 'text': <full response>} event
+        """
+        session = self._get_or_create_session(session_id)
+        history = list(session['history'])
+        self._append_history(session, f"Candidate: {message}")
+        chunks = []
+        
+        if self.chats.get(session_id, session['type'], history) is not None:
+            stream = self._stream_chat(session_id, session['type'], history, message)
+        else:
+            follow_up_prompt = self._build_follow_up_prompt(session['type'], message)
+            stream = self._stream_gemini(follow_up_prompt, session['history'], session['type'])
+        
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield {'type': 'token', 'text': chunk}
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+        
+        response = "".join(chunks).strip() or "感謝你的回答。能否請你詳細說明一下你的思考過程？"
+        
+        self._append_history(session, f"Interviewer: {response}")
+        session['question_count'] += 1
+        self._submit_for_evaluation(session_id, session)
+        
+        self.sessions.flush()
+        yield {'type': 'done', 'text': response}
+    
     def analyze_code(self, code: str, language: str = 'python') -> Dict:
         """
         Analyze code submission using Gemini
@@ -251,59 +726,123 @@ class LLMClient:
         """
         try:
             # Validate code length
-            if len(code) > Config.MAX_CODE_LENGTH:
-                return {
-                    'score': 0,
-                    'feedback': f"程式碼過長（{len(code)} 字符）。請提供較短的程式碼片段（最多 {Config.MAX_CODE_LENGTH} 字符）。",
-                    'suggestions': ['減少程式碼長度'],
-                    'language': language,
-                    'complexity': 'Unknown'
-                }
+            too_long = self._code_too_long_result(code, language)
+            if too_long:
+                return too_long
+            
+            # Serve identical resubmissions from the cache
+            cache_key = self._code_analysis_cache_key(code, language)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
             
             # Prepare code analysis prompt
-            analysis_prompt = f"""
-請分析以下 {language} 程式碼：
-
-```{language}
-{code}
-```
-
-請提供：
-1. 程式碼品質評分（0-100分）
-2. 詳細的技術回饋
-3. 具體的改進建議
-4. 時間和空間複雜度分析
-5. 潛在的 bug 或問題
-6. 程式碼風格評估
-
-請用繁體中文回應，格式化為結構化的分析報告。
-            """
+            analysis_prompt = self._build_code_analysis_prompt(code, language)
             
             # Get analysis from Gemini
             analysis_response = self._call_gemini(analysis_prompt)
             
-            # Parse response (simplified scoring)
-            score = self._extract_score_from_response(analysis_response)
-            complexity = self._extract_complexity_from_response(analysis_response)
+            result = self._build_code_analysis_result(analysis_response, language)
+            if self._is_cacheable_response(analysis_response):
+                self.response_cache.put(cache_key, result)
             
-            return {
-                'score': score,
-                'feedback': analysis_response,
-                'suggestions': self._extract_suggestions_from_response(analysis_response),
-                'language': language,
-                'complexity': complexity
-            }
+            return result
             
         except Exception as e:
             logger.error(f"Error analyzing code: {e}")
-            return {
-                'score': 50,
-                'feedback': f"程式碼分析遇到技術問題。基本觀察：這是一段 {language} 程式碼，建議檢查語法和邏輯。",
-                'suggestions': ['檢查語法正確性', '確認邏輯流程', '添加適當註解'],
-                'language': language,
-                'complexity': 'Medium'
-            }
+            return self._code_analysis_fallback(language)
+    
+    def analyze_code_stream(self, code: str, language: str = 'python') -> Iterator[Dict]:
+        """
+        Streaming variant of analyze_code
+        
+        Args:
+            code: Code to analyze
+            language: Programming language
+            
+        Yields:
+            {'type': 'token', 'text': ...} events, then a final
+            {'type': 'done', 'analysis': <analysis result>} event
+        """
+        too_long = self._code_too_long_result(code, language)
+        if too_long:
+            yield {'type': 'done', 'analysis': too_long}
+            return
+        
+        cache_key = self._code_analysis_cache_key(code, language)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            yield {'type': 'token', 'text': cached['feedback']}
+            yield {'type': 'done', 'analysis': cached}
+            return
+        
+        analysis_prompt = self._build_code_analysis_prompt(code, language)
+        chunks = []
+        
+        try:
+            outcome = {}
+            for chunk in self._stream_gemini(analysis_prompt, outcome=outcome):
+                chunks.append(chunk)
+                yield {'type': 'token', 'text': chunk}
+            analysis_response = "".join(chunks).strip()
+            analysis = self._build_code_analysis_result(analysis_response, language)
+            # A stream cut short leaves a truncated analysis; show it but do not cache it
+            if outcome['complete'] and self._is_cacheable_response(analysis_response):
+                self.response_cache.put(cache_key, analysis)
+        except Exception as e:
+            logger.error(f"Error streaming code analysis: {e}")
+            analysis = self._code_analysis_fallback(language)
+        
+        yield {'type': 'done', 'analysis': analysis}
+    
+    def generate_coding_problem(self, difficulty: str = 'medium', topic: str = 'algorithms', language: str = 'python') -> str:
+        """
+        Generate a coding problem using Gemini
+        
+        Args:
+            difficulty: Problem difficulty
+            topic: Problem topic
+            language: Target programming language
+            
+        Returns:
+            Problem description text
+        """
+        problem_prompt = CODING_PROBLEM_PROMPT_TEMPLATE.format(
+            difficulty=difficulty, topic=topic, language=language
+        )
+        return self._call_gemini(problem_prompt)
+    
+    def evaluate_code_solution(self, code: str, problem: str, language: str = 'python',
+                               test_results: str = '') -> str:
+        """
+        Evaluate a code solution against a problem description using Gemini
+        
+        Args:
+            code: Solution code
+            problem: Problem description
+            language: Programming language
+            test_results: Summary of the solution's sandboxed test run, if any
+            
+        Returns:
+            Evaluation report text
+        """
+        cache_key = self._code_evaluation_cache_key(code, problem, language, test_results)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        evaluation_prompt = CODE_EVALUATION_PROMPT_TEMPLATE.format(
+            problem=problem, language=language, code=code,
+            test_results=f"\n實際測試結果：\n{test_results}\n" if test_results else ''
+        )
+        evaluation_response = self._call_gemini(evaluation_prompt)
+        
+        if self._is_cacheable_response(evaluation_response):
+            self.response_cache.put(cache_key, evaluation_response)
+        
+        return evaluation_response
     
+    @batched('sessions')
     def end_interview(self, session_id: str) -> Dict:
         """
         End interview and generate summary using Gemini
@@ -316,66 +855,100 @@ class LLMClient:
         """
         try:
             if session_id not in self.sessions:
-                return {
-                    'session_id': session_id,
-                    'total_exchanges': 0,
-                    'summary': "找不到面試會話記錄。",
-                    'score': 'N/A',
-                    'recommendations': ['請確認會話 ID 正確']
-                }
+                return self._missing_session_summary(session_id)
             
             session = self.sessions[session_id]
-            conversation_text = "\n".join(session['history'])
-            
-            # Generate summary prompt
-            summary_prompt = f"""
-以下是完整的面試對話記錄：
-
-{conversation_text}
-
-請提供完整的面試總結：
-1. 候選人表現總評（A-F等級）
-2. 技術能力評估
-3. 回答品質分析
-4. 具體的改進建議
-5. 整體印象和建議
-
-請用繁體中文提供專業的面試總結。
-            """
             
-            # Get summary from Gemini
-            summary_response = self._call_gemini(summary_prompt)
+            # The running evaluation already covers all but the last exchange or two
+            summary_response = self.running_evaluator.finalize(
+                session_id, session['type'], session['history']
+            ) or API_ERROR_MESSAGE
             
-            # Extract score
-            score = self._extract_grade_from_response(summary_response)
-            
-            # Calculate session stats
-            duration = time.time() - session['start_time']
-            
-            result = {
-                'session_id': session_id,
-                'total_exchanges': session['question_count'],
-                'duration_minutes': round(duration / 60, 1),
-                'interview_type': session['type'],
-                'summary': summary_response,
-                'score': score,
-                'recommendations': self._extract_recommendations_from_response(summary_response)
-            }
+            result = self._build_summary_result(session_id, session, summary_response)
             
             # Clean up session
-            del self.sessions[session_id]
+            self.discard_session(session_id)
+            self.chats.close(session_id)
             
             return result
             
         except Exception as e:
             logger.error(f"Error ending interview: {e}")
-            return {
-                'session_id': session_id,
-                'total_exchanges': 0,
-                'summary': "面試總結產生遇到技術問題。建議重新檢視面試過程。",
-                'score': 'B',
-                'recommendations': ['持續練習技術問題', '加強表達能力']
-            }
+            return self._summary_fallback(session_id)
+    
+    def _submit_for_evaluation(self, session_id: str, session: Dict):
+        """Hand the session's new history entries to the running evaluator"""
+        submitted = session.get('evaluation_submitted', 0)
+        history = session['history']
+        self.running_evaluator.submit(session_id, session['type'], history[submitted:], len(history))
+        session['evaluation_submitted'] = len(history)
+    
+    def _fold_evaluation(self, interview_type: str, previous: str, entries: List[str]) -> Optional[str]:
+        """
+        Merge new history entries into a running evaluation
+        
+        Runs on the evaluator's worker threads, so it takes the blocking
+        call path on either client.
+        
+        Args:
+            interview_type: Interview type of the session
+            previous: Evaluation so far ('' before the first fold)
+            entries: History entries the evaluation does not cover yet
+        
+        Returns:
+            Updated evaluation, or None if Gemini did not produce one
+        """
+        # The system prompt is instructions to the interviewer, not part of the interview
+        turns = [self.context_builder.truncate_code(entry) for entry in entries
+                 if not entry.startswith(SYSTEM_PREFIX)]
+        if not turns:
+            return previous or None
+        
+        prompt = RUNNING_EVALUATION_PROMPT_TEMPLATE.format(
+            interview_type=interview_type,
+            previous=previous or "（尚無，這是面試的第一段對話）",
+            entries="\n".join(turns)
+        )
+        response = self._call_gemini_blocking(prompt)
+        return response if self._is_cacheable_response(response) else None
+    
+    def _build_summary_result(self, session_id: str, session: Dict, summary_response: str) -> Dict:
+        """Parse a summary response into the interview summary structure"""
+        # Extract score
+        score = self._extract_grade_from_response(summary_response)
+        
+        # Calculate session stats
+        duration = time.time() - session['start_time']
+        
+        return {
+            'session_id': session_id,
+            'total_exchanges': session['question_count'],
+            'duration_minutes': round(duration / 60, 1),
+            'interview_type': session['type'],
+            'summary': summary_response,
+            'score': score,
+            'recommendations': self._extract_recommendations_from_response(summary_response)
+        }
+    
+    def _missing_session_summary(self, session_id: str) -> Dict:
+        """Summary returned when the session does not exist"""
+        return {
+            'session_id': session_id,
+            'total_exchanges': 0,
+            'summary': "找不到面試會話記錄。",
+            'score': 'N/A',
+            'recommendations': ['請確認會話 ID 正確']
+        }
+    
+    def _summary_fallback(self, session_id: str) -> Dict:
+        """Fallback summary when generation fails"""
+        return {
+            'session_id': session_id,
+            'total_exchanges': 0,
+            'summary': "面試總結產生遇到技術問題。建議重新檢視面試過程。",
+            'score': 'B',
+            'recommendations': ['持續練習技術問題', '加強表達能力']
+        }
     
     def _extract_score_from_response(self, response: str) -> int:
         """Extract numeric score from response"""
@@ -3,14 +3,26 @@ AI Interview Simulator - MVP Flask Application
 簡化版的 AI 面試模擬工具
 """
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
 from flask_cors import CORS
+import asyncio
+import atexit
+from dataclasses import asdict
+import json
 import logging
 import os
 from config import Config
 from llm_client import LLMClient
+from async_llm_client import AsyncLLMClient
 from interview_manager import InterviewManager
 from code_handler import CodeHandler
+from execution_engine import ExecutionEngine, make_problem_id, parse_test_cases
+from sandbox import SandboxUnavailable
+from session_store import SessionConflict
+from complexity_estimator import ComplexityEstimator
+import metrics
+from problem_pool import ProblemPool, parse_prewarm_keys
+from validation_pool import ValidationQueueFull
 import time
 
 # Configure logging
@@ -29,22 +41,136 @@ CORS(app)
 
 # Initialize services
 llm_client = None
+async_llm_client = None
 interview_manager = None
 code_handler = None
+execution_engine = None
+problem_pool = None
 
 def init_services():
     """Initialize all services"""
-    global llm_client, interview_manager, code_handler
+    global llm_client, async_llm_client, interview_manager, code_handler, execution_engine, problem_pool
     try:
         llm_client = LLMClient()
-        interview_manager = InterviewManager(llm_client)
+        async_llm_client = AsyncLLMClient(
+            response_cache=llm_client.response_cache,
+            backend=llm_client.backend,
+            sessions=llm_client.sessions,
+            running_evaluator=llm_client.running_evaluator,
+            chats=llm_client.chats
+        )
         code_handler = CodeHandler()
+        execution_engine = ExecutionEngine(
+            max_workers=Config.EXECUTION_MAX_WORKERS,
+            time_limit=Config.EXECUTION_TIME_LIMIT,
+            memory_limit_mb=Config.EXECUTION_MEMORY_LIMIT_MB,
+            output_limit_kb=Config.EXECUTION_OUTPUT_LIMIT_KB,
+            compile_timeout=Config.EXECUTION_COMPILE_TIMEOUT,
+            cpp_compiler=Config.EXECUTION_CPP_COMPILER or None,
+            launcher_dir=Config.EXECUTION_LAUNCHER_DIR,
+            max_test_cases=Config.EXECUTION_MAX_TEST_CASES,
+            sandbox_uid=Config.EXECUTION_SANDBOX_UID
+        )
+        # Measuring runs submitted code, so it is off when the sandbox is unavailable
+        complexity_estimator = ComplexityEstimator(
+            execution_engine,
+            max_size=Config.EMPIRICAL_COMPLEXITY_MAX_SIZE,
+            time_budget=Config.EMPIRICAL_COMPLEXITY_TIME_BUDGET,
+            max_workers=Config.EMPIRICAL_COMPLEXITY_WORKERS,
+            max_pending=Config.EMPIRICAL_COMPLEXITY_MAX_PENDING,
+            cache_entries=Config.EMPIRICAL_COMPLEXITY_CACHE_ENTRIES
+        ) if Config.EMPIRICAL_COMPLEXITY_ENABLED and execution_engine.sandboxed else None
+        interview_manager = InterviewManager(llm_client, async_llm_client, complexity_estimator)
+        
+        # Expire abandoned interviews and free their stored code
+        interview_manager.add_expiry_listener(code_handler.remove_session_snippets)
+        interview_manager.reaper.start()
+        code_handler.reaper.start()
+        
+        if Config.PROBLEM_POOL_ENABLED:
+            problem_pool = ProblemPool(
+                llm_client,
+                depth=Config.PROBLEM_POOL_DEPTH,
+                low_water=Config.PROBLEM_POOL_LOW_WATER,
+                persist_path=Config.PROBLEM_POOL_PATH,
+                promote_after=Config.PROBLEM_POOL_PROMOTE_AFTER,
+                prewarm_keys=parse_prewarm_keys(Config.PROBLEM_POOL_PREWARM)
+            )
+            problem_pool.start()
+            # Unserved problems go back to the pool file for the next worker
+            atexit.register(problem_pool.stop)
+        
+        # Gauges are computed when /metrics is scraped, not on every change
+        metrics.ACTIVE_SESSIONS.set_function(interview_manager.get_active_sessions_count)
+        metrics.STORED_SNIPPETS.set_function(code_handler.get_snippet_count)
+        
         logger.info("All services initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize services: {e}")
         llm_client = None
+        async_llm_client = None
         interview_manager = None
         code_handler = None
+        execution_engine = None
+        problem_pool = None
+
+CONFLICT_MESSAGE = 'Session was modified by another request, please retry'
+
+def _conflict_response(error: SessionConflict):
+    """409 for a request whose session update collided with another request's"""
+    logger.warning(f"Session conflict: {error}")
+    return jsonify({
+        'success': False,
+        'error': CONFLICT_MESSAGE
+    }), 409
+
+def _format_sse(event: str, data) -> str:
+    """Format a single Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _sse_response(events):
+    """
+    Wrap a stream of {'type': 'token' | 'done', ...} events in an SSE response
+    
+    Token events are sent as `token` messages; the final event is sent as a
+    `done` message carrying the rest of its payload.
+    """
+    def generate():
+        try:
+            for event in events:
+                payload = {key: value for key, value in event.items() if key != 'type'}
+                yield _format_sse(event['type'], payload)
+        except SessionConflict as e:
+            logger.warning(f"Session conflict while streaming response: {e}")
+            yield _format_sse('error', {'success': False, 'error': CONFLICT_MESSAGE})
+        except Exception as e:
+            logger.error(f"Error while streaming response: {e}")
+            yield _format_sse('error', {'success': False, 'error': 'Stream interrupted'})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering so tokens flush immediately
+        }
+    )
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _observe_request_latency(response):
+    """Record route latency; streamed responses are timed until their headers are ready"""
+    start = getattr(g, 'request_start', None)
+    if start is not None:
+        # The URL rule, not the path, so IDs in the URL do not create new series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.labels(route, request.method, response.status_code).observe(
+            time.perf_counter() - start
+        )
+    return response
 
 # Routes
 @app.route('/')
@@ -63,11 +189,40 @@ def health_check():
         'interview_manager_ready': interview_manager is not None,
         'code_handler_ready': code_handler is not None,
         'active_sessions': interview_manager.get_active_sessions_count() if interview_manager else 0,
-        'supported_languages': code_handler.get_supported_languages() if code_handler else []
+        'completed_archive': interview_manager.completed_sessions.get_stats() if interview_manager else None,
+        'session_reaper': {
+            'interviews': interview_manager.reaper.get_stats() if interview_manager else None,
+            'code_snippets': code_handler.reaper.get_stats() if code_handler else None
+        },
+        'supported_languages': code_handler.get_supported_languages() if code_handler else [],
+        'response_cache': llm_client.response_cache.get_stats() if llm_client else None,
+        'context_builder': llm_client.context_builder.get_stats() if llm_client else None,
+        'running_evaluation': llm_client.running_evaluator.get_stats() if llm_client else None,
+        'chat_sessions': llm_client.chats.get_stats() if llm_client else None,
+        'llm_backend': llm_client.backend.get_stats() if llm_client else None,
+        'validation_cache': code_handler.validation_cache.get_stats() if code_handler else None,
+        'validation_pool': code_handler.validation_pool.get_stats() if code_handler else None,
+        'incremental_validation': code_handler.get_document_stats() if code_handler else None,
+        'clang_pool': code_handler.clang_pool.get_stats() if code_handler else None,
+        'execution_engine': execution_engine.get_stats() if execution_engine else None,
+        'complexity_estimator': (
+            interview_manager.complexity_estimator.get_stats()
+            if interview_manager and interview_manager.complexity_estimator else None
+        ),
+        'problem_pool': problem_pool.get_stats() if problem_pool else None,
+        'request_coalescing': {
+            'sync': llm_client.get_coalescing_stats() if llm_client else None,
+            'async': async_llm_client.get_coalescing_stats() if async_llm_client else None
+        }
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics: route, LLM, validation and clang latency histograms and service gauges"""
+    return Response(metrics.REGISTRY.expose(), content_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
 @app.route('/api/start_interview', methods=['POST'])
-def start_interview():
+async def start_interview():
     """Start a new interview session"""
     try:
         data = request.get_json() or {}
@@ -91,10 +246,12 @@ def start_interview():
         )
         
         # Start the interview
-        result = interview_manager.start_interview(session_id)
+        result = await interview_manager.start_interview_async(session_id)
         
         return jsonify(result)
         
+    except SessionConflict as e:
+        return _conflict_response(e)
     except Exception as e:
         logger.error(f"Error starting interview: {e}")
         return jsonify({
@@ -102,8 +259,41 @@ def start_interview():
             'error': 'Failed to start interview'
         }), 500
 
+@app.route('/api/start_interview_stream', methods=['POST'])
+def start_interview_stream():
+    """Start a new interview session, streaming the opening question via SSE"""
+    try:
+        data = request.get_json() or {}
+        interview_type = data.get('type', 'technical')
+        candidate_name = data.get('candidate_name', '')
+        position = data.get('position', '')
+        difficulty_level = data.get('difficulty_level', 'medium')
+        
+        if not interview_manager:
+            return jsonify({
+                'success': False, 
+                'error': 'Interview service not available'
+            }), 503
+        
+        # Create new interview session
+        session_id = interview_manager.create_session(
+            interview_type=interview_type,
+            candidate_name=candidate_name,
+            position=position,
+            difficulty_level=difficulty_level
+        )
+        
+        return _sse_response(interview_manager.start_interview_stream(session_id))
+        
+    except Exception as e:
+        logger.error(f"Error starting interview stream: {e}")
+        return jsonify({
+            'success': False, 
+            'error': 'Failed to start interview'
+        }), 500
+
 @app.route('/api/send_message', methods=['POST'])
-def send_message():
+async def send_message():
     """Send message to interview bot"""
     try:
         data = request.get_json()
@@ -129,10 +319,12 @@ def send_message():
             }), 503
         
         # Process answer through interview manager
-        result = interview_manager.process_answer(session_id, message)
+        result = await interview_manager.process_answer_async(session_id, message)
         
         return jsonify(result)
         
+    except SessionConflict as e:
+        return _conflict_response(e)
     except Exception as e:
         logger.error(f"Error processing message: {e}")
         return jsonify({
@@ -140,8 +332,43 @@ def send_message():
             'error': 'Failed to process message'
         }), 500
 
+@app.route('/api/send_message_stream', methods=['POST'])
+def send_message_stream():
+    """Send message to interview bot, streaming the reply via SSE"""
+    try:
+        data = request.get_json()
+        if not data or 'message' not in data:
+            return jsonify({
+                'success': False, 
+                'error': 'Message is required'
+            }), 400
+        
+        message = data['message']
+        session_id = data.get('session_id')
+        
+        if not session_id:
+            return jsonify({
+                'success': False, 
+                'error': 'Session ID is required'
+            }), 400
+        
+        if not interview_manager:
+            return jsonify({
+                'success': False, 
+                'error': 'Interview service not available'
+            }), 503
+        
+        return _sse_response(interview_manager.process_answer_stream(session_id, message))
+        
+    except Exception as e:
+        logger.error(f"Error streaming message: {e}")
+        return jsonify({
+            'success': False, 
+            'error': 'Failed to process message'
+        }), 500
+
 @app.route('/api/analyze_code', methods=['POST'])
-def analyze_code():
+async def analyze_code():
     """Analyze submitted code during interview"""
     try:
         data = request.get_json()
@@ -168,10 +395,16 @@ def analyze_code():
             }), 503
         
         # Submit code through interview manager
-        result = interview_manager.submit_code(session_id, code, language)
+        result = await interview_manager.submit_code_async(
+            session_id, code, language,
+            function_name=data.get('function_name'),
+            input_kind=data.get('input_kind')
+        )
         
         return jsonify(result)
         
+    except SessionConflict as e:
+        return _conflict_response(e)
     except Exception as e:
         logger.error(f"Error analyzing code: {e}")
         return jsonify({
@@ -180,7 +413,7 @@ def analyze_code():
         }), 500
 
 @app.route('/api/end_interview', methods=['POST'])
-def end_interview():
+async def end_interview():
     """End interview session"""
     try:
         data = request.get_json() or {}
@@ -199,10 +432,12 @@ def end_interview():
             }), 503
         
         # End interview through interview manager
-        result = interview_manager.end_interview(session_id)
+        result = await interview_manager.end_interview_async(session_id)
         
         return jsonify(result)
         
+    except SessionConflict as e:
+        return _conflict_response(e)
     except Exception as e:
         logger.error(f"Error ending interview: {e}")
         return jsonify({
@@ -238,13 +473,12 @@ def validate_code():
     """Validate code syntax and format"""
     try:
         data = request.get_json()
-        if not data or 'code' not in data:
+        if not data or ('code' not in data and 'base_snippet_id' not in data):
             return jsonify({
                 'success': False,
-                'error': 'Code is required'
+                'error': 'Code or base_snippet_id is required'
             }), 400
         
-        code = data['code']
         language = data.get('language', 'python')
         
         if not code_handler:
@@ -253,11 +487,28 @@ def validate_code():
                 'error': 'Code validation service not available'
             }), 503
         
-        # Validate code
-        validation_result = code_handler.validate_code(code, language)
+        if 'base_snippet_id' in data:
+            # Incremental mode: edits against a previously validated buffer
+            try:
+                snippet_id, validation_result = code_handler.validate_edits(
+                    data['base_snippet_id'], data.get('edits', [])
+                )
+            except KeyError:
+                return jsonify({
+                    'success': False,
+                    'error': 'Base snippet not found; send the full code'
+                }), 404
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+        else:
+            snippet_id, validation_result = code_handler.validate_document(data['code'], language)
         
         return jsonify({
             'success': True,
+            'snippet_id': snippet_id,
             'validation': {
                 'is_valid': validation_result.is_valid,
                 'language': validation_result.language,
@@ -267,10 +518,16 @@ def validate_code():
                 'char_count': validation_result.char_count,
                 'complexity_score': validation_result.complexity_score,
                 'security_issues': validation_result.security_issues,
-                'suggestions': validation_result.suggestions
+                'suggestions': validation_result.suggestions,
+                'function_metrics': validation_result.function_metrics
             }
         })
         
+    except ValidationQueueFull:
+        return jsonify({
+            'success': False,
+            'error': 'Code validation is busy, please retry shortly'
+        }), 503
     except Exception as e:
         logger.error(f"Error validating code: {e}")
         return jsonify({
@@ -324,6 +581,11 @@ def store_code():
             }
         })
         
+    except ValidationQueueFull:
+        return jsonify({
+            'success': False,
+            'error': 'Code validation is busy, please retry shortly'
+        }), 503
     except Exception as e:
         logger.error(f"Error storing code: {e}")
         return jsonify({
@@ -381,7 +643,13 @@ def get_code(snippet_id):
 
 @app.route('/api/session_code/<session_id>')
 def get_session_code(session_id):
-    """Get all code snippets for a session"""
+    """
+    Get code snippets for a session
+    
+    Query parameters:
+        offset, limit: Page through snippets, oldest first
+        latest: Return only the most recent N snippets
+    """
     try:
         if not code_handler:
             return jsonify({
@@ -389,7 +657,17 @@ def get_session_code(session_id):
                 'error': 'Code retrieval service not available'
             }), 503
         
-        snippets = code_handler.get_session_snippets(session_id)
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', type=int)
+        latest = request.args.get('latest', type=int)
+        if offset < 0 or (limit is not None and limit < 0) or (latest is not None and latest < 0):
+            return jsonify({
+                'success': False,
+                'error': 'offset, limit and latest must be non-negative integers'
+            }), 400
+        
+        snippets = code_handler.get_session_snippets(session_id, offset=offset, limit=limit, latest=latest)
+        total_snippets = code_handler.count_session_snippets(session_id)
         
         snippets_data = []
         for snippet in snippets:
@@ -412,7 +690,8 @@ def get_session_code(session_id):
             'success': True,
             'session_id': session_id,
             'snippets': snippets_data,
-            'total_snippets': len(snippets_data)
+            'returned_snippets': len(snippets_data),
+            'total_snippets': total_snippets
         })
         
     except Exception as e:
@@ -446,7 +725,7 @@ def get_supported_languages():
 
 # Enhanced LLM Code Analysis API Endpoints
 @app.route('/api/llm_analyze_code', methods=['POST'])
-def llm_analyze_code():
+async def llm_analyze_code():
     """Direct LLM code analysis without interview context"""
     try:
         data = request.get_json()
@@ -459,14 +738,14 @@ def llm_analyze_code():
         code = data['code']
         language = data.get('language', 'python')
         
-        if not llm_client:
+        if not async_llm_client:
             return jsonify({
                 'success': False,
                 'error': 'LLM service not available'
             }), 503
         
         # Perform LLM analysis
-        analysis_result = llm_client.analyze_code(code, language)
+        analysis_result = await async_llm_client.analyze_code(code, language)
         
         return jsonify({
             'success': True,
@@ -480,8 +759,37 @@ def llm_analyze_code():
             'error': 'Failed to analyze code with LLM'
         }), 500
 
+@app.route('/api/llm_analyze_code_stream', methods=['POST'])
+def llm_analyze_code_stream():
+    """Direct LLM code analysis, streaming the report via SSE"""
+    try:
+        data = request.get_json()
+        if not data or 'code' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Code is required'
+            }), 400
+        
+        code = data['code']
+        language = data.get('language', 'python')
+        
+        if not llm_client:
+            return jsonify({
+                'success': False,
+                'error': 'LLM service not available'
+            }), 503
+        
+        return _sse_response(llm_client.analyze_code_stream(code, language))
+        
+    except Exception as e:
+        logger.error(f"Error in streaming LLM code analysis: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to analyze code with LLM'
+        }), 500
+
 @app.route('/api/generate_coding_problem', methods=['POST'])
-def generate_coding_problem():
+async def generate_coding_problem():
     """Generate a coding problem using LLM"""
     try:
         data = request.get_json() or {}
@@ -489,28 +797,22 @@ def generate_coding_problem():
         topic = data.get('topic', 'algorithms')
         language = data.get('language', 'python')
         
-        if not llm_client:
+        if not async_llm_client:
             return jsonify({
                 'success': False,
                 'error': 'LLM service not available'
             }), 503
         
-        # Generate coding problem prompt
-        problem_prompt = f"""
-請生成一個 {difficulty} 難度的 {topic} 程式設計問題，適合 {language} 語言：
-
-要求：
-1. 清楚的問題描述
-2. 輸入輸出範例
-3. 約束條件
-4. 預期時間複雜度
-5. 提示（可選）
-
-請用繁體中文描述，格式化為結構化的程式設計問題。
-        """
+        # Serve from the pre-generated pool when possible
+        pooled = problem_pool.get(difficulty, topic, language) if problem_pool else None
         
-        # Get problem from LLM
-        problem_response = llm_client._call_gemini(problem_prompt)
+        if pooled:
+            problem_response = pooled['description']
+            generated_at = pooled['generated_at']
+        else:
+            # Pool miss: generate synchronously (the bucket refills in the background)
+            problem_response = await async_llm_client.generate_coding_problem(difficulty, topic, language)
+            generated_at = time.time()
         
         return jsonify({
             'success': True,
@@ -519,7 +821,8 @@ def generate_coding_problem():
                 'topic': topic,
                 'language': language,
                 'description': problem_response,
-                'generated_at': time.time()
+                'generated_at': generated_at,
+                'from_pool': pooled is not None
             }
         })
         
@@ -530,8 +833,173 @@ def generate_coding_problem():
             'error': 'Failed to generate coding problem'
         }), 500
 
+async def _basic_validation(code: str, language: str):
+    """Validate code for an evaluation; None when the code handler is unavailable or saturated"""
+    if not code_handler:
+        return None
+    try:
+        return await code_handler.validate_code_async(code, language)
+    except ValidationQueueFull:
+        logger.warning("Skipping basic validation: validation pool is full")
+        return None
+
+def _request_test_cases(data: dict):
+    """
+    Test cases for a request: inline `test_cases`, else those stored under `problem_id`
+    
+    Returns:
+        List of TestCase, or None when the request names none
+    
+    Raises:
+        ValueError: If inline test cases are malformed
+        KeyError: If no test cases are stored under problem_id
+    """
+    if data.get('test_cases') is not None:
+        return parse_test_cases(data['test_cases'], execution_engine.max_test_cases)
+    if data.get('problem_id'):
+        cases = execution_engine.get_test_cases(str(data['problem_id']))
+        if cases is None:
+            raise KeyError(data['problem_id'])
+        return cases
+    return None
+
+async def _run_test_cases(code: str, language: str, cases) -> dict:
+    """Run test cases off the event loop; unsupported languages or a missing sandbox yield an error entry"""
+    try:
+        report = await asyncio.to_thread(execution_engine.run, code, language, cases)
+    except (ValueError, SandboxUnavailable) as e:
+        return {'report': None, 'error': str(e)}
+    return {'report': report, 'error': None}
+
+@app.route('/api/test_cases', methods=['POST'])
+def save_test_cases():
+    """Store input/output test cases for a problem"""
+    try:
+        data = request.get_json()
+        if not data or 'test_cases' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'test_cases is required'
+            }), 400
+        
+        if not execution_engine:
+            return jsonify({
+                'success': False,
+                'error': 'Code execution service not available'
+            }), 503
+        
+        try:
+            cases = parse_test_cases(data['test_cases'], execution_engine.max_test_cases)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        # Problems without an ID of their own are keyed by their statement
+        problem_id = str(data.get('problem_id') or make_problem_id(data.get('problem', '')))
+        execution_engine.save_test_cases(problem_id, cases)
+        
+        return jsonify({
+            'success': True,
+            'problem_id': problem_id,
+            'test_case_count': len(cases)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error saving test cases: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to save test cases'
+        }), 500
+
+@app.route('/api/test_cases/<problem_id>')
+def get_test_cases(problem_id):
+    """Retrieve the stored test cases of a problem"""
+    try:
+        if not execution_engine:
+            return jsonify({
+                'success': False,
+                'error': 'Code execution service not available'
+            }), 503
+        
+        cases = execution_engine.get_test_cases(problem_id)
+        if cases is None:
+            return jsonify({
+                'success': False,
+                'error': 'Test cases not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'problem_id': problem_id,
+            'test_cases': [asdict(case) for case in cases]
+        })
+        
+    except Exception as e:
+        logger.error(f"Error retrieving test cases: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to retrieve test cases'
+        }), 500
+
+@app.route('/api/run_tests', methods=['POST'])
+async def run_tests():
+    """Run code against test cases in the sandbox, without an LLM evaluation"""
+    try:
+        data = request.get_json()
+        if not data or 'code' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Code is required'
+            }), 400
+        
+        if not execution_engine or not execution_engine.sandboxed:
+            return jsonify({
+                'success': False,
+                'error': 'Code execution service not available'
+            }), 503
+        
+        try:
+            cases = _request_test_cases(data)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except KeyError:
+            return jsonify({
+                'success': False,
+                'error': 'Test cases not found'
+            }), 404
+        
+        if not cases:
+            return jsonify({
+                'success': False,
+                'error': 'test_cases or problem_id is required'
+            }), 400
+        
+        execution = await _run_test_cases(data['code'], data.get('language', 'python'), cases)
+        if execution['error']:
+            return jsonify({
+                'success': False,
+                'error': execution['error']
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'execution': execution['report'].to_dict()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error running test cases: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to run test cases'
+        }), 500
+
 @app.route('/api/evaluate_code_solution', methods=['POST'])
-def evaluate_code_solution():
+async def evaluate_code_solution():
     """Evaluate code solution against a specific problem"""
     try:
         data = request.get_json()
@@ -545,43 +1013,40 @@ def evaluate_code_solution():
         problem = data['problem']
         language = data.get('language', 'python')
         
-        if not llm_client:
+        if not async_llm_client:
             return jsonify({
                 'success': False,
                 'error': 'LLM service not available'
             }), 503
         
-        # Enhanced evaluation prompt
-        evaluation_prompt = f"""
-請評估以下程式碼解答：
-
-問題描述：
-{problem}
-
-解答程式碼 ({language}):
-```{language}
-{code}
-```
-
-請提供：
-1. 正確性評估（是否解決了問題）
-2. 程式碼品質評分（0-100分）
-3. 時間和空間複雜度分析
-4. 具體的優點和缺點
-5. 改進建議
-6. 替代解法提示
-7. 綜合評級（A-F）
-
-請用繁體中文提供詳細的評估報告。
-        """
-        
-        # Get evaluation from LLM
-        evaluation_response = llm_client._call_gemini(evaluation_prompt)
+        try:
+            cases = _request_test_cases(data) if execution_engine else None
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except KeyError:
+            return jsonify({
+                'success': False,
+                'error': 'Test cases not found'
+            }), 404
         
-        # Also run basic code validation
-        validation_result = None
-        if code_handler:
-            validation_result = code_handler.validate_code(code, language)
+        # Basic code validation runs alongside the test run and the LLM evaluation
+        validation_task = asyncio.ensure_future(_basic_validation(code, language))
+        try:
+            # Measured results go into the prompt, so the test run finishes first
+            execution = await _run_test_cases(code, language, cases) if cases else None
+            test_results = execution['report'].summary() if execution and execution['report'] else ''
+            
+            # Get evaluation from LLM (served from the response cache on resubmission)
+            evaluation_response = await async_llm_client.evaluate_code_solution(
+                code, problem, language, test_results=test_results
+            )
+            validation_result = await validation_task
+        finally:
+            # Not left pending on the view's loop when an earlier step fails
+            validation_task.cancel()
         
         return jsonify({
             'success': True,
@@ -593,6 +1058,9 @@ def evaluate_code_solution():
                     'warnings': validation_result.warnings if validation_result else [],
                     'complexity_score': validation_result.complexity_score if validation_result else None
                 } if validation_result else None,
+                'execution': (
+                    execution['report'].to_dict() if execution['report'] else {'error': execution['error']}
+                ) if execution else None,
                 'language': language,
                 'evaluated_at': time.time()
             }
@@ -606,7 +1074,7 @@ def evaluate_code_solution():
         }), 500
 
 @app.route('/api/interview_code_feedback', methods=['POST'])
-def interview_code_feedback():
+async def interview_code_feedback():
     """Get interview-style feedback on code submission"""
     try:
         data = request.get_json()
@@ -620,7 +1088,7 @@ def interview_code_feedback():
         language = data.get('language', 'python')
         session_id = data.get('session_id')
         
-        if not llm_client:
+        if not async_llm_client:
             return jsonify({
                 'success': False,
                 'error': 'LLM service not available'
@@ -646,7 +1114,7 @@ def interview_code_feedback():
         """
         
         # Get feedback from LLM
-        feedback_response = llm_client._call_gemini(feedback_prompt)
+        feedback_response = await async_llm_client._call_gemini(feedback_prompt)
         
         return jsonify({
             'success': True,
@@ -0,0 +1,308 @@
+"""
+Metrics for AI Interview Simulator
+以 Prometheus 文字格式匯出的輕量指標：預先配置桶的直方圖與於抓取時計算的量測值；熱路徑上不取鎖
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Observations recorded while capturing (inside validation workers) instead of being applied
+_captured: Optional[List[Tuple[str, Tuple[str, ...], float]]] = None
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+class _ShardedValues:
+    """
+    Per-thread arrays of numbers summed on read
+    
+    Each thread writes only to its own shard, so updates need no lock and
+    cannot be lost. Shards of threads that have exited are folded into a
+    retired total, so a server starting a thread per request does not grow
+    the shard list without bound.
+    """
+    
+    def __init__(self, width: int):
+        self.width = width
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, List[float]]] = []
+        self._retired = [0.0] * width
+        self._lock = threading.Lock()
+    
+    def shard(self) -> List[float]:
+        """This thread's shard"""
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = self._local.values = [0.0] * self.width
+            with self._lock:
+                self._retire_dead_shards()
+                self._shards.append((threading.current_thread(), values))
+        return values
+    
+    def totals(self) -> List[float]:
+        """Sum of every shard, including retired ones"""
+        with self._lock:
+            self._retire_dead_shards()
+            totals = list(self._retired)
+            for _, values in self._shards:
+                for i, value in enumerate(values):
+                    totals[i] += value
+        return totals
+    
+    def _retire_dead_shards(self):
+        live = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                live.append((thread, values))
+            else:
+                for i, value in enumerate(values):
+                    self._retired[i] += value
+        self._shards = live
+
+class _Metric:
+    """Base for a metric family with optional labels; children are created once per label set"""
+    
+    kind = 'untyped'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+    
+    def labels(self, *values: str):
+        """Child for one label set; cache it where it is used on a hot path"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child(key)
+        return child
+    
+    def _new_child(self, key: Tuple[str, ...]):
+        raise NotImplementedError
+    
+    def _label_pairs(self, key: Tuple[str, ...]) -> List[Tuple[str, str]]:
+        return list(zip(self.labelnames, key))
+    
+    def collect(self) -> Iterator[str]:
+        """Sample lines of this family"""
+        raise NotImplementedError
+    
+    def expose(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.collect())
+        return '\n'.join(lines)
+
+class _HistogramChild:
+    """One labelled histogram: fixed bucket bounds, per-thread counts"""
+    
+    __slots__ = ('metric', 'key', 'bounds', '_values')
+    
+    def __init__(self, metric: 'Histogram', key: Tuple[str, ...], bounds: Tuple[float, ...]):
+        self.metric = metric
+        self.key = key
+        self.bounds = bounds
+        # One slot per bucket, one for +Inf, then the sum of observations
+        self._values = _ShardedValues(len(bounds) + 2)
+    
+    def observe(self, value: float):
+        if _captured is not None:
+            _captured.append((self.metric.name, self.key, value))
+            return
+        values = self._values.shard()
+        values[bisect_left(self.bounds, value)] += 1
+        values[-1] += value
+    
+    @contextmanager
+    def time(self):
+        """Observe the duration of a with-block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+class Histogram(_Metric):
+    """Histogram with preallocated buckets (upper bounds, in the metric's unit)"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(float(bound) for bound in buckets if bound != math.inf))
+    
+    def _new_child(self, key: Tuple[str, ...]) -> _HistogramChild:
+        return _HistogramChild(self, key, self.bounds)
+    
+    def observe(self, value: float):
+        """Observe on the unlabelled child"""
+        self.labels().observe(value)
+    
+    def collect(self) -> Iterator[str]:
+        for key, child in sorted(self._children.items()):
+            totals = child._values.totals()
+            pairs = self._label_pairs(key)
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), totals):
+                cumulative += count
+                yield f'{self.name}_bucket{_format_labels(pairs + [("le", _format_value(bound))])} {int(cumulative)}'
+            yield f'{self.name}_sum{_format_labels(pairs)} {_format_value(totals[-1])}'
+            yield f'{self.name}_count{_format_labels(pairs)} {int(cumulative)}'
+
+class _GaugeChild:
+    __slots__ = ('value', 'function', 'lock')
+    
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+        self.lock = threading.Lock()
+    
+    def set(self, value: float):
+        self.value = value
+    
+    def inc(self, amount: float = 1.0):
+        """Adjust a running total kept where it changes, for values too costly to compute at scrape time"""
+        with self.lock:
+            self.value += amount
+    
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+    
+    def set_function(self, function: Callable[[], float]):
+        """Compute the value when metrics are scraped instead of on every change"""
+        self.function = function
+    
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+class Gauge(_Metric):
+    """Value that can go up and down, usually computed at scrape time"""
+    
+    kind = 'gauge'
+    
+    def _new_child(self, key: Tuple[str, ...]) -> '_GaugeChild':
+        return _GaugeChild()
+    
+    def set_function(self, function: Callable[[], float]):
+        """Scrape-time function for the unlabelled child"""
+        self.labels().set_function(function)
+    
+    def collect(self) -> Iterator[str]:
+        for key, child in sorted(self._children.items()):
+            try:
+                value = child.get()
+            except Exception:
+                continue  # A failing gauge is left out of the scrape rather than failing it
+            if value is None:
+                continue
+            yield f'{self.name}{_format_labels(self._label_pairs(key))} {_format_value(float(value))}'
+
+class MetricsRegistry:
+    """Named metric families exported together"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+    
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+    
+    def expose(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.expose() for metric in metrics) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+@contextmanager
+def capture() -> Iterator[List[Tuple[str, Tuple[str, ...], float]]]:
+    """
+    Collect this process's observations instead of recording them
+    
+    Used by single-threaded validation worker processes, whose metrics would
+    otherwise never reach the server process; the caller sends the list back
+    and the server applies it with replay().
+    """
+    global _captured
+    previous, _captured = _captured, []
+    try:
+        yield _captured
+    finally:
+        _captured = previous
+
+def replay(observations: List[Tuple[str, Tuple[str, ...], float]]):
+    """Apply observations captured in another process"""
+    for name, key, value in observations:
+        metric = REGISTRY.get(name)
+        if isinstance(metric, Histogram):
+            metric.labels(*key).observe(value)
+
+# Bucket bounds in seconds
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+CLANG_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by route (streams: until the first byte)',
+    ('route', 'method', 'status'), REQUEST_BUCKETS
+))
+LLM_CALL_SECONDS = REGISTRY.register(Histogram(
+    'llm_call_duration_seconds', '_call_gemini latency including retries and coalesced waits',
+    ('client',), LLM_BUCKETS
+))
+LLM_ATTEMPT_SECONDS = REGISTRY.register(Histogram(
+    'llm_attempt_duration_seconds', 'Latency of each model call attempt, by attempt number (1 = first try) and outcome (ok, empty, error)',
+    ('client', 'attempt', 'outcome'), LLM_BUCKETS
+))
+VALIDATION_STAGE_SECONDS = REGISTRY.register(Histogram(
+    'validate_code_stage_duration_seconds', 'Time spent in each validate_code stage',
+    ('language', 'stage'), STAGE_BUCKETS
+))
+CLANG_CHECK_SECONDS = REGISTRY.register(Histogram(
+    'clang_check_duration_seconds', 'Time of one clang syntax check, excluding the wait for a slot',
+    ('backend', 'pch'), CLANG_BUCKETS
+))
+ACTIVE_SESSIONS = REGISTRY.register(Gauge(
+    'interview_active_sessions', 'Interviews in progress'
+))
+STORED_SNIPPETS = REGISTRY.register(Gauge(
+    'code_snippets_stored', 'Code snippets held by the code handler'
+))
+SESSION_HISTORY_BYTES = REGISTRY.register(Gauge(
+    'session_history_bytes', 'Approximate memory held by conversation histories of active sessions (in-memory store)',
+    ('store',)
+))
@@ -0,0 +1,306 @@
+"""
+Parsed Source for AI Interview Simulator
+單次解析的程式碼表示：行、詞元與（Python 的）AST 只建立一次，供驗證流程的每個階段共用
+"""
+
+import ast
+from itertools import chain
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from complexity import ComplexityReport, LanguageSpec, LineState, PythonRegion, Token, get_language_spec, tokenize_line
+
+BRACKET_PAIRS = {'(': ')', '[': ']', '{': '}'}
+_CLOSERS = frozenset(BRACKET_PAIRS.values())
+
+# Clauses that continue the statement above them even at column 0
+_PYTHON_CLAUSES = frozenset({'else', 'elif', 'except', 'finally'})
+
+# Open brackets, innermost last: (expected closing character, line of the opener)
+BracketStack = Tuple[Tuple[str, int], ...]
+
+class BracketError(NamedTuple):
+    """The first bracket problem on a line"""
+    line: int
+    found: str
+    expected: Optional[str]     # None when nothing was open
+    unclosed: BracketStack      # brackets still open at this point
+
+class BracketScan(NamedTuple):
+    """Bracket matching checkpoint at the end of one line"""
+    stack: BracketStack
+    error: Optional[BracketError]
+
+class BracketReport(NamedTuple):
+    """Bracket matching result for a whole file; matching stops at the first error"""
+    error: Optional[BracketError]
+    unclosed: BracketStack
+
+def scan_brackets(tokens: List[Token], stack: BracketStack) -> BracketScan:
+    """
+    Match the bracket tokens of one line
+    
+    Args:
+        tokens: Tokens of the line (strings and comments are skipped)
+        stack: Open brackets at the start of the line
+    
+    Returns:
+        BracketScan with the open brackets at the end of the line and its first error.
+        After an error, matching continues (a stray closer is ignored) so later
+        lines still get a checkpoint.
+    """
+    open_brackets = list(stack)
+    error = None
+    for token in tokens:
+        if token.kind != 'punct':
+            continue
+        char = token.text
+        if char in BRACKET_PAIRS:
+            open_brackets.append((BRACKET_PAIRS[char], token.line))
+        elif char in _CLOSERS:
+            if not open_brackets:
+                if error is None:
+                    error = BracketError(token.line, char, None, ())
+                continue
+            expected_char, _ = open_brackets.pop()
+            if expected_char != char and error is None:
+                error = BracketError(token.line, char, expected_char, tuple(open_brackets))
+    return BracketScan(tuple(open_brackets), error)
+
+class ParsedSource:
+    """
+    One submission, split and parsed once
+    
+    Lines are computed eagerly; tokens, bracket checkpoints and the Python
+    AST are built on first access and then shared by syntax checking,
+    security scanning, complexity analysis and suggestions. Tokens, tokenizer
+    states and bracket checkpoints are kept per line so an edited copy can
+    reuse them for the lines it did not touch (see incremental.py). Such a
+    copy also parses Python one top-level statement group at a time, skipping
+    groups whose text an earlier version already parsed.
+    """
+    
+    def __init__(self,
+                 code: str,
+                 language: str,
+                 lines: Optional[List[str]] = None,
+                 line_tokens: Optional[List[List[Token]]] = None,
+                 line_states: Optional[List[LineState]] = None,
+                 bracket_scans: Optional[List[BracketScan]] = None,
+                 previous_regions: Optional[Dict[str, ComplexityReport]] = None):
+        """
+        Initialize parsed source
+        
+        Args:
+            code: Source code
+            language: Programming language
+            lines: code.splitlines(), if already known
+            line_tokens: Tokens of each line, if already known
+            line_states: Tokenizer state at the end of each line (required with line_tokens)
+            bracket_scans: Bracket checkpoint of each line, if already known
+            previous_regions: Python statement groups of an earlier version (by text) with their complexity
+        """
+        self.code = code
+        self.language = language.lower()
+        self.spec: LanguageSpec = get_language_spec(self.language)
+        self.lines: List[str] = lines if lines is not None else code.splitlines()
+        
+        self._line_tokens = line_tokens
+        self._line_states = line_states
+        self._bracket_scans = bracket_scans
+        self._tokens: Optional[List[Token]] = None
+        self._tree: Optional[ast.AST] = None
+        self._parsed = False
+        self.parse_error: Optional[Exception] = None
+        
+        # Statement groups by text; replaced with this version's once complexity is analyzed
+        self.previous_regions = previous_regions or {}
+        self.complexity_regions = self.previous_regions
+        self._incremental = line_tokens is not None
+        self._python_regions: Optional[List[PythonRegion]] = None
+        self._regions_built = False
+    
+    @property
+    def line_count(self) -> int:
+        return len(self.lines)
+    
+    @property
+    def char_count(self) -> int:
+        return len(self.code)
+    
+    @property
+    def is_blank(self) -> bool:
+        return not self.code.strip()
+    
+    @property
+    def is_tokenized(self) -> bool:
+        """Whether the per-line tokens have been built (edited copies reuse them)"""
+        return self._line_tokens is not None
+    
+    @property
+    def line_tokens(self) -> List[List[Token]]:
+        """Tokens of each line"""
+        if self._line_tokens is None:
+            self._tokenize()
+        return self._line_tokens
+    
+    @property
+    def line_states(self) -> List[LineState]:
+        """Tokenizer state at the end of each line"""
+        if self._line_states is None:
+            self._tokenize()
+        return self._line_states
+    
+    @property
+    def tokens(self) -> List[Token]:
+        """Token stream (comments and strings included)"""
+        if self._tokens is None:
+            self._tokens = list(chain.from_iterable(self.line_tokens))
+        return self._tokens
+    
+    @property
+    def bracket_scans(self) -> List[BracketScan]:
+        """Bracket matching checkpoint at the end of each line"""
+        if self._bracket_scans is None:
+            scans = []
+            stack: BracketStack = ()
+            for tokens in self.line_tokens:
+                scan = scan_brackets(tokens, stack)
+                scans.append(scan)
+                stack = scan.stack
+            self._bracket_scans = scans
+        return self._bracket_scans
+    
+    @property
+    def brackets(self) -> BracketReport:
+        """First bracket error and the brackets left open"""
+        scans = self.bracket_scans
+        for scan in scans:
+            if scan.error is not None:
+                return BracketReport(scan.error, scan.error.unclosed)
+        return BracketReport(None, scans[-1].stack if scans else ())
+    
+    @property
+    def tree(self) -> Optional[ast.AST]:
+        """Python AST, or None for other languages or code that does not parse (see parse_error)"""
+        if not self._parsed:
+            self._parsed = True
+            if self.language == 'python':
+                try:
+                    self._tree = ast.parse(self.code)
+                except (SyntaxError, ValueError) as e:
+                    self.parse_error = e
+        return self._tree
+    
+    @property
+    def python_regions(self) -> Optional[List[PythonRegion]]:
+        """Top-level Python statement groups, or None for other languages or code that does not parse"""
+        if not self._regions_built:
+            self._regions_built = True
+            self._python_regions = self._build_python_regions()
+        return self._python_regions
+    
+    def code_tokens(self) -> List[Token]:
+        """Tokens other than comments"""
+        return [token for token in self.tokens if token.kind != 'comment']
+    
+    def _tokenize(self):
+        """Tokenize line by line, keeping each line's tokens and end state"""
+        line_tokens = []
+        line_states = []
+        state: LineState = None
+        for line_number, line in enumerate(self.lines, 1):
+            tokens, state = tokenize_line(line, line_number, self.spec, state)
+            line_tokens.append(tokens)
+            line_states.append(state)
+        self._line_tokens = line_tokens
+        self._line_states = line_states
+    
+    def _build_python_regions(self) -> Optional[List[PythonRegion]]:
+        """Group top-level statements, parsing changed groups alone when this is an edited copy"""
+        if self.language != 'python':
+            return None
+        
+        # Region text is only meaningful when our lines are the parser's lines
+        code = self.code
+        lines_match = len(self.lines) == code.count('\n') + (not code.endswith('\n'))
+        
+        if self._incremental and lines_match:
+            regions = []
+            for start, end in self._python_chunks():
+                text = '\n'.join(self.lines[start:end + 1])
+                if text in self.previous_regions:
+                    regions.append(PythonRegion(start + 1, text, None, start))
+                    continue
+                try:
+                    statements = ast.parse(text).body
+                except (SyntaxError, ValueError):
+                    # Let a whole-file parse report the error exactly as a full validation would
+                    regions = None
+                    break
+                regions.append(PythonRegion(start + 1, text, statements, start))
+            if regions is not None:
+                return regions
+        
+        tree = self.tree
+        if tree is None:
+            return None
+        
+        # Statements sharing a line (`a = 1; b = 2`) form one group
+        groups: List[List] = []
+        for statement in tree.body:
+            first = min([statement.lineno] + [node.lineno for node in getattr(statement, 'decorator_list', ())])
+            last = statement.end_lineno or statement.lineno
+            if groups and first <= groups[-1][1]:
+                groups[-1][1] = max(groups[-1][1], last)
+                groups[-1][2].append(statement)
+            else:
+                groups.append([first, last, [statement]])
+        
+        return [
+            PythonRegion(first, '\n'.join(self.lines[first - 1:last]) if lines_match else None, statements)
+            for first, last, statements in groups
+        ]
+    
+    def _python_chunks(self) -> List[Tuple[int, int]]:
+        """
+        0-based (first, last) line ranges of top-level statement groups
+        
+        A group starts on a line that begins at column 0 outside any string,
+        bracket or backslash continuation, unless it continues a compound
+        statement (else/elif/except/finally) or follows a decorator. Trailing
+        blank and comment lines are left out. Splitting too rarely only makes
+        groups bigger; a wrong split makes a group fail to parse, which falls
+        back to a whole-file parse.
+        """
+        chunks: List[List[int]] = []
+        in_decorators = False
+        line_tokens = self.line_tokens
+        line_states = self.line_states
+        scans = self.bracket_scans
+        
+        for index, line in enumerate(self.lines):
+            continued = chunks and (
+                line_states[index - 1] is not None or bool(scans[index - 1].stack) or self.lines[index - 1].endswith('\\')
+            )
+            if not continued:
+                stripped = line.strip()
+                if not stripped or stripped.startswith('#'):
+                    continue
+                
+                tokens = line_tokens[index]
+                first_word = tokens[0].text if tokens else ''
+                starts = line[0] not in ' \t\x0c' and first_word not in _PYTHON_CLAUSES
+                if starts and in_decorators:
+                    if line.startswith('@'):
+                        starts = False
+                    elif first_word in ('def', 'class', 'async'):
+                        starts = False
+                        in_decorators = False
+                if starts or not chunks:
+                    chunks.append([index, index])
+                    in_decorators = line.startswith('@')
+                    continue
+            
+            chunks[-1][1] = index
+        
+        return [(first, last) for first, last in chunks]
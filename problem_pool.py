@@ -0,0 +1,364 @@
+"""
+Coding Problem Pool for AI Interview Simulator
+預先產生的程式設計題目池，背景補充並持久化到磁碟
+"""
+
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: the pool file is then only safe with a single worker process
+    fcntl = None
+
+from llm_client import FALLBACK_MESSAGES, LLMClient
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, str, str]  # (difficulty, topic, language)
+
+def make_pool_key(difficulty: str, topic: str, language: str) -> PoolKey:
+    """Normalize request fields into a pool bucket key"""
+    return (difficulty.strip().lower(), topic.strip().lower(), language.strip().lower())
+
+class ProblemPool:
+    """
+    Pool of pre-generated coding problems keyed on (difficulty, topic, language)
+    
+    A background worker keeps every known bucket filled to `depth` problems.
+    Taking a problem is a dict/deque pop; when a bucket drops below
+    `low_water` a refill is queued. Each served problem is removed, so no two
+    requests get the same pooled problem.
+    
+    Buckets exist for the prewarm keys, and for other keys only once they
+    have missed `promote_after` times, so a one-off topic typed by a user
+    costs no background generation. At most `max_buckets` are kept; the
+    least recently used bucket that is not a prewarm key is evicted to make
+    room.
+    
+    The file at `persist_path` hands unserved problems from one process to
+    the next: on start a process claims the whole file (leaving it empty for
+    the other workers), and on stop it merges its remaining problems back
+    in. A pooled problem is therefore held by one worker process at a time.
+    Problems of a process that dies without stopping are lost and simply
+    generated again.
+    """
+    
+    def __init__(self,
+                 llm_client: LLMClient,
+                 depth: int = 5,
+                 low_water: int = 2,
+                 persist_path: Optional[str] = None,
+                 max_buckets: int = 64,
+                 promote_after: int = 3,
+                 prewarm_keys: Iterable[PoolKey] = ()):
+        """
+        Initialize problem pool
+        
+        Args:
+            llm_client: Client used to generate problems
+            depth: Target number of problems per bucket
+            low_water: Refill is triggered when a bucket holds fewer than this
+            persist_path: JSON file the pool is saved to (None disables persistence)
+            max_buckets: Maximum number of distinct buckets tracked
+            promote_after: Misses after which a key that is not prewarmed gets a bucket
+            prewarm_keys: Buckets to fill on startup, never evicted
+        """
+        self.llm_client = llm_client
+        self.depth = depth
+        self.low_water = min(low_water, depth)
+        self.persist_path = persist_path
+        self.max_buckets = max_buckets
+        self.promote_after = promote_after
+        self.prewarm_keys = {make_pool_key(*key) for key in prewarm_keys}
+        
+        # Least recently used first
+        self._buckets: "OrderedDict[PoolKey, Deque[Dict[str, Any]]]" = OrderedDict()
+        self._miss_counts: "OrderedDict[PoolKey, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refill_queue: "queue.Queue[Optional[PoolKey]]" = queue.Queue()
+        self._pending: set = set()
+        self._worker: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failures = 0
+        self.evicted = 0
+        
+        for key in self.prewarm_keys:
+            self._buckets[key] = deque()
+        self._claim()
+    
+    def start(self):
+        """Start the background refill worker and queue every bucket"""
+        if self._worker is not None:
+            return
+        
+        self._stopping.clear()
+        self._worker = threading.Thread(target=self._run, name='problem-pool-refill', daemon=True)
+        self._worker.start()
+        
+        with self._lock:
+            keys = list(self._buckets)
+        for key in keys:
+            self._request_refill(key)
+        
+        logger.info(f"Problem pool started with {len(keys)} bucket(s), depth {self.depth}")
+    
+    def stop(self):
+        """Stop the worker and hand the remaining problems back to the pool file"""
+        if self._worker is None:
+            return
+        self._stopping.set()
+        self._refill_queue.put(None)
+        self._worker.join(timeout=10)
+        self._worker = None
+        self._release()
+    
+    def get(self, difficulty: str, topic: str, language: str) -> Optional[Dict[str, Any]]:
+        """
+        Take a pre-generated problem from the pool
+        
+        Args:
+            difficulty: Problem difficulty
+            topic: Problem topic
+            language: Target programming language
+        
+        Returns:
+            {'description': ..., 'generated_at': ...} or None if the bucket is
+            empty (it is then refilled in the background, once the key has
+            earned a bucket)
+        """
+        key = make_pool_key(difficulty, topic, language)
+        
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._buckets.move_to_end(key)
+            elif self._note_miss(key):
+                bucket = self._buckets[key]
+            problem = bucket.popleft() if bucket else None
+            if problem is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            refill = bucket is not None and len(bucket) < self.low_water
+        
+        if refill:
+            self._request_refill(key)
+        
+        return problem
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics"""
+        with self._lock:
+            return {
+                'buckets': len(self._buckets),
+                'evicted_buckets': self.evicted,
+                'pooled_problems': sum(len(bucket) for bucket in self._buckets.values()),
+                'depth': self.depth,
+                'low_water': self.low_water,
+                'hits': self.hits,
+                'misses': self.misses,
+                'generated': self.generated,
+                'failures': self.failures,
+                'pending_refills': len(self._pending)
+            }
+    
+    def _note_miss(self, key: PoolKey) -> bool:
+        """
+        Count a miss on a key without a bucket, creating its bucket once the
+        key is in demand (caller holds the lock)
+        
+        Returns:
+            Whether the key now has a bucket
+        """
+        misses = self._miss_counts.pop(key, 0) + 1
+        if misses < self.promote_after:
+            self._miss_counts[key] = misses
+            while len(self._miss_counts) > self.max_buckets * 4:
+                self._miss_counts.popitem(last=False)
+            return False
+        return self._add_bucket(key, deque())
+    
+    def _add_bucket(self, key: PoolKey, problems: Deque[Dict[str, Any]]) -> bool:
+        """Register a bucket, evicting the least recently used non-prewarm one if full (caller holds the lock)"""
+        if len(self._buckets) >= self.max_buckets:
+            victim = next((existing for existing in self._buckets if existing not in self.prewarm_keys), None)
+            if victim is None:
+                logger.debug(f"Problem pool bucket limit reached, not tracking {key}")
+                return False
+            del self._buckets[victim]
+            self.evicted += 1
+        self._buckets[key] = problems
+        return True
+    
+    def _request_refill(self, key: PoolKey):
+        """Queue a bucket for refill unless it is already queued"""
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._refill_queue.put(key)
+    
+    def _run(self):
+        """Worker loop: refill queued buckets"""
+        while not self._stopping.is_set():
+            key = self._refill_queue.get()
+            if key is None:
+                continue
+            try:
+                self._refill(key)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+    
+    def _refill(self, key: PoolKey):
+        """Generate problems until the bucket reaches its target depth"""
+        difficulty, topic, language = key
+        
+        while not self._stopping.is_set():
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None or len(bucket) >= self.depth:
+                    return
+            
+            description = self.llm_client.generate_coding_problem(difficulty, topic, language)
+            if not description or description in FALLBACK_MESSAGES:
+                # Leave the bucket short; the next miss queues it again
+                self.failures += 1
+                logger.warning(f"Problem pool refill failed for {key}")
+                return
+            
+            with self._lock:
+                bucket.append({'description': description, 'generated_at': time.time()})
+                self.generated += 1
+    
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive lock on the pool file among worker processes"""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.persist_path}.lock", 'ab') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def _claim(self):
+        """Take every problem in the pool file, leaving it empty for other workers"""
+        if not self.persist_path:
+            return
+        
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.persist_path)), exist_ok=True)
+            with self._file_lock():
+                buckets = self._read_file()
+                if buckets:
+                    self._write_file({})
+        except OSError as e:
+            logger.warning(f"Could not claim problem pool from {self.persist_path}: {e}")
+            return
+        
+        with self._lock:
+            for key, problems in buckets.items():
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = deque()
+                    if not self._add_bucket(key, bucket):
+                        break
+                bucket.extend(problems[:self.depth - len(bucket)])
+        
+        if buckets:
+            logger.info(f"Claimed {len(buckets)} problem pool bucket(s) from {self.persist_path}")
+    
+    def _release(self):
+        """Merge the unserved problems into the pool file for the next process"""
+        if not self.persist_path:
+            return
+        
+        with self._lock:
+            mine = {key: list(bucket) for key, bucket in self._buckets.items() if bucket}
+            for bucket in self._buckets.values():
+                bucket.clear()
+        
+        try:
+            with self._file_lock():
+                buckets = self._read_file()
+                for key, problems in mine.items():
+                    stored = buckets.setdefault(key, [])
+                    stored.extend(problems[:self.depth - len(stored)])
+                self._write_file(buckets)
+        except OSError as e:
+            logger.warning(f"Could not save problem pool to {self.persist_path}: {e}")
+    
+    def _read_file(self) -> Dict[PoolKey, List[Dict[str, Any]]]:
+        """Buckets stored in the pool file (caller holds the file lock)"""
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {
+                make_pool_key(entry['difficulty'], entry['topic'], entry['language']): list(entry.get('problems', []))
+                for entry in data.get('buckets', [])
+            }
+        except FileNotFoundError:
+            return {}
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable problem pool file {self.persist_path}: {e}")
+            return {}
+    
+    def _write_file(self, buckets: Dict[PoolKey, List[Dict[str, Any]]]):
+        """Atomically replace the pool file (caller holds the file lock)"""
+        data = {
+            'version': 1,
+            'saved_at': time.time(),
+            'buckets': [
+                {
+                    'difficulty': key[0],
+                    'topic': key[1],
+                    'language': key[2],
+                    'problems': problems
+                }
+                for key, problems in buckets.items()
+            ]
+        }
+        
+        directory = os.path.dirname(os.path.abspath(self.persist_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.persist_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+def parse_prewarm_keys(spec: str) -> List[PoolKey]:
+    """
+    Parse a prewarm specification such as "easy:algorithms:python;medium:algorithms:python"
+    
+    Args:
+        spec: Semicolon-separated difficulty:topic:language triples
+    
+    Returns:
+        List of pool keys
+    """
+    keys = []
+    for item in spec.split(';'):
+        parts = [part.strip() for part in item.split(':')]
+        if len(parts) == 3 and all(parts):
+            keys.append(make_pool_key(*parts))
+    return keys
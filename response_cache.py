@@ -0,0 +1,189 @@
+"""
+Response Cache for AI Interview Simulator
+以內容雜湊為鍵的 LLM 回應快取，支援 LRU + TTL 淘汰、容量上限與命中統計
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def normalize_code(code: str) -> str:
+    """
+    Normalize code so trivially different resubmissions share a cache key
+
+    Line endings are unified, trailing whitespace is stripped from every line
+    and leading/trailing blank lines are dropped.
+    """
+    lines = code.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory footprint of a cached value in bytes"""
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and a total size cap in bytes
+
+    Entries are evicted least-recently-used first whenever the entry count or
+    byte budget is exceeded. Expired entries are dropped lazily on lookup.
+    """
+
+    def __init__(self,
+                 max_entries: int = 1024,
+                 max_bytes: int = 32 * 1024 * 1024,
+                 ttl_seconds: Optional[float] = 3600,
+                 size_fn: Callable[[Any], int] = estimate_size):
+        """
+        Initialize response cache
+
+        Args:
+            max_entries: Maximum number of cached entries
+            max_bytes: Maximum total size of cached values in bytes
+            ttl_seconds: Entry lifetime in seconds (None disables expiry)
+            size_fn: Function returning the size of a value in bytes
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.size_fn = size_fn
+
+        # key -> (value, size, expires_at)
+        self._entries: "OrderedDict[str, Tuple[Any, int, Optional[float]]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(template: str, language: str, code: str, problem: str = "") -> str:
+        """
+        Build a content-addressed key for an LLM code prompt
+
+        Args:
+            template: Prompt template the request is rendered from
+            language: Programming language
+            code: Submitted code (normalized before hashing)
+            problem: Problem description, if any
+
+        Returns:
+            Hex digest identifying the request
+        """
+        digest = hashlib.sha256()
+        for part in (template, language.strip().lower(), normalize_code(code), problem.strip()):
+            encoded = part.encode('utf-8')
+            # Length-prefix each part so field boundaries cannot collide
+            digest.update(len(encoded).to_bytes(8, 'big'))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value
+
+        Args:
+            key: Cache key
+
+        Returns:
+            A copy of the cached value, or None on miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        # Callers may decorate the result, so never hand out the cached object
+        return value if isinstance(value, str) else copy.deepcopy(value)
+
+    def put(self, key: str, value: Any):
+        """
+        Store a value, evicting older entries as needed
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        size = self.size_fn(value)
+        if size > self.max_bytes:
+            logger.debug(f"Skipping cache entry of {size} bytes (exceeds cache size)")
+            return
+
+        stored = value if isinstance(value, str) else copy.deepcopy(value)
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds is not None else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (stored, size, expires_at)
+            self._total_bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or
+                                     self._total_bytes > self.max_bytes):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate(self, key: str):
+        """Remove a single entry if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str):
+        """Remove an entry (caller holds the lock)"""
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
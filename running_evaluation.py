@@ -0,0 +1,232 @@
+"""
+Running Evaluation for AI Interview Simulator
+增量式面試評估：每輪對話後於背景將新內容併入累積的評估，結束面試時只需收尾，延遲與面試長度無關
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional
+
+from session_store import SessionStore, create_session_store
+
+logger = logging.getLogger(__name__)
+
+# fold(interview_type, previous evaluation or '', new history entries) -> updated evaluation,
+# or None when the model call failed and the entries should be folded again later
+FoldFunction = Callable[[str, str, List[str]], Optional[str]]
+
+# Seconds a finalized session's tombstone is kept; far longer than any fold
+TOMBSTONE_TTL = 3600
+
+class _SessionQueue:
+    """History entries of one session waiting to be folded, and the fold in progress"""
+    
+    def __init__(self):
+        self.entries: List[str] = []
+        self.upto = 0                       # history length once `entries` are folded
+        self.future: Optional[Future] = None
+        self.cancelled = False
+        self.opened = time.time()           # folds of a session ended after this must not write
+
+class RunningEvaluator:
+    """
+    Keeps an interview evaluation up to date as the interview goes
+    
+    After each exchange, the new history entries are queued and folded into
+    the session's stored evaluation on a background thread, so every fold
+    sees only the previous evaluation and the entries since. Entries that
+    arrive while a fold is running are folded together in the next one, and
+    a session never has two folds at once. A failed fold is retried with
+    the next submission. The stored state is {'text', 'covered'}, where
+    `covered` is how many history entries the text accounts for; finalize()
+    waits briefly for a running fold and then folds whatever is left, which
+    is at most the last few entries.
+    
+    Fold queues are process-local, but the end of a session is not: finalize()
+    and discard() record a tombstone in a shared store, and a fold running in
+    any worker checks it before and after writing, so it cannot bring back
+    the evaluation of a session that has ended.
+    """
+    
+    def __init__(self, fold: FoldFunction, max_workers: int = 4, finalize_wait: float = 10):
+        """
+        Initialize running evaluator
+        
+        Args:
+            fold: Function merging new history entries into an evaluation
+            max_workers: Sessions folded at once
+            finalize_wait: Seconds finalize() waits for a fold already running
+        """
+        self.fold = fold
+        self.finalize_wait = finalize_wait
+        self.evaluations: SessionStore = create_session_store('running_evaluations')
+        self.tombstones: SessionStore = create_session_store('running_evaluation_tombstones')
+        self._last_prune = 0.0
+        
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='running-eval')
+        self._queues: Dict[str, _SessionQueue] = {}
+        self._lock = threading.Lock()
+        
+        # Statistics
+        self.folds = 0
+        self.failed_folds = 0
+        self.finalized = 0
+        self.finalize_folds = 0
+    
+    def submit(self, session_id: str, interview_type: str, entries: List[str], upto: int):
+        """
+        Queue new history entries for folding in the background
+        
+        Args:
+            session_id: Session identifier
+            interview_type: Interview type of the session
+            entries: History entries not yet submitted
+            upto: History length once these entries are included
+        """
+        if not entries:
+            return
+        
+        with self._lock:
+            queue = self._queues.setdefault(session_id, _SessionQueue())
+            queue.entries.extend(entries)
+            queue.upto = upto
+            if queue.future is None:
+                queue.future = self._executor.submit(self._drain, session_id, interview_type, queue)
+    
+    def finalize(self, session_id: str, interview_type: str, history: List[str]) -> Optional[str]:
+        """
+        Bring the evaluation up to date with the full history and release it
+        
+        Args:
+            session_id: Session identifier
+            interview_type: Interview type of the session
+            history: The session's complete history
+        
+        Returns:
+            Final evaluation text; when the last fold fails, the evaluation
+            folded so far, or None if there is none
+        """
+        with self._lock:
+            queue = self._queues.get(session_id)
+            future = queue.future if queue else None
+        
+        if future is not None:
+            try:
+                future.result(timeout=self.finalize_wait)
+            except FutureTimeoutError:
+                logger.warning(f"Running evaluation of {session_id} still folding; finishing it here")
+            except Exception as e:
+                logger.error(f"Running evaluation of {session_id} failed: {e}")
+        
+        self._end(session_id)
+        state = self.evaluations.get(session_id) or {'text': '', 'covered': 0}
+        if session_id in self.evaluations:
+            del self.evaluations[session_id]
+        self.finalized += 1
+        
+        remaining = history[state['covered']:]
+        if not remaining and state['text']:
+            return state['text']
+        
+        self.finalize_folds += 1
+        try:
+            text = self.fold(interview_type, state['text'], remaining)
+        except Exception as e:
+            logger.error(f"Error folding final evaluation of {session_id}: {e}")
+            text = None
+        
+        if text is None and state['text']:
+            logger.warning(f"Final fold of {session_id} failed; using the evaluation folded so far")
+            return state['text']
+        return text
+    
+    def discard(self, session_id: str):
+        """Drop a session's evaluation without finalizing it"""
+        self._end(session_id)
+        if session_id in self.evaluations:
+            del self.evaluations[session_id]
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get evaluator statistics"""
+        with self._lock:
+            folding = sum(1 for queue in self._queues.values() if queue.future is not None)
+        return {
+            'tracked_sessions': len(self.evaluations),
+            'folding': folding,
+            'folds': self.folds,
+            'failed_folds': self.failed_folds,
+            'finalized': self.finalized,
+            'finalize_folds': self.finalize_folds
+        }
+    
+    def _end(self, session_id: str):
+        """Stop folds of a session in this process and, through the tombstone, in every other"""
+        with self._lock:
+            queue = self._queues.pop(session_id, None)
+            if queue is not None:
+                queue.cancelled = True
+        
+        now = time.time()
+        self.tombstones[session_id] = now
+        if now - self._last_prune > TOMBSTONE_TTL / 10:
+            self._last_prune = now
+            for key, ended in self.tombstones.items():
+                if now - ended > TOMBSTONE_TTL:
+                    try:
+                        del self.tombstones[key]
+                    except KeyError:
+                        pass  # Pruned by another worker
+    
+    def _ended(self, session_id: str, queue: _SessionQueue) -> bool:
+        """Whether the session was ended (in any process) after this queue was opened"""
+        ended = self.tombstones.get(session_id)
+        return ended is not None and ended >= queue.opened
+    
+    def _drain(self, session_id: str, interview_type: str, queue: _SessionQueue):
+        """Fold queued entries until the session's queue is empty"""
+        while True:
+            with self._lock:
+                entries, upto = queue.entries, queue.upto
+                queue.entries = []
+                if not entries or queue.cancelled:
+                    queue.future = None
+                    return
+            
+            state = self.evaluations.get(session_id) or {'text': '', 'covered': 0}
+            try:
+                text = self.fold(interview_type, state['text'], entries)
+            except Exception as e:
+                logger.error(f"Error folding running evaluation of {session_id}: {e}")
+                text = None
+            
+            if text is None:
+                # Requeue so these entries are folded with the next submission (or by finalize)
+                self.failed_folds += 1
+                with self._lock:
+                    queue.entries[:0] = entries
+                    queue.future = None
+                return
+            
+            with self._lock:
+                if queue.cancelled or self._ended(session_id, queue):
+                    self._close_queue(session_id, queue)
+                    return
+                self.evaluations[session_id] = {'text': text, 'covered': upto}
+                self.folds += 1
+            
+            # The session may have ended in another worker between the check and the write
+            if self._ended(session_id, queue):
+                if session_id in self.evaluations:
+                    del self.evaluations[session_id]
+                with self._lock:
+                    self._close_queue(session_id, queue)
+                return
+    
+    def _close_queue(self, session_id: str, queue: _SessionQueue):
+        """Retire a queue whose session has ended (caller holds the lock)"""
+        queue.cancelled = True
+        queue.future = None
+        if self._queues.get(session_id) is queue:
+            del self._queues[session_id]
@@ -0,0 +1,386 @@
+"""
+Process Sandbox for AI Interview Simulator
+以 Linux 命名空間、pivot_root 後只含系統目錄與暫存目錄的唯讀根目錄、專用 uid 與 seccomp 過濾器隔離受測程式；任一環節無法建立時拒絕執行
+"""
+
+import ctypes
+import functools
+import logging
+import os
+import platform
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SandboxUnavailable(RuntimeError):
+    """Raised when code would have to run without the sandbox"""
+
+# Flags for unshare(2)
+_CLONE_NEWNS = 0x00020000
+_CLONE_NEWCGROUP = 0x02000000
+_CLONE_NEWUTS = 0x04000000
+_CLONE_NEWIPC = 0x08000000
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWPID = 0x20000000
+_CLONE_NEWNET = 0x40000000
+_NAMESPACE_FLAGS = (_CLONE_NEWNS | _CLONE_NEWCGROUP | _CLONE_NEWUTS | _CLONE_NEWIPC
+                    | _CLONE_NEWUSER | _CLONE_NEWPID | _CLONE_NEWNET)
+
+# Flags for mount(2) and umount2(2)
+_MS_RDONLY = 0x1
+_MS_NOSUID = 0x2
+_MS_NODEV = 0x4
+_MS_NOEXEC = 0x8
+_MS_REMOUNT = 0x20
+_MS_NOATIME = 0x400
+_MS_NODIRATIME = 0x800
+_MS_BIND = 0x1000
+_MS_REC = 0x4000
+_MS_PRIVATE = 0x40000
+_MS_RELATIME = 0x200000
+_MNT_DETACH = 0x2
+
+# A read-only remount of a bind mount must keep the flags the source is mounted with
+_STATVFS_MOUNT_FLAGS = (
+    (os.ST_RDONLY, _MS_RDONLY), (os.ST_NOSUID, _MS_NOSUID), (os.ST_NODEV, _MS_NODEV),
+    (os.ST_NOEXEC, _MS_NOEXEC), (os.ST_NOATIME, _MS_NOATIME), (os.ST_NODIRATIME, _MS_NODIRATIME),
+    (os.ST_RELATIME, _MS_RELATIME)
+) if hasattr(os, 'ST_RELATIME') else ()
+
+# prctl(2) options
+_PR_SET_PDEATHSIG = 1
+_PR_SET_SECCOMP = 22
+_PR_SET_NO_NEW_PRIVS = 38
+_SECCOMP_MODE_FILTER = 2
+
+# Classic BPF opcodes and seccomp return values
+_BPF_LD_W_ABS = 0x20
+_BPF_JEQ_K = 0x15
+_BPF_JGE_K = 0x35
+_BPF_JSET_K = 0x45
+_BPF_RET_K = 0x06
+_SECCOMP_RET_KILL_PROCESS = 0x80000000
+_SECCOMP_RET_ERRNO = 0x00050000
+_SECCOMP_RET_ALLOW = 0x7fff0000
+# Offsets in struct seccomp_data
+_DATA_NR = 0
+_DATA_ARCH = 4
+_DATA_ARG0 = 16
+
+# Per architecture: audit arch, pivot_root, clone, clone3, and the system calls
+# sandboxed code is refused: networking, tracing, mounts and namespaces, keyrings,
+# kernel modules and other host-wide operations
+_SYSCALLS: Dict[str, Dict] = {
+    'x86_64': {
+        'audit_arch': 0xc000003e, 'pivot_root': 155, 'clone': 56, 'clone3': 435, 'x32': True,
+        'denied': (41, 53, 101, 155, 161, 165, 166, 167, 168, 169, 175, 176, 246, 248, 249, 250,
+                   272, 298, 308, 310, 311, 313, 320, 321, 323, 425, 426, 427, 428, 429, 430, 431, 432, 433)
+    },
+    'aarch64': {
+        'audit_arch': 0xc00000b7, 'pivot_root': 41, 'clone': 220, 'clone3': 435, 'x32': False,
+        'denied': (198, 199, 117, 41, 51, 40, 39, 224, 225, 142, 105, 106, 104, 217, 218, 219,
+                   97, 241, 268, 270, 271, 273, 294, 280, 282, 425, 426, 427, 428, 429, 430, 431, 432, 433)
+    }
+}
+
+# Host paths visible read-only in every sandbox
+_SYSTEM_PATHS = ('/usr', '/bin', '/sbin', '/lib', '/lib32', '/lib64', '/libx32',
+                 '/etc/alternatives', '/etc/ld.so.cache')
+_DEVICES = ('/dev/null', '/dev/zero', '/dev/urandom')
+
+# Run inside the sandbox by the probe; exits non-zero if any isolation is missing
+_PROBE_SOURCE = '''
+import os, sys
+try:
+    import socket
+    socket.socket()
+except (ImportError, OSError):
+    pass
+else:
+    sys.exit("networking is available")
+if os.path.exists('/proc/self') or os.path.exists({server_file!r}):
+    sys.exit("host files are visible")
+if {check_uid} and os.getuid() in (0, {server_uid}):
+    sys.exit("running as the server's uid")
+'''
+
+class _SockFilter(ctypes.Structure):
+    _fields_ = [('code', ctypes.c_ushort), ('jt', ctypes.c_ubyte), ('jf', ctypes.c_ubyte), ('k', ctypes.c_uint)]
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [('len', ctypes.c_ushort), ('filter', ctypes.POINTER(_SockFilter))]
+
+def _seccomp_program(machine: str) -> Optional[List[Tuple[int, int, int, int]]]:
+    """Seccomp filter for this architecture as (code, jt, jf, k), or None if unsupported"""
+    table = _SYSCALLS.get(machine)
+    if table is None:
+        return None
+    
+    deny = _SECCOMP_RET_ERRNO | 1  # EPERM
+    program = [
+        (_BPF_LD_W_ABS, 0, 0, _DATA_ARCH),
+        (_BPF_JEQ_K, 1, 0, table['audit_arch']),
+        (_BPF_RET_K, 0, 0, _SECCOMP_RET_KILL_PROCESS),
+        (_BPF_LD_W_ABS, 0, 0, _DATA_NR)
+    ]
+    if table['x32']:
+        # x32 system calls share the x86_64 audit arch with bit 30 set
+        program += [(_BPF_JGE_K, 0, 1, 0x40000000), (_BPF_RET_K, 0, 0, _SECCOMP_RET_ERRNO | 38)]
+    for number in table['denied']:
+        program += [(_BPF_JEQ_K, 0, 1, number), (_BPF_RET_K, 0, 0, deny)]
+    # clone3 passes its flags in memory the filter cannot read; ENOSYS makes libc fall back to clone
+    program += [(_BPF_JEQ_K, 0, 1, table['clone3']), (_BPF_RET_K, 0, 0, _SECCOMP_RET_ERRNO | 38)]
+    program += [
+        (_BPF_JEQ_K, 0, 3, table['clone']),
+        (_BPF_LD_W_ABS, 0, 0, _DATA_ARG0),
+        (_BPF_JSET_K, 0, 1, _NAMESPACE_FLAGS),
+        (_BPF_RET_K, 0, 0, deny),
+        (_BPF_RET_K, 0, 0, _SECCOMP_RET_ALLOW)
+    ]
+    return program
+
+class Sandbox:
+    """
+    Isolates a child process between fork and exec
+    
+    The child gets fresh mount, PID, network, IPC, UTS and cgroup namespaces
+    (plus a user namespace when the server is not root). Its root directory
+    is a tmpfs that holds only read-only binds of the system directories,
+    the interpreter and whatever paths the caller names, /dev/null, zero and
+    urandom, and an empty /tmp; there is no /proc, so the server's files,
+    environment and processes are out of reach. The child then runs as
+    `uid` (mapped onto the server's uid inside the user namespace when not
+    root), with no new privileges and a seccomp filter refusing sockets,
+    tracing, mounts, namespaces and other host-wide system calls.
+    
+    Whether all of that works on this host is probed once at start-up;
+    `available` is False when it does not, and callers must then refuse to
+    run code rather than fall back to weaker isolation.
+    """
+    
+    def __init__(self, root_dir: str, uid: int = 65534, gid: int = 65534, read_only_paths: Sequence[str] = ()):
+        """
+        Initialize sandbox
+        
+        Args:
+            root_dir: Empty directory each child mounts its root file system on
+            uid: Unprivileged uid sandboxed code runs as
+            gid: Unprivileged gid sandboxed code runs as
+            read_only_paths: Host paths visible read-only besides the system directories and this interpreter
+        """
+        self.root_dir = os.path.abspath(root_dir)
+        self.uid = uid
+        self.gid = gid
+        # The probe and Python submissions run this interpreter
+        paths = (sys.prefix, sys.base_prefix) + tuple(read_only_paths)
+        self.read_only_paths = tuple(os.path.realpath(path) for path in paths)
+        self.use_user_namespace = os.geteuid() != 0
+        self._server_uid = os.getuid()
+        self._server_gid = os.getgid()
+        self.unavailable_reason = ''
+        
+        # Everything the child calls is resolved before any fork
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._libc.mount.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_ulong, ctypes.c_char_p]
+        self._libc.umount2.argtypes = [ctypes.c_char_p, ctypes.c_int]
+        self._libc.unshare.argtypes = [ctypes.c_int]
+        machine = platform.machine()
+        program = _seccomp_program(machine)
+        if program is None:
+            self._filter = None
+            self._pivot_root = None
+        else:
+            self._filter_array = (_SockFilter * len(program))(*(_SockFilter(*op) for op in program))
+            self._filter = _SockFprog(len(program), self._filter_array)
+            self._pivot_root = _SYSCALLS[machine]['pivot_root']
+        
+        self.available = self._probe(machine)
+        if self.available:
+            mode = 'user namespace' if self.use_user_namespace else f'uid {uid}'
+            logger.info(f"Sandbox ready ({mode}, seccomp on {machine})")
+        else:
+            logger.error(f"Sandbox unavailable, code execution is disabled: {self.unavailable_reason}")
+    
+    def preexec(self,
+                binds: Sequence[Tuple[str, bool]],
+                cwd: str,
+                limit: Optional[Callable[[], None]] = None) -> Callable[[], None]:
+        """
+        preexec_fn that moves a Popen child into the sandbox
+        
+        Args:
+            binds: (host path, writable) pairs made visible at the same path
+            cwd: Working directory inside the sandbox (also pass it to Popen)
+            limit: Applied after the uid change and before the seccomp filter, e.g. rlimits
+        """
+        return functools.partial(self._enter, tuple(binds), cwd, limit)
+    
+    def prepare_writable(self, path: str):
+        """Let sandboxed code write to a directory the server created"""
+        if not self.use_user_namespace:
+            os.chown(path, self.uid, self.gid)
+    
+    def _enter(self, binds: Tuple[Tuple[str, bool], ...], cwd: str, limit: Optional[Callable[[], None]]):
+        """Runs in the child between fork and exec"""
+        try:
+            self._isolate(binds, cwd, limit)
+        except BaseException as e:
+            # Popen only reports that preexec_fn failed; leave the reason on the child's stderr
+            os.write(2, f"sandbox: {e}\n".encode('utf-8', 'replace'))
+            raise
+    
+    def _isolate(self, binds: Tuple[Tuple[str, bool], ...], cwd: str, limit: Optional[Callable[[], None]]):
+        flags = _CLONE_NEWNS | _CLONE_NEWCGROUP | _CLONE_NEWUTS | _CLONE_NEWIPC | _CLONE_NEWPID | _CLONE_NEWNET
+        if self.use_user_namespace:
+            flags |= _CLONE_NEWUSER
+        self._check(self._libc.unshare(flags))
+        if self.use_user_namespace:
+            self._write('/proc/self/setgroups', 'deny')
+            self._write('/proc/self/uid_map', f'{self.uid} {self._server_uid} 1')
+            self._write('/proc/self/gid_map', f'{self.gid} {self._server_gid} 1')
+        
+        self._fork_into_pid_namespace()
+        self._check(self._libc.prctl(_PR_SET_PDEATHSIG, signal.SIGKILL, 0, 0, 0))
+        self._build_root(binds)
+        os.chdir(cwd)
+        if not self.use_user_namespace:
+            os.setgroups([])
+            os.setgid(self.gid)
+            os.setuid(self.uid)
+        if limit is not None:
+            limit()
+        
+        self._check(self._libc.prctl(_PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0))
+        self._check(self._libc.prctl(_PR_SET_SECCOMP, _SECCOMP_MODE_FILTER, ctypes.byref(self._filter), 0, 0))
+    
+    @staticmethod
+    def _fork_into_pid_namespace():
+        """
+        Only children join a new PID namespace. The Popen child stays behind,
+        waits for the sandboxed process and ends the same way, so the server's
+        wait status, rusage and process-group kill cover both.
+        """
+        pid = os.fork()
+        if pid == 0:
+            return
+        
+        status = 255 << 8
+        try:
+            # Popen reads its error pipe until every copy is closed
+            os.closerange(3, resource.getrlimit(resource.RLIMIT_NOFILE)[0])
+            _, status = os.waitpid(pid, 0)
+            if os.WIFSIGNALED(status):
+                sig = os.WTERMSIG(status)
+                resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+                if sig not in (signal.SIGKILL, signal.SIGSTOP):
+                    signal.signal(sig, signal.SIG_DFL)
+                os.kill(os.getpid(), sig)
+        finally:
+            os._exit(os.waitstatus_to_exitcode(status) if os.WIFEXITED(status) else 255)
+    
+    def _build_root(self, binds: Tuple[Tuple[str, bool], ...]):
+        """Mount the sandbox's root file system and pivot into it"""
+        root = self.root_dir
+        # Keep every mount below out of the host's mount namespace
+        self._mount(None, '/', None, _MS_REC | _MS_PRIVATE)
+        self._mount('tmpfs', root, 'tmpfs', _MS_NOSUID | _MS_NODEV, 'size=16m,mode=0755')
+        # First, since binds below may be scratch directories or files under /tmp
+        os.mkdir(root + '/tmp')
+        self._mount('tmpfs', root + '/tmp', 'tmpfs', _MS_NOSUID | _MS_NODEV, 'size=64m,mode=1777')
+        
+        bound: List[str] = []
+        for path in _SYSTEM_PATHS + self.read_only_paths:
+            if not any(path == parent or path.startswith(parent + '/') for parent in bound):
+                self._bind(path, False)
+                bound.append(path)
+        for path in _DEVICES:
+            self._bind(path, True)
+        for path, writable in binds:
+            self._bind(path, writable)
+        
+        old_root = root + '/.old-root'
+        os.mkdir(old_root)
+        self._check(self._libc.syscall(self._pivot_root, root.encode(), old_root.encode()))
+        os.chdir('/')
+        self._check(self._libc.umount2(b'/.old-root', _MNT_DETACH))
+        os.rmdir('/.old-root')
+        self._mount(None, '/', None, _MS_REMOUNT | _MS_RDONLY | _MS_NOSUID | _MS_NODEV)
+    
+    def _bind(self, path: str, writable: bool):
+        """Make a host path visible at the same path under the sandbox root"""
+        if not os.path.lexists(path):
+            return
+        target = self.root_dir + path
+        if os.path.islink(path):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.symlink(os.readlink(path), target)
+            return
+        if os.path.isdir(path):
+            if not os.path.isdir(target):
+                os.makedirs(target)
+        elif not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            open(target, 'w').close()
+        
+        locked = 0
+        source_flags = os.statvfs(path).f_flag
+        for statvfs_flag, mount_flag in _STATVFS_MOUNT_FLAGS:
+            if source_flags & statvfs_flag:
+                locked |= mount_flag
+        self._mount(path, target, None, _MS_BIND | _MS_REC)
+        self._mount(None, target, None,
+                    _MS_REMOUNT | _MS_BIND | _MS_NOSUID | locked | (0 if writable else _MS_RDONLY))
+    
+    def _mount(self, source: Optional[str], target: str, fstype: Optional[str], flags: int, data: Optional[str] = None):
+        self._check(self._libc.mount(
+            source.encode() if source else None, target.encode(),
+            fstype.encode() if fstype else None, flags, data.encode() if data else None
+        ))
+    
+    @staticmethod
+    def _write(path: str, text: str):
+        with open(path, 'w') as f:
+            f.write(text)
+    
+    @staticmethod
+    def _check(result: int):
+        if result != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+    
+    def _probe(self, machine: str) -> bool:
+        """Run a check script in the sandbox; sets unavailable_reason on failure"""
+        if self._filter is None:
+            self.unavailable_reason = f"no seccomp filter for {machine}"
+            return False
+        try:
+            os.makedirs(self.root_dir, exist_ok=True)
+            with tempfile.TemporaryDirectory(prefix='sandbox-probe-') as work_dir, tempfile.TemporaryFile() as errors:
+                os.chmod(work_dir, 0o755)
+                source = _PROBE_SOURCE.format(
+                    server_file=os.path.abspath(__file__),
+                    check_uid=not self.use_user_namespace,
+                    server_uid=self._server_uid
+                )
+                try:
+                    returncode = subprocess.run(
+                        [sys.executable, '-I', '-S', '-c', source], cwd=work_dir,
+                        env={'PATH': '/usr/bin:/bin', 'LANG': 'C.UTF-8'}, stdout=subprocess.DEVNULL, stderr=errors,
+                        timeout=10, start_new_session=True, preexec_fn=self.preexec([(work_dir, False)], work_dir)
+                    ).returncode
+                except subprocess.SubprocessError as e:
+                    returncode, failure = None, str(e)
+                errors.seek(0)
+                message = errors.read().decode('utf-8', 'replace').strip()[-500:]
+        except OSError as e:
+            self.unavailable_reason = f"could not start a sandboxed process ({e})"
+            return False
+        if returncode != 0:
+            self.unavailable_reason = message or (failure if returncode is None else f"exit status {returncode}")
+            return False
+        return True
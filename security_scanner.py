@@ -0,0 +1,173 @@
+"""
+Security Scanner for AI Interview Simulator
+單次掃描的程式碼安全檢查：所有規則預先編譯，以字面前綴字典樹快速定位候選位置並回報行號
+"""
+
+import logging
+import re
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_REGEX_METACHARACTERS = set('.^$*+?{}[]|()')
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    """Whether a `|` outside any group or character class splits the pattern"""
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 2
+            continue
+        if in_class:
+            if char == ']':
+                in_class = False
+        elif char == '[':
+            in_class = True
+            # A ] right after [ or [^ is a literal member of the class
+            if pattern[i + 1:i + 2] == '^':
+                i += 1
+            if pattern[i + 1:i + 2] == ']':
+                i += 1
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(0, depth - 1)
+        elif char == '|' and depth == 0:
+            return True
+        i += 1
+    return False
+
+def literal_prefix(pattern: str) -> str:
+    """
+    Longest literal text every match of a regex must start with
+    
+    Args:
+        pattern: Regular expression source
+    
+    Returns:
+        The literal prefix (may be empty), lowercased; empty when the
+        pattern has a top-level alternation, since each branch starts differently
+    """
+    if _has_top_level_alternation(pattern):
+        return ''
+    
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            # Escaped punctuation is literal; classes like \s or \w end the prefix
+            if i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+                prefix.append(pattern[i + 1])
+                i += 2
+                continue
+            break
+        if char in _REGEX_METACHARACTERS:
+            break
+        # A following quantifier makes this character optional
+        if i + 1 < len(pattern) and pattern[i + 1] in '*?{':
+            break
+        prefix.append(char)
+        i += 1
+    return ''.join(prefix).lower()
+
+def _trie_regex(words: List[str]) -> str:
+    """Build a factored alternation matching any of the words at a position"""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def emit(node: Dict[str, dict]) -> str:
+        if '' in node:
+            return ''  # A shorter word already matches here
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    
+    return emit(trie)
+
+class SecurityScanner:
+    """
+    Scans code for risky patterns in a single pass
+    
+    Rules are given per category as case-insensitive regexes. Identical rules
+    shared by several categories are merged. The literal prefixes of all
+    rules are compiled into one trie-shaped lookahead, so the text is
+    walked once and a full rule is only tried where its prefix occurs.
+    Matches are zero-width, so overlapping rules from different categories
+    (e.g. `popen(` and `open(`) are all reported. Rules without a literal
+    prefix fall back to a separate search.
+    """
+    
+    def __init__(self, patterns: Dict[str, List[str]]):
+        """
+        Initialize security scanner
+        
+        Args:
+            patterns: Category name -> list of regex rules
+        """
+        self.categories = list(patterns)
+        
+        # Merge duplicate rules: pattern source -> categories it belongs to
+        rule_categories: Dict[str, List[str]] = {}
+        for category, rules in patterns.items():
+            for rule in rules:
+                owners = rule_categories.setdefault(rule, [])
+                if category not in owners:
+                    owners.append(category)
+        
+        # First character of the prefix -> [(prefix, compiled rule, categories)]
+        self._by_first_char: Dict[str, List[Tuple[str, re.Pattern, List[str]]]] = {}
+        self._unanchored: List[Tuple[re.Pattern, List[str]]] = []
+        prefixes = []
+        
+        for rule, owners in rule_categories.items():
+            compiled = re.compile(rule, re.IGNORECASE)
+            prefix = literal_prefix(rule)
+            if prefix:
+                self._by_first_char.setdefault(prefix[0], []).append((prefix, compiled, owners))
+                prefixes.append(prefix)
+            else:
+                self._unanchored.append((compiled, owners))
+        
+        self._candidates = re.compile(f'(?={_trie_regex(prefixes)})') if prefixes else None
+        self.rule_count = len(rule_categories)
+    
+    def scan(self, code: str) -> Dict[str, List[int]]:
+        """
+        Find every category with at least one match
+        
+        Args:
+            code: Source code
+        
+        Returns:
+            Category -> sorted 1-based line numbers of its matches, in category order
+        """
+        text = code.lower()
+        found: Dict[str, set] = {}
+        
+        if self._candidates is not None:
+            line = 1
+            last = 0
+            for candidate in self._candidates.finditer(text):
+                position = candidate.start()
+                line += text.count('\n', last, position)
+                last = position
+                
+                for prefix, compiled, owners in self._by_first_char[text[position]]:
+                    if text.startswith(prefix, position) and compiled.match(text, position):
+                        for category in owners:
+                            found.setdefault(category, set()).add(line)
+        
+        for compiled, owners in self._unanchored:
+            for match in compiled.finditer(text):
+                line = text.count('\n', 0, match.start()) + 1
+                for category in owners:
+                    found.setdefault(category, set()).add(line)
+        
+        return {category: sorted(found[category]) for category in self.categories if category in found}
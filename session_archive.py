@@ -0,0 +1,354 @@
+"""
+Completed Session Archive for AI Interview Simulator
+已完成面試的有界封存：記憶體中保留最近的會話，較舊的壓縮寫入磁碟區段檔
+"""
+
+import logging
+import os
+import pickle
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: compaction is then only safe with a single worker process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Record layout: magic, key length, payload length, key bytes, zlib(pickle(session))
+_RECORD_MAGIC = b'ISA1'
+_RECORD_HEADER = struct.Struct('>4sHI')
+
+# A record with an empty key opens each compacted segment; its payload is a
+# random generation token that tells other processes the file was replaced
+_GENERATION_KEY = b''
+
+# Compaction keeps the newest records up to this share of the disk limits,
+# so it runs again only after a good number of further spills
+_COMPACT_KEEP = 0.75
+
+class SessionArchive:
+    """
+    Bounded archive of completed interview sessions
+    
+    The most recent sessions stay in memory, up to `max_count` sessions and
+    `max_bytes` of pickled size. Older ones are compressed and appended to an
+    on-disk segment file. An in-memory index (session_id -> offset, length)
+    keeps lookups to a single seek and read. The index is rebuilt from the
+    segment on startup, and a lookup miss scans only the part of the file
+    appended since the last scan, which picks up sessions spilled by other
+    worker processes.
+    
+    The segment is bounded too: once it holds more than `max_disk_count`
+    sessions or `max_segment_bytes`, it is rewritten with only the newest
+    sessions and the older ones are gone for good. Appends and compaction
+    take a lock file shared by all worker processes; a compacted segment
+    starts with a new generation token, and a process that sees a token it
+    does not know re-indexes the file from the start.
+    """
+    
+    def __init__(self,
+                 max_count: int = 500,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 segment_path: Optional[str] = None,
+                 compress_level: int = 6,
+                 max_disk_count: int = 10000,
+                 max_segment_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize session archive
+        
+        Args:
+            max_count: Maximum sessions kept in memory
+            max_bytes: Maximum total pickled size of in-memory sessions
+            segment_path: Segment file for spilled sessions (None drops them instead)
+            compress_level: zlib compression level for spilled sessions
+            max_disk_count: Sessions kept in the segment file before it is compacted
+            max_segment_bytes: Segment file size that triggers compaction
+        """
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.segment_path = segment_path
+        self.compress_level = compress_level
+        self.max_disk_count = max_disk_count
+        self.max_segment_bytes = max_segment_bytes
+        
+        # session_id -> (session, pickled size, compressed pickle written on spill)
+        self._hot: "OrderedDict[str, Tuple[Any, int, bytes]]" = OrderedDict()
+        self._hot_bytes = 0
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._scanned_offset = 0
+        self._generation = b''
+        self._count = 0                 # Distinct sessions in memory or on disk
+        self._lock = threading.Lock()
+        
+        # Statistics
+        self.spilled = 0
+        self.dropped = 0
+        self.disk_reads = 0
+        self.compactions = 0
+        self.expired = 0
+        
+        if self.segment_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.segment_path)), exist_ok=True)
+            with self._lock:
+                self._refresh()
+    
+    def add(self, session_id: str, session: Any):
+        """
+        Archive a completed session
+        
+        Args:
+            session_id: Session identifier
+            session: Session object (must be picklable)
+        """
+        data = pickle.dumps(session, protocol=pickle.HIGHEST_PROTOCOL)
+        payload = zlib.compress(data, self.compress_level) if self.segment_path else b''
+        
+        with self._lock:
+            if session_id in self._hot:
+                _, old_size, _ = self._hot.pop(session_id)
+                self._hot_bytes -= old_size
+            elif session_id not in self._index:
+                self._count += 1
+            
+            self._hot[session_id] = (session, len(data), payload)
+            self._hot_bytes += len(data)
+            
+            while self._hot and (len(self._hot) > self.max_count or self._hot_bytes > self.max_bytes):
+                oldest_id, (_, oldest_size, oldest_payload) = self._hot.popitem(last=False)
+                self._hot_bytes -= oldest_size
+                self._spill(oldest_id, oldest_payload)
+    
+    def __setitem__(self, session_id: str, session: Any):
+        self.add(session_id, session)
+    
+    def get(self, session_id: str, default: Any = None) -> Any:
+        """
+        Look up an archived session by ID
+        
+        Args:
+            session_id: Session identifier
+            default: Value returned when the session is unknown
+        
+        Returns:
+            Session object or default
+        """
+        with self._lock:
+            entry = self._hot.get(session_id)
+            if entry is not None:
+                return entry[0]
+            if not self.segment_path:
+                return default
+            
+            try:
+                with open(self.segment_path, 'rb') as f:
+                    # Always confirm the generation: offsets from a replaced file are meaningless
+                    self._refresh(f, scan=session_id not in self._index)
+                    location = self._index.get(session_id)
+                    if location is None:
+                        return default
+                    
+                    self.disk_reads += 1
+                    f.seek(location[0])
+                    return pickle.loads(zlib.decompress(f.read(location[1])))
+            except FileNotFoundError:
+                return default
+    
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._hot or session_id in self._index
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get archive statistics"""
+        with self._lock:
+            return {
+                'sessions': self._count,
+                'in_memory': len(self._hot),
+                'in_memory_bytes': self._hot_bytes,
+                'on_disk': len(self._index),
+                'segment_bytes': self._scanned_offset,
+                'spilled': self.spilled,
+                'dropped': self.dropped,
+                'disk_reads': self.disk_reads,
+                'compactions': self.compactions,
+                'expired': self.expired
+            }
+    
+    def _spill(self, session_id: str, payload: bytes):
+        """Append a compressed session to the segment file (caller holds the lock)"""
+        if not self.segment_path:
+            self._drop(session_id)
+            return
+        
+        try:
+            key = session_id.encode('utf-8')
+            record = _RECORD_HEADER.pack(_RECORD_MAGIC, len(key), len(payload)) + key + payload
+            
+            with self._segment_lock(), open(self.segment_path, 'a+b') as f:
+                # Pick up records appended by other processes so offsets stay right
+                self._refresh(f)
+                
+                offset = f.seek(0, os.SEEK_END)
+                f.write(record)
+                f.flush()
+                
+                if offset == self._scanned_offset:
+                    self._scanned_offset = offset + len(record)
+                self._index[session_id] = (offset + _RECORD_HEADER.size + len(key), len(payload))
+                self.spilled += 1
+                
+                if len(self._index) > self.max_disk_count or self._scanned_offset > self.max_segment_bytes:
+                    self._compact(f)
+        
+        except OSError as e:
+            self._drop(session_id)
+            logger.error(f"Failed to spill session {session_id} to archive segment: {e}")
+    
+    def _drop(self, session_id: str):
+        """Account for a session leaving memory without reaching the segment (caller holds the lock)"""
+        self.dropped += 1
+        if session_id not in self._index:
+            self._count -= 1
+    
+    def _compact(self, f: BinaryIO):
+        """
+        Rewrite the segment with only the newest sessions
+        
+        The caller holds the lock and the segment lock, and passes the
+        current segment open for reading.
+        """
+        keep_count = int(self.max_disk_count * _COMPACT_KEEP)
+        keep_bytes = int(self.max_segment_bytes * _COMPACT_KEEP)
+        generation = os.urandom(8)
+        
+        kept = []
+        total = _RECORD_HEADER.size + len(generation)
+        for session_id, (offset, length) in sorted(self._index.items(), key=lambda item: item[1][0], reverse=True):
+            record_size = _RECORD_HEADER.size + len(session_id.encode('utf-8')) + length
+            if len(kept) >= keep_count or total + record_size > keep_bytes:
+                break
+            kept.append((session_id, offset, length))
+            total += record_size
+        
+        temp_path = f"{self.segment_path}.compact"
+        index: Dict[str, Tuple[int, int]] = {}
+        try:
+            with open(temp_path, 'wb') as out:
+                out.write(_RECORD_HEADER.pack(_RECORD_MAGIC, len(_GENERATION_KEY), len(generation)) + generation)
+                for session_id, offset, length in reversed(kept):
+                    f.seek(offset)
+                    payload = f.read(length)
+                    key = session_id.encode('utf-8')
+                    out.write(_RECORD_HEADER.pack(_RECORD_MAGIC, len(key), len(payload)) + key)
+                    index[session_id] = (out.tell(), length)
+                    out.write(payload)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(temp_path, self.segment_path)
+        except OSError as e:
+            logger.error(f"Failed to compact archive segment {self.segment_path}: {e}")
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            return
+        
+        for session_id in self._index:
+            if session_id not in index:
+                self.expired += 1
+                if session_id not in self._hot:
+                    self._count -= 1
+        self._index = index
+        self._scanned_offset = total
+        self._generation = generation
+        self.compactions += 1
+        logger.info(f"Compacted archive segment to {len(index)} sessions ({total} bytes)")
+    
+    @contextmanager
+    def _segment_lock(self) -> Iterator[None]:
+        """Exclusive lock on the segment among worker processes"""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.segment_path}.lock", 'ab') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def _refresh(self, f: Optional[BinaryIO] = None, scan: bool = True):
+        """
+        Bring the index up to date with the segment (caller holds the lock)
+        
+        Args:
+            f: Segment file open for reading (opened here if omitted)
+            scan: Index records appended since the last scan; without it only
+                  a replaced segment is re-indexed
+        """
+        if f is None:
+            try:
+                with open(self.segment_path, 'rb') as f:
+                    self._refresh(f, scan)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not scan archive segment {self.segment_path}: {e}")
+            return
+        
+        generation = self._read_generation(f)
+        if generation != self._generation:
+            # Another process compacted the segment; everything indexed from it has moved
+            self._count -= sum(1 for session_id in self._index if session_id not in self._hot)
+            self._index = {}
+            self._scanned_offset = 0
+            self._generation = generation
+            scan = True
+        if scan:
+            self._scan_segment(f)
+    
+    @staticmethod
+    def _read_generation(f: BinaryIO) -> bytes:
+        """Generation token of an open segment (empty for a segment never compacted)"""
+        f.seek(0)
+        header = f.read(_RECORD_HEADER.size)
+        if len(header) < _RECORD_HEADER.size:
+            return b''
+        magic, key_length, payload_length = _RECORD_HEADER.unpack(header)
+        if magic != _RECORD_MAGIC or key_length != len(_GENERATION_KEY):
+            return b''
+        return f.read(payload_length)
+    
+    def _scan_segment(self, f: BinaryIO):
+        """Index records appended since the last scan (caller holds the lock)"""
+        f.seek(self._scanned_offset)
+        size = os.fstat(f.fileno()).st_size
+        while True:
+            header = f.read(_RECORD_HEADER.size)
+            if len(header) < _RECORD_HEADER.size:
+                break
+            
+            magic, key_length, payload_length = _RECORD_HEADER.unpack(header)
+            if magic != _RECORD_MAGIC:
+                logger.error(f"Corrupt archive segment at offset {self._scanned_offset}")
+                break
+            
+            key = f.read(key_length)
+            payload_offset = f.tell()
+            if len(key) < key_length or f.seek(payload_length, os.SEEK_CUR) > size:
+                break  # Record still being written
+            
+            if key_length:
+                session_id = key.decode('utf-8')
+                if session_id not in self._index and session_id not in self._hot:
+                    self._count += 1
+                self._index[session_id] = (payload_offset, payload_length)
+            self._scanned_offset = payload_offset + payload_length
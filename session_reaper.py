@@ -0,0 +1,162 @@
+"""
+Session Reaper for AI Interview Simulator
+背景回收逾時或閒置的會話：以最小堆積排程到期時間，每次清理只處理已到期的會話
+"""
+
+import heapq
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SessionReaper:
+    """
+    Expires sessions at scheduled deadlines from a background thread
+    
+    Deadlines live in a min-heap of (deadline, session_id). Rescheduling a
+    session pushes a new entry and records the latest deadline in a dict;
+    older heap entries for the same session are skipped when popped (lazy
+    deletion). A sweep therefore only touches entries that are due, and the
+    heap is rebuilt when stale entries outnumber live ones.
+    """
+    
+    def __init__(self,
+                 on_expire: Callable[[str], None],
+                 interval: float = 30.0,
+                 name: str = 'session-reaper'):
+        """
+        Initialize session reaper
+        
+        Args:
+            on_expire: Called with the session ID once its deadline has passed
+            interval: Maximum seconds between sweeps
+            name: Name of the background thread
+        """
+        self.on_expire = on_expire
+        self.interval = interval
+        self.name = name
+        
+        self._heap: List[Tuple[float, str]] = []
+        self._deadlines: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._worker: Optional[threading.Thread] = None
+        self._stopping = False
+        
+        # Statistics
+        self.expired = 0
+        self.sweeps = 0
+    
+    def schedule(self, session_id: str, deadline: float):
+        """
+        Set or move a session's deadline
+        
+        Args:
+            session_id: Session identifier
+            deadline: Unix time after which the session expires
+        """
+        with self._lock:
+            self._deadlines[session_id] = deadline
+            heapq.heappush(self._heap, (deadline, session_id))
+            
+            if len(self._heap) > 2 * len(self._deadlines) + 64:
+                self._compact()
+            
+            # Wake the worker early if this is now the nearest deadline
+            if self._heap[0][1] == session_id:
+                self._wakeup.notify()
+    
+    def cancel(self, session_id: str):
+        """Stop tracking a session; its heap entries become stale"""
+        with self._lock:
+            self._deadlines.pop(session_id, None)
+    
+    def sweep(self, now: Optional[float] = None) -> List[str]:
+        """
+        Expire every session whose deadline has passed
+        
+        Args:
+            now: Current time (defaults to time.time())
+        
+        Returns:
+            IDs of the sessions that were expired
+        """
+        now = time.time() if now is None else now
+        due = []
+        
+        with self._lock:
+            self.sweeps += 1
+            while self._heap and self._heap[0][0] <= now:
+                deadline, session_id = heapq.heappop(self._heap)
+                if self._deadlines.get(session_id) != deadline:
+                    continue  # Rescheduled or cancelled since this entry was pushed
+                del self._deadlines[session_id]
+                due.append(session_id)
+        
+        # Callbacks run without the lock so they may reschedule sessions
+        for session_id in due:
+            try:
+                self.on_expire(session_id)
+                self.expired += 1
+            except Exception as e:
+                logger.error(f"Error expiring session {session_id}: {e}")
+        
+        if due:
+            logger.info(f"Reaper '{self.name}' expired {len(due)} session(s)")
+        return due
+    
+    def start(self):
+        """Start the background sweep thread"""
+        if self._worker is not None:
+            return
+        
+        self._stopping = False
+        self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._worker.start()
+    
+    def stop(self):
+        """Stop the background sweep thread"""
+        if self._worker is None:
+            return
+        
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+        self._worker.join(timeout=10)
+        self._worker = None
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get reaper statistics"""
+        with self._lock:
+            return {
+                'tracked_sessions': len(self._deadlines),
+                'heap_entries': len(self._heap),
+                'expired': self.expired,
+                'sweeps': self.sweeps
+            }
+    
+    def __len__(self) -> int:
+        return len(self._deadlines)
+    
+    def _run(self):
+        """Worker loop: sleep until the nearest deadline (or interval), then sweep"""
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+                timeout = self.interval
+                if self._heap:
+                    timeout = min(timeout, max(0.0, self._heap[0][0] - time.time()))
+                if timeout > 0:
+                    self._wakeup.wait(timeout)
+                if self._stopping:
+                    return
+            
+            self.sweep()
+    
+    def _compact(self):
+        """Drop stale heap entries (caller holds the lock)"""
+        self._heap = [(deadline, session_id) for session_id, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
@@ -0,0 +1,610 @@
+"""
+Session Store for AI Interview Simulator
+可插拔的會話儲存層：記憶體後端與 SQLite (WAL) 後端，支援以請求為單位的批次讀寫
+"""
+
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import ExitStack, contextmanager
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# merge(base, mine, theirs) -> session to write, where base is the session as this
+# batch read it, mine is this batch's copy and theirs is the row written meanwhile
+MergeFunction = Callable[[Any, Any, Any], Any]
+
+class SessionConflict(RuntimeError):
+    """A session was changed concurrently and this batch's update could not be merged into it"""
+
+class SessionStore(ABC):
+    """
+    Mapping-like session store
+    
+    Callers read and write through the usual dict operations. Wrapping a
+    request in `with store.batch():` makes every read inside it hit the
+    backend at most once per key and defers all writes to one flush when the
+    batch ends. Objects read inside a batch may be mutated in place; those
+    that changed are written back on flush.
+    """
+    
+    # Whether sessions live outside this process (and are shared with other workers)
+    shared = False
+    
+    def __init__(self, namespace: str):
+        """
+        Initialize session store
+        
+        Args:
+            namespace: Logical name separating this store's keys from others
+        """
+        self.namespace = namespace
+    
+    @abstractmethod
+    def __getitem__(self, key: str) -> Any:
+        """Get a session, raising KeyError if missing"""
+    
+    @abstractmethod
+    def __setitem__(self, key: str, value: Any):
+        """Create or replace a session"""
+    
+    @abstractmethod
+    def __delitem__(self, key: str):
+        """Delete a session, raising KeyError if missing"""
+    
+    @abstractmethod
+    def __contains__(self, key: str) -> bool:
+        """Whether a session exists"""
+    
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of stored sessions"""
+    
+    @abstractmethod
+    def keys(self) -> List[str]:
+        """All session keys"""
+    
+    @abstractmethod
+    def batch(self):
+        """Context manager grouping the reads and writes of one request"""
+    
+    def flush(self):
+        """
+        Write the current batch's changes now instead of when it ends
+        
+        Streaming callers flush before sending their final event, so a
+        conflict can still be reported to the client.
+        
+        Raises:
+            SessionConflict: A changed session could not be written
+        """
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a session or a default value"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def values(self) -> List[Any]:
+        """All sessions"""
+        return [self[key] for key in self.keys() if key in self]
+    
+    def items(self) -> List[tuple]:
+        """All (key, session) pairs"""
+        return [(key, self[key]) for key in self.keys() if key in self]
+    
+    def close(self):
+        """Release backend resources"""
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store backed by a dict; batching is a no-op"""
+    
+    def __init__(self, namespace: str = 'default'):
+        """Initialize in-memory store"""
+        super().__init__(namespace)
+        self._data: Dict[str, Any] = {}
+    
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+    
+    def __setitem__(self, key: str, value: Any):
+        self._data[key] = value
+    
+    def __delitem__(self, key: str):
+        del self._data[key]
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def keys(self) -> List[str]:
+        return list(self._data.keys())
+    
+    def values(self) -> List[Any]:
+        return list(self._data.values())
+    
+    def items(self) -> List[tuple]:
+        return list(self._data.items())
+    
+    @contextmanager
+    def batch(self):
+        # Objects are shared by reference, so there is nothing to flush
+        yield self
+
+class _Batch:
+    """Identity map, pending deletions, and what each loaded row looked like when read"""
+    
+    def __init__(self):
+        self.depth = 0
+        self.loaded: Dict[str, Any] = {}
+        self.deleted: Set[str] = set()
+        self.read: Dict[str, Tuple[int, bytes]] = {}    # key -> (version, pickle) as loaded
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite-backed store shared by every worker process using the same file
+    
+    The database runs in WAL mode with synchronous=NORMAL so readers never
+    block the writer and a batch flush is a single short transaction.
+    Sessions are pickled. Each thread uses its own connection.
+    
+    A batch flush writes back only sessions whose pickle differs from the
+    one it read, so a request that merely looked at a session cannot
+    overwrite another worker's update. Each row carries a version, and a
+    changed session is written only if its version is still the one read
+    (compare-and-swap). When another write got there first, the row is
+    re-read in the same transaction and `merge` combines both updates, so
+    neither is lost. Without a merge function, or when the updates cannot
+    be combined, the flush raises SessionConflict rather than dropping the
+    write.
+    """
+    
+    shared = True
+    
+    def __init__(self, path: str, namespace: str = 'default', merge: Optional[MergeFunction] = None):
+        """
+        Initialize SQLite store
+        
+        Args:
+            path: Database file path
+            namespace: Logical name separating this store's keys from others
+            merge: Combines this batch's update with one written concurrently
+                   (see MergeFunction); raises SessionConflict if it cannot
+        """
+        super().__init__(namespace)
+        self.path = path
+        self.merge = merge
+        self.conflicts = 0
+        self.merged = 0
+        self._local = threading.local()
+        self._batch_var: contextvars.ContextVar = contextvars.ContextVar(
+            f'session_batch_{namespace}_{id(self)}', default=None
+        )
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                updated_at REAL NOT NULL,
+                version INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if 'version' not in columns:
+            try:
+                conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            except sqlite3.OperationalError:
+                pass  # Another worker added it first
+        conn.commit()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def _load(self, key: str, batch: Optional[_Batch] = None) -> Any:
+        """Read one session from the database, or _MISSING; a batch records the row's version"""
+        row = self._connection().execute(
+            "SELECT value, version FROM sessions WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        if not row:
+            return _MISSING
+        if batch is not None:
+            batch.read[key] = (row[1], row[0])
+        return pickle.loads(row[0])
+    
+    def _exists(self, key: str) -> bool:
+        """Whether a session row exists in the database"""
+        return self._connection().execute(
+            "SELECT 1 FROM sessions WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone() is not None
+    
+    def _write(self,
+               upserts: Dict[str, bytes],
+               deletes: Set[str],
+               swaps: Optional[Dict[str, Tuple[bytes, int]]] = None,
+               resolve: Optional[Callable[[str, bytes], Optional[bytes]]] = None
+               ) -> Tuple[List[str], Dict[str, Tuple[int, bytes]]]:
+        """
+        Apply writes and deletions in one transaction
+        
+        Args:
+            upserts: Pickled sessions written whatever their current version
+            deletes: Keys to delete
+            swaps: Pickled sessions with the version they were read at; each is
+                   written only if the row still has that version
+            resolve: Called with a swap's key and the row's current pickle when
+                     the version has moved on; returns the pickle to write
+                     instead, or None to give up on that key
+        
+        Returns:
+            Tuple of (keys of swaps that were not written, key -> (version,
+            pickle) of every session written)
+        """
+        if not upserts and not deletes and not swaps:
+            return [], {}
+        
+        now = time.time()
+        conflicts = []
+        written: Dict[str, Tuple[int, bytes]] = {}
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, data in upserts.items():
+                version = conn.execute(
+                    """
+                    INSERT INTO sessions (namespace, key, value, updated_at, version) VALUES (?, ?, ?, ?, 1)
+                    ON CONFLICT (namespace, key) DO UPDATE
+                    SET value = excluded.value, updated_at = excluded.updated_at, version = version + 1
+                    RETURNING version
+                    """,
+                    (self.namespace, key, data, now)
+                ).fetchone()[0]
+                written[key] = (version, data)
+            for key, (data, version) in (swaps or {}).items():
+                cursor = conn.execute(
+                    """
+                    UPDATE sessions SET value = ?, updated_at = ?, version = version + 1
+                    WHERE namespace = ? AND key = ? AND version = ?
+                    """,
+                    (data, now, self.namespace, key, version)
+                )
+                if cursor.rowcount:
+                    written[key] = (version + 1, data)
+                    continue
+                
+                # The write lock is held, so the row cannot move again before the merged write
+                row = conn.execute(
+                    "SELECT value, version FROM sessions WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+                merged = resolve(key, row[0]) if row and resolve else None
+                if merged is None:
+                    conflicts.append(key)
+                    continue
+                conn.execute(
+                    "UPDATE sessions SET value = ?, updated_at = ?, version = ? WHERE namespace = ? AND key = ?",
+                    (merged, now, row[1] + 1, self.namespace, key)
+                )
+                written[key] = (row[1] + 1, merged)
+            if deletes:
+                conn.executemany(
+                    "DELETE FROM sessions WHERE namespace = ? AND key = ?",
+                    [(self.namespace, key) for key in deletes]
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return conflicts, written
+    
+    def _flush(self, batch: _Batch):
+        """
+        Write back a batch's changed sessions and deletions
+        
+        Afterwards the batch holds the written sessions as its new reads, so
+        it can go on and be flushed again.
+        
+        Raises:
+            SessionConflict: A changed session could not be written
+        """
+        upserts: Dict[str, bytes] = {}
+        swaps: Dict[str, Tuple[bytes, int]] = {}
+        for key, value in batch.loaded.items():
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            read = batch.read.get(key)
+            if read is None:
+                upserts[key] = data             # Created in this batch without reading the row
+            elif data != read[1]:
+                swaps[key] = (data, read[0])
+        
+        def resolve(key: str, current: bytes) -> Optional[bytes]:
+            if self.merge is None:
+                return None
+            try:
+                merged = self.merge(pickle.loads(batch.read[key][1]), batch.loaded[key], pickle.loads(current))
+            except SessionConflict:
+                return None
+            batch.loaded[key] = merged
+            self.merged += 1
+            return pickle.dumps(merged, protocol=pickle.HIGHEST_PROTOCOL)
+        
+        conflicts, written = self._write(upserts, batch.deleted, swaps, resolve)
+        batch.read.update(written)
+        batch.deleted.clear()
+        if conflicts:
+            self.conflicts += len(conflicts)
+            raise SessionConflict(f"{self.namespace} modified concurrently: {', '.join(conflicts)}")
+    
+    def __getitem__(self, key: str) -> Any:
+        batch = self._batch_var.get()
+        if batch is None:
+            value = self._load(key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        
+        if key in batch.deleted:
+            raise KeyError(key)
+        if key not in batch.loaded:
+            value = self._load(key, batch)
+            if value is _MISSING:
+                raise KeyError(key)
+            batch.loaded[key] = value
+        return batch.loaded[key]
+    
+    def __setitem__(self, key: str, value: Any):
+        batch = self._batch_var.get()
+        if batch is None:
+            self._write({key: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)}, set())
+            return
+        
+        batch.deleted.discard(key)
+        batch.loaded[key] = value
+    
+    def __delitem__(self, key: str):
+        batch = self._batch_var.get()
+        if batch is None:
+            if not self._exists(key):
+                raise KeyError(key)
+            self._write({}, {key})
+            return
+        
+        if key not in self:
+            raise KeyError(key)
+        batch.loaded.pop(key, None)
+        batch.deleted.add(key)
+    
+    def __contains__(self, key: str) -> bool:
+        batch = self._batch_var.get()
+        if batch is not None:
+            if key in batch.deleted:
+                return False
+            if key in batch.loaded:
+                return True
+        return self._exists(key)
+    
+    def __len__(self) -> int:
+        row = self._connection().execute(
+            "SELECT COUNT(*) FROM sessions WHERE namespace = ?",
+            (self.namespace,)
+        ).fetchone()
+        return row[0]
+    
+    def keys(self) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT key FROM sessions WHERE namespace = ?",
+            (self.namespace,)
+        ).fetchall()
+        return [row[0] for row in rows]
+    
+    @contextmanager
+    def batch(self) -> Iterator['SQLiteSessionStore']:
+        """
+        Group one request's reads and writes
+        
+        Nested batches join the outermost one. Every session changed in the
+        batch is flushed in a single transaction when it ends, including
+        when the request fails or a streaming client disconnects, matching
+        the in-place semantics of the in-memory store.
+        
+        Raises:
+            SessionConflict: On a normal exit, when a changed session could
+                             not be written (a failing request keeps its own
+                             exception and the conflict is logged)
+        """
+        batch = self._batch_var.get()
+        if batch is not None:
+            batch.depth += 1
+            try:
+                yield self
+            finally:
+                batch.depth -= 1
+            return
+        
+        batch = _Batch()
+        token = self._batch_var.set(batch)
+        try:
+            yield self
+        except BaseException:
+            # Keep what the failed or abandoned request changed, but let its own error through
+            self._batch_var.reset(token)
+            try:
+                self._flush(batch)
+            except Exception as e:
+                logger.error(f"Failed to flush session batch for {self.namespace}: {e}")
+            raise
+        
+        self._batch_var.reset(token)
+        try:
+            self._flush(batch)
+        except SessionConflict:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to flush session batch for {self.namespace}: {e}")
+    
+    def flush(self):
+        batch = self._batch_var.get()
+        if batch is not None:
+            self._flush(batch)
+    
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+def create_session_store(namespace: str, merge: Optional[MergeFunction] = None) -> SessionStore:
+    """
+    Create a session store using the configured backend
+    
+    Args:
+        namespace: Logical name of the store
+        merge: How concurrent updates of one session are combined (shared
+               backends only; see append_merge)
+    
+    Returns:
+        SessionStore instance
+    """
+    backend = Config.SESSION_STORE_BACKEND.lower()
+    
+    if backend == 'sqlite':
+        return SQLiteSessionStore(Config.SESSION_STORE_PATH, namespace, merge)
+    if backend != 'memory':
+        logger.warning(f"Unknown session store backend '{backend}', using in-memory store")
+    return InMemorySessionStore(namespace)
+
+def append_merge(lists: Iterable[str] = (), counters: Iterable[str] = ()) -> MergeFunction:
+    """
+    Merge function for sessions whose histories only ever grow
+    
+    Works on dict sessions and on objects alike. Each named list keeps the
+    other writer's entries and appends this batch's new ones; each named
+    counter adds this batch's increment to the other writer's value. Any
+    other field takes this batch's value if it changed it, and otherwise
+    keeps the other writer's.
+    
+    Args:
+        lists: Append-only list fields
+        counters: Numeric fields that are only incremented
+    
+    Returns:
+        MergeFunction raising SessionConflict when a list was rewritten
+        rather than appended to
+    """
+    lists = frozenset(lists)
+    counters = frozenset(counters)
+    
+    def merge(base: Any, mine: Any, theirs: Any) -> Any:
+        if isinstance(mine, dict):
+            fields = lambda value: value
+            get = lambda value, name: value.get(name, _MISSING)
+            def put(name, value):
+                if value is _MISSING:
+                    mine.pop(name, None)
+                else:
+                    mine[name] = value
+        else:
+            fields = vars
+            get = lambda value, name: getattr(value, name, _MISSING)
+            def put(name, value):
+                if value is not _MISSING:
+                    setattr(mine, name, value)
+        
+        for name in set(fields(base)) | set(fields(mine)) | set(fields(theirs)):
+            old, new, other = get(base, name), get(mine, name), get(theirs, name)
+            if name in lists:
+                old = [] if old is _MISSING else old
+                new = [] if new is _MISSING else new
+                other = [] if other is _MISSING else other
+                if new[:len(old)] != old or other[:len(old)] != old:
+                    raise SessionConflict(f"'{name}' was rewritten rather than appended to")
+                put(name, other + new[len(old):])
+            elif name in counters:
+                put(name, (0 if other is _MISSING else other) + (0 if new is _MISSING else new)
+                    - (0 if old is _MISSING else old))
+            elif new == old:
+                put(name, other)
+        return mine
+    
+    return merge
+
+def batched(*store_attrs: str):
+    """
+    Decorator running a method inside one batch of each named store
+    
+    Args:
+        store_attrs: Attribute paths of the stores on `self`, e.g. 'sessions'
+                     or 'llm_client.sessions'
+    
+    Works for plain methods, generator methods (the batch spans the whole
+    stream) and coroutine methods.
+    """
+    getters = [attrgetter(attr) for attr in store_attrs]
+    
+    def open_batches(self) -> ExitStack:
+        stack = ExitStack()
+        for getter in getters:
+            stack.enter_context(getter(self).batch())
+        return stack
+    
+    def decorator(method):
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                with open_batches(self):
+                    return await method(self, *args, **kwargs)
+            return async_wrapper
+        
+        if inspect.isasyncgenfunction(method):
+            @functools.wraps(method)
+            async def async_gen_wrapper(self, *args, **kwargs):
+                with open_batches(self):
+                    async for item in method(self, *args, **kwargs):
+                        yield item
+            return async_gen_wrapper
+        
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def gen_wrapper(self, *args, **kwargs):
+                with open_batches(self):
+                    yield from method(self, *args, **kwargs)
+            return gen_wrapper
+        
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with open_batches(self):
+                return method(self, *args, **kwargs)
+        return wrapper
+    
+    return decorator
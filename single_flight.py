@@ -0,0 +1,147 @@
+"""
+Single-flight request coalescing for AI Interview Simulator
+合併相同的進行中請求：同時送出的相同 prompt 只呼叫一次上游模型
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+def prompt_key(prompt: str) -> str:
+    """Stable key for a fully rendered prompt"""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+class _Call:
+    """An in-flight call shared by a leader and its followers"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.followers = 0
+
+class SingleFlight:
+    """
+    Thread-based single-flight group
+    
+    The first caller for a key (the leader) runs the function; callers that
+    arrive with the same key while it is running block until it finishes and
+    receive the same result (or exception). Nothing is cached afterwards.
+    """
+    
+    def __init__(self):
+        """Initialize single-flight group"""
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        
+        # Statistics
+        self.calls = 0        # total do() invocations
+        self.executions = 0   # upstream calls actually made
+        self.collapsed = 0    # invocations served by another caller's call
+    
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn once per key among concurrent callers
+        
+        Args:
+            key: Identity of the request
+            fn: Zero-argument function performing the upstream call
+        
+        Returns:
+            Result of the shared call
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.collapsed += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.followers:
+                logger.debug(f"Single-flight call shared with {call.followers} waiting caller(s)")
+        
+        return call.result
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get coalescing statistics"""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executions': self.executions,
+                'collapsed': self.collapsed,
+                'in_flight': len(self._calls)
+            }
+
+class AsyncSingleFlight:
+    """
+    asyncio single-flight group
+    
+    Must be used from a single event loop. Followers await the leader's task
+    through asyncio.shield, so a cancelled caller never cancels the shared call.
+    """
+    
+    def __init__(self):
+        """Initialize async single-flight group"""
+        self._tasks: Dict[str, asyncio.Task] = {}
+        
+        # Statistics
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() once per key among concurrent callers
+        
+        Args:
+            key: Identity of the request
+            fn: Zero-argument coroutine function performing the upstream call
+        
+        Returns:
+            Result of the shared call
+        """
+        self.calls += 1
+        task = self._tasks.get(key)
+        if task is not None:
+            self.collapsed += 1
+        else:
+            self.executions += 1
+            task = asyncio.get_running_loop().create_task(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        
+        return await asyncio.shield(task)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get coalescing statistics"""
+        return {
+            'calls': self.calls,
+            'executions': self.executions,
+            'collapsed': self.collapsed,
+            'in_flight': len(self._tasks)
+        }
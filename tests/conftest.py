@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Tests never call a real model; set before config is imported
+os.environ.setdefault('LLM_BACKEND', 'stub')
+os.environ.setdefault('LLM_STUB_LATENCY', 'fixed:0')
+os.environ.setdefault('LLM_STUB_TOKEN_RATE', '1000000')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
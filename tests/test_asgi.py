@@ -0,0 +1,69 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import main
+from asgi import AsyncViewServer
+
+class SlowAnalyzer:
+    """Stands in for AsyncLLMClient; records the thread each call ran on"""
+    
+    def __init__(self, delay):
+        self.delay = delay
+        self.threads = set()
+    
+    async def analyze_code(self, code, language):
+        self.threads.add(threading.get_ident())
+        await asyncio.sleep(self.delay)
+        return {'feedback': f"{language}: {code}"}
+
+async def call(server, method, path, body=None):
+    """Send one request through the ASGI app; returns (status, headers, body)"""
+    payload = json.dumps(body).encode() if body is not None else b''
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'http_version': '1.1',
+        'headers': [(b'content-type', b'application/json'), (b'host', b'testserver')]
+    }
+    received = iter([{'type': 'http.request', 'body': payload, 'more_body': False}])
+    messages = []
+    
+    async def receive():
+        return next(received)
+    
+    async def send(message):
+        messages.append(message)
+    
+    await server(scope, receive, send)
+    start = messages[0]
+    return start['status'], dict(start['headers']), b''.join(m.get('body', b'') for m in messages[1:])
+
+@pytest.fixture
+def server():
+    server = AsyncViewServer(main.app, max_workers=2)
+    yield server
+    server._executor.shutdown()
+
+def test_async_views_run_on_the_server_loop(server, monkeypatch):
+    analyzer = SlowAnalyzer(delay=0.5)
+    monkeypatch.setattr(main, 'async_llm_client', analyzer)
+    
+    async def burst():
+        loop_thread = threading.get_ident()
+        requests = [call(server, 'POST', '/api/llm_analyze_code', {'code': str(i)}) for i in range(50)]
+        return loop_thread, await asyncio.gather(*requests)
+    
+    loop_thread, responses = asyncio.run(asyncio.wait_for(burst(), timeout=5))
+    
+    assert analyzer.threads == {loop_thread}
+    assert [status for status, _, _ in responses] == [200] * 50
+    assert [json.loads(body)['analysis']['feedback'] for _, _, body in responses] == [f"python: {i}" for i in range(50)]
+
+def test_sync_views_and_errors_go_through_wsgi(server):
+    status, headers, body = asyncio.run(call(server, 'GET', '/api/health'))
+    assert status == 200 and headers[b'content-type'] == b'application/json'
+    assert 'status' in json.loads(body)
+    
+    status, _, _ = asyncio.run(call(server, 'GET', '/missing'))
+    assert status == 404
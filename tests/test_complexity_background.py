@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from complexity_estimator import ComplexityEstimate, ComplexityEstimator
+from interview_manager import InterviewManager
+from llm_client import LLMClient
+
+CODE = 'def total(nums):\n    return sum(nums)\n'
+
+@pytest.fixture
+def measurement(monkeypatch):
+    """Estimator whose measurements block until `release` is set, and the code each one measured"""
+    estimator = ComplexityEstimator(engine=None)
+    release = threading.Event()
+    measured = []
+    
+    def measure(code, language, function_name, input_kind):
+        release.wait(5)
+        measured.append(code)
+        return ComplexityEstimate(function_name='total', input_kind='list',
+                                  complexity='O(n)', level='Medium', confidence=0.9)
+    
+    monkeypatch.setattr(estimator, '_measure', measure)
+    return estimator, release, measured
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_submit_code_does_not_wait_for_measurement(measurement):
+    estimator, release, _ = measurement
+    manager = InterviewManager(LLMClient(), None, estimator)
+    session_id = manager.create_session('technical')
+    
+    result = manager.submit_code(session_id, CODE)
+    
+    assert result['success']
+    assert result['analysis']['empirical_complexity_pending'] is True
+    assert manager.active_sessions[session_id].metrics.empirical_complexity == ''
+    
+    release.set()
+    wait_until(lambda: manager.active_sessions[session_id].metrics.empirical_complexity == 'O(n)')
+    assert manager.active_sessions[session_id].metrics.empirical_complexity_confidence == 0.9
+
+def test_repeated_submission_uses_memoized_estimate(measurement):
+    estimator, release, measured = measurement
+    manager = InterviewManager(LLMClient(), None, estimator)
+    first = manager.create_session('technical')
+    second = manager.create_session('technical')
+    
+    manager.submit_code(first, CODE)
+    manager.submit_code(second, CODE)
+    release.set()
+    wait_until(lambda: manager.active_sessions[second].metrics.empirical_complexity == 'O(n)')
+    result = manager.submit_code(first, CODE)
+    
+    assert measured == [CODE]
+    assert estimator.coalesced == 1
+    assert result['analysis']['empirical_complexity']['complexity'] == 'O(n)'
+    assert result['analysis']['complexity'] == 'Medium'
@@ -0,0 +1,26 @@
+import sys
+
+from interview_manager import InterviewManager
+from llm_client import LLMClient
+from metrics import SESSION_HISTORY_BYTES
+
+def gauges():
+    return SESSION_HISTORY_BYTES.labels('interview').get(), SESSION_HISTORY_BYTES.labels('llm').get()
+
+def test_history_gauges_follow_appends_and_removals():
+    llm_client = LLMClient()
+    manager = InterviewManager(llm_client)
+    baseline = gauges()
+    
+    session_id = manager.create_session('technical')
+    manager.start_interview(session_id)
+    manager.process_answer(session_id, '我會先用雜湊表記錄出現過的數字')
+    
+    history = manager.active_sessions[session_id].conversation_history
+    llm_history = llm_client.sessions[session_id]['history']
+    interview_bytes, llm_bytes = gauges()
+    assert interview_bytes - baseline[0] == sum(len(entry['content'].encode('utf-8')) for entry in history)
+    assert llm_bytes - baseline[1] == sum(sys.getsizeof(entry) for entry in llm_history)
+    
+    manager.end_interview(session_id)
+    assert gauges() == baseline
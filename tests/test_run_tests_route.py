@@ -0,0 +1,41 @@
+import pytest
+
+import main
+from execution_engine import ExecutionEngine
+
+@pytest.fixture(scope='module')
+def engine(tmp_path_factory):
+    engine = ExecutionEngine(max_workers=2, launcher_dir=str(tmp_path_factory.mktemp('sandbox')))
+    if not engine.sandboxed:
+        pytest.skip(f"sandbox unavailable here: {engine.sandbox.unavailable_reason}")
+    return engine
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    monkeypatch.setattr(main, 'execution_engine', engine)
+    return main.app.test_client()
+
+def test_run_tests_reports_each_case(client):
+    response = client.post('/api/run_tests', json={
+        'code': 'a, b = map(int, input().split())\nprint(a + b)\n',
+        'language': 'python',
+        'test_cases': [
+            {'input': '1 2\n', 'expected_output': '3\n'},
+            {'input': '2 2\n', 'expected_output': '5\n', 'name': 'wrong'}
+        ]
+    })
+    
+    assert response.status_code == 200
+    execution = response.get_json()['execution']
+    assert execution['sandboxed'] is True
+    assert execution['passed'] == 1 and execution['total'] == 2
+    assert [result['status'] for result in execution['results']] == ['passed', 'wrong_answer']
+
+def test_run_tests_without_sandbox_is_unavailable(client, engine, monkeypatch):
+    monkeypatch.setattr(engine.sandbox, 'available', False)
+    response = client.post('/api/run_tests', json={
+        'code': 'print(1)',
+        'test_cases': [{'input': '', 'expected_output': '1'}]
+    })
+    
+    assert response.status_code == 503
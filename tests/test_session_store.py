@@ -0,0 +1,106 @@
+import copy
+import threading
+
+import pytest
+
+from config import Config
+from interview_manager import InterviewSession, InterviewType
+from llm_client import LLMClient
+from session_store import SessionConflict, SQLiteSessionStore, append_merge
+
+def run_concurrently(*updates):
+    """Run each update in its own thread and batch, all reading before any writes; returns their errors"""
+    read = threading.Barrier(len(updates))
+    errors = [None] * len(updates)
+    
+    def worker(index, update):
+        try:
+            update(read)
+        except Exception as e:
+            errors[index] = e
+    
+    threads = [threading.Thread(target=worker, args=(i, update)) for i, update in enumerate(updates)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return errors
+
+def append_turn(store, text):
+    def update(read):
+        with store.batch():
+            session = store['s1']
+            read.wait(5)
+            session['history'].append(text)
+            session['question_count'] += 1
+    return update
+
+def test_concurrent_turns_are_merged(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / 'sessions.db'), 'llm_sessions',
+                               merge=append_merge(lists=('history',), counters=('question_count',)))
+    store['s1'] = {'type': 'technical', 'history': ['System: hi'], 'question_count': 0}
+    
+    errors = run_concurrently(append_turn(store, 'Candidate: a'), append_turn(store, 'Candidate: b'))
+    
+    assert errors == [None, None]
+    session = store['s1']
+    assert session['history'][0] == 'System: hi'
+    assert sorted(session['history'][1:]) == ['Candidate: a', 'Candidate: b']
+    assert session['question_count'] == 2
+    assert store.merged == 1
+
+def test_conflict_without_merge_raises(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / 'sessions.db'), 'llm_sessions')
+    store['s1'] = {'history': [], 'question_count': 0}
+    
+    errors = run_concurrently(append_turn(store, 'a'), append_turn(store, 'b'))
+    
+    assert sum(isinstance(error, SessionConflict) for error in errors) == 1
+    assert len(store['s1']['history']) == 1
+    assert store.conflicts == 1
+
+def test_object_sessions_merge_lists_counters_and_fields():
+    merge = append_merge(lists=('conversation_history', 'feedback_history'), counters=('question_count',))
+    base = InterviewSession(session_id='s1', interview_type=InterviewType.TECHNICAL)
+    base.conversation_history.append({'role': 'interviewer', 'content': 'q'})
+    mine, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    mine.conversation_history.append({'role': 'candidate', 'content': 'a'})
+    mine.question_count += 1
+    mine.current_question = 'mine'
+    theirs.conversation_history.append({'role': 'candidate', 'content': 'b'})
+    theirs.question_count += 1
+    theirs.last_activity = base.last_activity + 5
+    
+    merged = merge(base, mine, theirs)
+    
+    assert [entry['content'] for entry in merged.conversation_history] == ['q', 'b', 'a']
+    assert merged.question_count == 2
+    assert merged.current_question == 'mine'
+    assert merged.last_activity == base.last_activity + 5
+    
+    theirs.conversation_history = []
+    with pytest.raises(SessionConflict):
+        merge(base, copy.deepcopy(mine), theirs)
+
+def test_concurrent_responses_keep_every_turn(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SESSION_STORE_BACKEND', 'sqlite')
+    monkeypatch.setattr(Config, 'SESSION_STORE_PATH', str(tmp_path / 'sessions.db'))
+    # Both requests read the session before either reply arrives
+    monkeypatch.setattr(Config, 'LLM_STUB_LATENCY', 'fixed:0.3')
+    client = LLMClient()
+    client.start_interview('technical', 's1')
+    before = list(client.sessions['s1']['history'])
+    
+    threads = [threading.Thread(target=client.get_response, args=(answer, 's1')) for answer in ('first', 'second')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    
+    session = client.sessions['s1']
+    new_turns = session['history'][len(before):]
+    assert session['history'][:len(before)] == before
+    assert sorted(turn for turn in new_turns if turn.startswith('Candidate:')) == ['Candidate: first', 'Candidate: second']
+    assert sum(turn.startswith('Interviewer:') for turn in new_turns) == 2
+    assert session['question_count'] == 3
+    assert client.sessions.merged >= 1
@@ -0,0 +1,236 @@
+"""
+Validation Process Pool for AI Interview Simulator
+在工作行程中執行 CPU 密集的程式碼驗證，讓請求執行緒不必持有 GIL；支援佇列深度上限與每項任務逾時
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class ValidationQueueFull(RuntimeError):
+    """Raised when the pool already holds its maximum number of validations"""
+
+# Per-process validator, created by the worker initializer
+_worker_handler = None
+
+def _init_worker():
+    """Build the worker's own CodeHandler once, when the process starts"""
+    global _worker_handler
+    # Imported here because code_handler imports this module
+    from code_handler import CodeHandler
+    _worker_handler = CodeHandler(validation_workers=0)
+    _worker_handler.clang_pool.start()
+
+def _validate_in_worker(code: str, language: str) -> Tuple[Any, bool, list]:
+    """Run the full validation pipeline in a worker process; metrics go back with the result"""
+    with metrics.capture() as observations:
+        result, cacheable = _worker_handler._run_validation(code, language)
+    return result, cacheable, observations
+
+def _unpack(outcome: Tuple[Any, bool, list]) -> Tuple[Any, bool]:
+    """Record a worker's metrics in this process and return (result, cacheable)"""
+    result, cacheable, observations = outcome
+    metrics.replay(observations)
+    return result, cacheable
+
+class ValidationPool:
+    """
+    Process pool for CPU-heavy code validation
+    
+    Parsing, regex scanning and complexity analysis hold the GIL, so running
+    them on a request thread stalls every other request of the same server
+    process. With `max_workers` > 0 they run in separate processes (started
+    with spawn, which is safe in a threaded server) and callers only wait on
+    the result. At most `max_queue` validations may be queued or running;
+    beyond that submissions are rejected instead of piling up. A validation
+    still running after `timeout` seconds is abandoned by its caller, and
+    the executor is recycled: new work goes to fresh workers at once, and
+    the old workers are terminated after another `timeout` seconds (time
+    for the other validations they were running to finish), which frees
+    the stuck worker and its queue slot. With `max_workers` = 0 the pool
+    is disabled and callers validate inline.
+    """
+    
+    def __init__(self, max_workers: int = 0, max_queue: int = 64, timeout: float = 15):
+        """
+        Initialize validation pool
+        
+        Args:
+            max_workers: Number of worker processes (0 disables the pool)
+            max_queue: Maximum validations queued or running at once
+            timeout: Seconds a caller waits for one validation
+        """
+        self.max_workers = max(0, max_workers)
+        self.max_queue = max(1, max_queue)
+        self.timeout = timeout
+        
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        
+        # Statistics
+        self.submitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.recycles = 0
+        
+        if self.enabled:
+            self._executor = self._create_executor()
+            logger.info(f"Validation pool initialized ({self.max_workers} workers, queue limit {self.max_queue})")
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 0
+    
+    def submit(self, code: str, language: str) -> Future:
+        """
+        Queue a validation
+        
+        Args:
+            code: Source code
+            language: Programming language
+        
+        Returns:
+            Future resolving to (CodeValidationResult, cacheable, metric observations);
+            run() and run_async() record the observations and drop them
+        
+        Raises:
+            ValidationQueueFull: If max_queue validations are already pending
+        """
+        return self._submit(code, language)[0]
+    
+    def run(self, code: str, language: str) -> Tuple[Any, bool]:
+        """
+        Validate in a worker and wait for the result
+        
+        Raises:
+            ValidationQueueFull: If the queue is full
+            TimeoutError: If the validation exceeds the timeout
+        """
+        future, executor = self._submit(code, language)
+        try:
+            return _unpack(future.result(timeout=self.timeout))
+        except FuturesTimeoutError:
+            self.timeouts += 1
+            if not future.cancel():
+                self._recycle(executor)
+            raise TimeoutError(f"validation exceeded {self.timeout}s")
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+    
+    async def run_async(self, code: str, language: str) -> Tuple[Any, bool]:
+        """Coroutine version of run() for async views"""
+        future, executor = self._submit(code, language)
+        try:
+            return _unpack(await asyncio.wait_for(asyncio.wrap_future(future), self.timeout))
+        except asyncio.TimeoutError:
+            # wait_for cancelled the future; that fails only once a worker is running it
+            self.timeouts += 1
+            if not future.cancelled():
+                self._recycle(executor)
+            raise TimeoutError(f"validation exceeded {self.timeout}s")
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+    
+    def _submit(self, code: str, language: str) -> Tuple[Future, ProcessPoolExecutor]:
+        """Queue a validation; returns the future and the executor it went to"""
+        with self._lock:
+            if self._executor is None:
+                raise RuntimeError("validation pool is not running")
+            if self._pending >= self.max_queue:
+                self.rejected += 1
+                raise ValidationQueueFull(f"{self._pending} validations already pending")
+            self._pending += 1
+            self.submitted += 1
+            executor = self._executor
+        
+        try:
+            future = executor.submit(_validate_in_worker, code, language)
+        except BrokenProcessPool:
+            self._task_done(None)
+            self._restart(executor)
+            raise
+        except Exception:
+            self._task_done(None)
+            raise
+        future.add_done_callback(self._task_done)
+        return future, executor
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'pending': self._pending,
+                'max_queue': self.max_queue,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'restarts': self.restarts,
+                'recycles': self.recycles
+            }
+    
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+    
+    def _task_done(self, _future: Optional[Future]):
+        with self._lock:
+            self._pending -= 1
+    
+    def _restart(self, broken: Optional[ProcessPoolExecutor]):
+        """Replace an executor whose worker died (e.g. killed for memory)"""
+        with self._lock:
+            if self._executor is not broken or broken is None:
+                return  # Already replaced by another caller
+            self._executor = self._create_executor()
+            self.restarts += 1
+        logger.warning("Validation worker died; restarted the validation pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+    
+    def _recycle(self, stuck: ProcessPoolExecutor):
+        """Replace an executor whose worker is still running a timed-out validation"""
+        with self._lock:
+            if self._executor is not stuck:
+                return  # Already replaced by another caller
+            self._executor = self._create_executor()
+            self.recycles += 1
+        logger.warning("Validation timed out; recycling the validation workers")
+        
+        # ProcessPoolExecutor offers no public way to stop a running task, and
+        # forgets its processes on shutdown, so take them first
+        processes = list((getattr(stuck, '_processes', None) or {}).values())
+        stuck.shutdown(wait=False)
+        
+        timer = threading.Timer(self.timeout, self._terminate_workers, (processes,))
+        timer.daemon = True
+        timer.start()
+    
+    @staticmethod
+    def _terminate_workers(processes: List[multiprocessing.Process]):
+        """Kill the workers of a retired executor; validations they still run then fail"""
+        for process in processes:
+            if process.is_alive():
+                process.terminate()